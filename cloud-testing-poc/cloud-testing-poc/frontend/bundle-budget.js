@@ -0,0 +1,97 @@
+import { Buffer } from 'node:buffer'
+import { gzipSync } from 'node:zlib'
+
+const KB = 1024
+
+// Sizes every JS chunk and CSS asset in a Rollup bundle. Sizes are in bytes;
+// gzip approximates what a slow link actually transfers.
+export function measureBundle(bundle) {
+  const entries = Object.values(bundle)
+  const byFile = Object.fromEntries(entries.map((file) => [file.fileName, file]))
+  const rows = []
+  for (const file of entries) {
+    const isChunk = file.type === 'chunk'
+    if (!isChunk && !file.fileName.endsWith('.css')) continue
+    const source = isChunk ? file.code : file.source
+    rows.push({
+      file: file.fileName,
+      name: isChunk ? file.name : (file.names?.[0] ?? file.name),
+      entry: isChunk && Boolean(file.isEntry),
+      size: Buffer.byteLength(source),
+      gzip: gzipSync(source).length,
+    })
+  }
+  return { rows, initial: initialFiles(byFile) }
+}
+
+// The entry chunk, everything it imports statically and their CSS: what the
+// browser must fetch before the app can become interactive.
+function initialFiles(byFile) {
+  const seen = new Set()
+  const visit = (fileName) => {
+    const file = byFile[fileName]
+    if (!file || seen.has(fileName)) return
+    seen.add(fileName)
+    for (const css of file.viteMetadata?.importedCss ?? []) seen.add(css)
+    for (const imported of file.imports ?? []) visit(imported)
+  }
+  for (const file of Object.values(byFile)) {
+    if (file.type === 'chunk' && file.isEntry) visit(file.fileName)
+  }
+  return seen
+}
+
+// Budgets are gzipped KB per chunk or asset name, plus `initial` for the
+// whole initial load and `*` as the default for chunks not listed.
+export function checkBudgets({ rows, initial }, budgets) {
+  const failures = []
+  for (const row of rows) {
+    const budget = budgets[row.name] ?? budgets['*']
+    row.budget = budget ?? null
+    if (budget != null && row.gzip > budget * KB) {
+      failures.push(`${row.file} is ${formatKB(row.gzip)} gzipped, over its ${budget} KB budget`)
+    }
+  }
+  const initialGzip = rows.filter((row) => initial.has(row.file)).reduce((sum, row) => sum + row.gzip, 0)
+  if (budgets.initial != null && initialGzip > budgets.initial * KB) {
+    failures.push(`initial load is ${formatKB(initialGzip)} gzipped, over its ${budgets.initial} KB budget`)
+  }
+  return { initialGzip, failures }
+}
+
+function formatKB(bytes) {
+  return `${(bytes / KB).toFixed(1)} KB`
+}
+
+// Vite plugin: writes bundle-report.json next to the build output and fails
+// the build when a chunk or the initial load exceeds its budget.
+export default function bundleBudget({ budgets, report = 'bundle-report.json' }) {
+  let logger
+  return {
+    name: 'bundle-budget',
+    apply: 'build',
+    enforce: 'post',
+    configResolved(config) {
+      logger = config.logger
+    },
+    generateBundle(options, bundle) {
+      const measured = measureBundle(bundle)
+      const { initialGzip, failures } = checkBudgets(measured, budgets)
+      const rows = measured.rows
+        .map((row) => ({ ...row, initial: measured.initial.has(row.file) }))
+        .sort((a, b) => b.gzip - a.gzip)
+
+      this.emitFile({
+        type: 'asset',
+        fileName: report,
+        source: JSON.stringify({ initialGzip, budgets, chunks: rows }, null, 2),
+      })
+      for (const row of rows) {
+        const budget = row.budget != null ? ` / ${row.budget} KB` : ''
+        logger.info(`${row.initial ? '*' : ' '} ${row.file}  ${formatKB(row.size)}  gzip ${formatKB(row.gzip)}${budget}`)
+      }
+      logger.info(`initial load (*) gzip ${formatKB(initialGzip)}${budgets.initial != null ? ` / ${budgets.initial} KB` : ''}`)
+      if (failures.length) this.error(`Bundle budget exceeded:\n  ${failures.join('\n  ')}`)
+    },
+  }
+}
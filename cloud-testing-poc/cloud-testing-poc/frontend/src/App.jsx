@@ -1,34 +1,24 @@
-import { useState, useEffect } from 'react'
+import { lazy, Suspense, useState, useEffect } from 'react'
 import { Button } from '@/components/ui/button.jsx'
 import { Input } from '@/components/ui/input.jsx'
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from '@/components/ui/card.jsx'
-import { Alert, AlertDescription } from '@/components/ui/alert.jsx'
-import { Trash2, Edit, Plus, Users } from 'lucide-react'
+import { UserList } from '@/components/UserList.jsx'
+import { useUsers } from '@/hooks/use-users.js'
+import { Plus, Users } from 'lucide-react'
 import './App.css'
 
+const ErrorBanner = lazy(() => import('@/components/ErrorBanner.jsx'))
+
 function App() {
-  const [users, setUsers] = useState([])
-  const [loading, setLoading] = useState(false)
+  // Users are fetched a page at a time as the list scrolls and kept in a
+  // normalized store that mutations update optimistically
+  const {
+    users, total, loading, error: listError, loadMore, reload, createUser, updateUser, deleteUser
+  } = useUsers()
   const [error, setError] = useState('')
   const [formData, setFormData] = useState({ username: '', email: '' })
   const [editingUser, setEditingUser] = useState(null)
 
-  // Fetch users from API
-  const fetchUsers = async () => {
-    setLoading(true)
-    try {
-      const response = await fetch('/api/users')
-      if (!response.ok) throw new Error('Failed to fetch users')
-      const data = await response.json()
-      setUsers(data)
-      setError('')
-    } catch (err) {
-      setError('Failed to load users: ' + err.message)
-    } finally {
-      setLoading(false)
-    }
-  }
-
   // Create or update user
   const handleSubmit = async (e) => {
     e.preventDefault()
@@ -37,45 +27,29 @@ function App() {
       return
     }
 
-    setLoading(true)
+    // The list shows the change at once, so the form is ready for the next one
+    const editing = editingUser
+    setFormData({ username: '', email: '' })
+    setEditingUser(null)
+    setError('')
     try {
-      const url = editingUser ? `/api/users/${editingUser.id}` : '/api/users'
-      const method = editingUser ? 'PUT' : 'POST'
-      
-      const response = await fetch(url, {
-        method,
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify(formData)
-      })
-      
-      if (!response.ok) throw new Error('Failed to save user')
-      
-      setFormData({ username: '', email: '' })
-      setEditingUser(null)
-      setError('')
-      await fetchUsers()
+      await (editing ? updateUser(editing, formData) : createUser(formData))
     } catch (err) {
       setError('Failed to save user: ' + err.message)
-    } finally {
-      setLoading(false)
     }
   }
 
   // Delete user
   const handleDelete = async (userId) => {
     if (!confirm('Are you sure you want to delete this user?')) return
-    
-    setLoading(true)
+
+    const index = users.findIndex((user) => user.id === userId)
+    if (index === -1) return
+    setError('')
     try {
-      const response = await fetch(`/api/users/${userId}`, { method: 'DELETE' })
-      if (!response.ok) throw new Error('Failed to delete user')
-      
-      setError('')
-      await fetchUsers()
+      await deleteUser(users[index], index)
     } catch (err) {
       setError('Failed to delete user: ' + err.message)
-    } finally {
-      setLoading(false)
     }
   }
 
@@ -91,10 +65,10 @@ function App() {
     setFormData({ username: '', email: '' })
   }
 
-  // Load users on component mount
+  // Load the first page on component mount
   useEffect(() => {
-    fetchUsers()
-  }, [])
+    reload()
+  }, [reload])
 
   return (
     <div className="container mx-auto p-6 max-w-4xl">
@@ -108,10 +82,10 @@ function App() {
         </p>
       </div>
 
-      {error && (
-        <Alert className="mb-6 border-red-200 bg-red-50">
-          <AlertDescription className="text-red-800">{error}</AlertDescription>
-        </Alert>
+      {(error || listError) && (
+        <Suspense fallback={<p className="mb-6 text-red-800">{error || listError}</p>}>
+          <ErrorBanner message={error || listError} />
+        </Suspense>
       )}
 
       {/* User Form */}
@@ -135,7 +109,6 @@ function App() {
                   placeholder="Enter username"
                   value={formData.username}
                   onChange={(e) => setFormData({ ...formData, username: e.target.value })}
-                  disabled={loading}
                 />
               </div>
               <div>
@@ -145,13 +118,12 @@ function App() {
                   placeholder="Enter email"
                   value={formData.email}
                   onChange={(e) => setFormData({ ...formData, email: e.target.value })}
-                  disabled={loading}
                 />
               </div>
             </div>
             <div className="flex gap-2">
-              <Button type="submit" disabled={loading}>
-                {loading ? 'Saving...' : (editingUser ? 'Update User' : 'Add User')}
+              <Button type="submit">
+                {editingUser ? 'Update User' : 'Add User'}
               </Button>
               {editingUser && (
                 <Button type="button" variant="outline" onClick={handleCancel}>
@@ -166,7 +138,7 @@ function App() {
       {/* Users List */}
       <Card>
         <CardHeader>
-          <CardTitle>Users ({users.length})</CardTitle>
+          <CardTitle>Users ({total ?? users.length})</CardTitle>
           <CardDescription>Manage your user accounts</CardDescription>
         </CardHeader>
         <CardContent>
@@ -175,35 +147,12 @@ function App() {
           ) : users.length === 0 ? (
             <p className="text-center py-8 text-gray-500">No users found. Add your first user above.</p>
           ) : (
-            <div className="space-y-3">
-              {users.map((user) => (
-                <div key={user.id} className="flex items-center justify-between p-4 border rounded-lg">
-                  <div>
-                    <h3 className="font-medium">{user.username}</h3>
-                    <p className="text-sm text-gray-600">{user.email}</p>
-                  </div>
-                  <div className="flex gap-2">
-                    <Button
-                      size="sm"
-                      variant="outline"
-                      onClick={() => handleEdit(user)}
-                      disabled={loading}
-                    >
-                      <Edit className="h-4 w-4" />
-                    </Button>
-                    <Button
-                      size="sm"
-                      variant="outline"
-                      onClick={() => handleDelete(user.id)}
-                      disabled={loading}
-                      className="text-red-600 hover:text-red-700"
-                    >
-                      <Trash2 className="h-4 w-4" />
-                    </Button>
-                  </div>
-                </div>
-              ))}
-            </div>
+            <UserList
+              users={users}
+              onEdit={handleEdit}
+              onDelete={handleDelete}
+              onEndReached={loadMore}
+            />
           )}
         </CardContent>
       </Card>
@@ -77,6 +77,36 @@ describe('User Management App', () => {
     })
   })
 
+  it('fetches the next page using the cursor header', async () => {
+    // Mock a full first page announcing more users
+    fetch.mockResolvedValueOnce({
+      ok: true,
+      headers: new Headers({ 'X-Next-Cursor': '2', 'X-Total-Count': '3' }),
+      json: async () => [
+        { id: 1, username: 'testuser1', email: 'test1@example.com' },
+        { id: 2, username: 'testuser2', email: 'test2@example.com' }
+      ]
+    })
+
+    // Mock the last page
+    fetch.mockResolvedValueOnce({
+      ok: true,
+      headers: new Headers({ 'X-Total-Count': '3' }),
+      json: async () => [{ id: 3, username: 'testuser3', email: 'test3@example.com' }]
+    })
+
+    render(<App />)
+
+    await waitFor(() => {
+      expect(screen.getByText('testuser3')).toBeInTheDocument()
+      expect(screen.getByText('Users (3)')).toBeInTheDocument()
+    })
+
+    expect(fetch).toHaveBeenNthCalledWith(1, '/api/users?limit=100')
+    expect(fetch).toHaveBeenNthCalledWith(2, '/api/users?limit=100&after=2')
+    expect(fetch).toHaveBeenCalledTimes(2)
+  })
+
   it('handles form submission for creating a new user', async () => {
     // Mock initial empty users response
     fetch.mockResolvedValueOnce({
@@ -90,12 +120,6 @@ describe('User Management App', () => {
       json: async () => ({ id: 1, username: 'newuser', email: 'new@example.com' })
     })
 
-    // Mock updated users response
-    fetch.mockResolvedValueOnce({
-      ok: true,
-      json: async () => [{ id: 1, username: 'newuser', email: 'new@example.com' }]
-    })
-
     render(<App />)
     
     // Wait for initial load
@@ -112,6 +136,10 @@ describe('User Management App', () => {
     fireEvent.change(emailInput, { target: { value: 'new@example.com' } })
     fireEvent.click(submitButton)
 
+    // The new user is listed before the server answers
+    expect(screen.getByText('newuser')).toBeInTheDocument()
+    expect(screen.getByText('Users (1)')).toBeInTheDocument()
+
     // Verify API call was made
     await waitFor(() => {
       expect(fetch).toHaveBeenCalledWith('/api/users', {
@@ -120,6 +148,88 @@ describe('User Management App', () => {
         body: JSON.stringify({ username: 'newuser', email: 'new@example.com' })
       })
     })
+
+    // The created user is reconciled without reloading the list
+    await waitFor(() => {
+      expect(screen.getByText('newuser').closest('div.border')).not.toHaveClass('opacity-60')
+    })
+    expect(fetch).toHaveBeenCalledTimes(2)
+  })
+
+  it('rolls back a create the server rejects', async () => {
+    // Mock initial empty users response
+    fetch.mockResolvedValueOnce({
+      ok: true,
+      json: async () => []
+    })
+
+    // Mock a conflicting create
+    fetch.mockResolvedValueOnce({
+      ok: false,
+      status: 409
+    })
+
+    render(<App />)
+
+    await waitFor(() => {
+      expect(screen.getByText('No users found. Add your first user above.')).toBeInTheDocument()
+    })
+
+    fireEvent.change(screen.getByPlaceholderText('Enter username'), { target: { value: 'taken' } })
+    fireEvent.change(screen.getByPlaceholderText('Enter email'), { target: { value: 'taken@example.com' } })
+    fireEvent.click(screen.getByText('Add User'))
+
+    await waitFor(() => {
+      expect(screen.getByText('Failed to save user: Failed to save user')).toBeInTheDocument()
+    })
+    expect(screen.queryByText('taken')).not.toBeInTheDocument()
+    expect(screen.getByText('No users found. Add your first user above.')).toBeInTheDocument()
+    expect(fetch).toHaveBeenCalledTimes(2)
+  })
+
+  it('revalidates loaded pages with If-None-Match on focus', async () => {
+    // Mock initial users response carrying an ETag
+    fetch.mockResolvedValueOnce({
+      ok: true,
+      status: 200,
+      headers: new Headers({ 'ETag': '"v1"', 'X-Total-Count': '1' }),
+      json: async () => [{ id: 1, username: 'testuser', email: 'test@example.com' }]
+    })
+
+    // Mock the revalidation: the user was renamed elsewhere
+    fetch.mockResolvedValueOnce({
+      ok: true,
+      status: 200,
+      headers: new Headers({ 'ETag': '"v2"', 'X-Total-Count': '1' }),
+      json: async () => [{ id: 1, username: 'renamed', email: 'test@example.com' }]
+    })
+
+    // Mock the next revalidation: nothing changed
+    fetch.mockResolvedValueOnce({
+      ok: false,
+      status: 304,
+      headers: new Headers({ 'X-Total-Count': '1' })
+    })
+
+    render(<App />)
+
+    await waitFor(() => {
+      expect(screen.getByText('testuser')).toBeInTheDocument()
+    })
+
+    fireEvent.focus(window)
+
+    await waitFor(() => {
+      expect(screen.getByText('renamed')).toBeInTheDocument()
+    })
+    expect(fetch).toHaveBeenNthCalledWith(2, '/api/users?limit=100', { headers: { 'If-None-Match': '"v1"' } })
+
+    fireEvent.focus(window)
+
+    await waitFor(() => {
+      expect(fetch).toHaveBeenNthCalledWith(3, '/api/users?limit=100', { headers: { 'If-None-Match': '"v2"' } })
+    })
+    expect(screen.getByText('renamed')).toBeInTheDocument()
   })
 
   it('validates form fields before submission', async () => {
@@ -210,12 +320,6 @@ describe('User Management App', () => {
       ok: true
     })
 
-    // Mock updated empty users response
-    fetch.mockResolvedValueOnce({
-      ok: true,
-      json: async () => []
-    })
-
     render(<App />)
     
     // Wait for users to load
@@ -235,10 +339,14 @@ describe('User Management App', () => {
     // Verify confirmation was shown
     expect(window.confirm).toHaveBeenCalledWith('Are you sure you want to delete this user?')
 
-    // Verify delete API call was made
+    // The user is removed before the server answers
+    expect(screen.getByText('No users found. Add your first user above.')).toBeInTheDocument()
+
+    // Verify delete API call was made, and nothing reloaded afterwards
     await waitFor(() => {
       expect(fetch).toHaveBeenCalledWith('/api/users/1', { method: 'DELETE' })
     })
+    expect(fetch).toHaveBeenCalledTimes(2)
   })
 
   it('handles API errors gracefully', async () => {
@@ -0,0 +1,76 @@
+/**
+ * Rendering Benchmarks for User Management App
+ * Demonstrates measuring commit time and memory for a 50k-user list
+ *
+ * Run with `pnpm bench`; start node with --expose-gc for steadier heap numbers.
+ */
+import { Profiler } from 'react'
+import { render, cleanup } from '@testing-library/react'
+import { bench, describe, afterAll } from 'vitest'
+import { UserList, UserRow } from '../components/UserList'
+
+const USER_COUNT = 50000
+
+const users = Array.from({ length: USER_COUNT }, (_, i) => ({
+  id: i + 1,
+  username: `user${i + 1}`,
+  email: `user${i + 1}@example.com`
+}))
+
+const noop = () => {}
+const results = {}
+
+// The pre-windowing list: one card per user
+function FullUserList({ users }) {
+  return (
+    <div className="space-y-3">
+      {users.map((user) => (
+        <UserRow key={user.id} user={user} onEdit={noop} onDelete={noop} />
+      ))}
+    </div>
+  )
+}
+
+function heapUsed() {
+  globalThis.gc?.()
+  return process.memoryUsage().heapUsed
+}
+
+// Mounts the element once, recording the React commit time, the DOM nodes
+// created and the heap retained while mounted
+function measure(name, element) {
+  let commitMs = 0
+  const before = heapUsed()
+  const { container } = render(
+    <Profiler id={name} onRender={(id, phase, actualDuration) => { commitMs += actualDuration }}>
+      {element}
+    </Profiler>
+  )
+  const retained = heapUsed() - before
+  const nodes = container.querySelectorAll('*').length
+  cleanup()
+
+  const stats = results[name] ?? (results[name] = { runs: 0, commitMs: 0, heapMB: 0, domNodes: nodes })
+  stats.runs += 1
+  stats.commitMs += commitMs
+  stats.heapMB += retained / 2 ** 20
+}
+
+describe(`render ${USER_COUNT} users`, () => {
+  afterAll(() => {
+    console.table(Object.fromEntries(Object.entries(results).map(([name, stats]) => [name, {
+      'mean commit (ms)': +(stats.commitMs / stats.runs).toFixed(2),
+      'mean heap (MB)': +(stats.heapMB / stats.runs).toFixed(2),
+      'DOM nodes': stats.domNodes
+    }])))
+  })
+
+  bench('windowed list', () => {
+    measure('windowed', <UserList users={users} onEdit={noop} onDelete={noop} />)
+  })
+
+  // Mounting every card is slow under jsdom, so the baseline runs once
+  bench('full list', () => {
+    measure('full', <FullUserList users={users} />)
+  }, { iterations: 1, time: 0, warmupIterations: 0, warmupTime: 0 })
+})
@@ -0,0 +1,74 @@
+/**
+ * Windowed List Tests for User Management App
+ * Demonstrates testing rendering limits of large lists
+ */
+import { render, screen, fireEvent } from '@testing-library/react'
+import { vi, describe, it, expect } from 'vitest'
+import { VirtualList } from '../components/VirtualList'
+
+const items = Array.from({ length: 50000 }, (_, i) => ({ id: i + 1, name: `item${i + 1}` }))
+
+function renderList(props = {}) {
+  return render(
+    <VirtualList
+      items={items}
+      rowHeight={50}
+      maxHeight={500}
+      overscan={2}
+      renderItem={(item) => <span>{item.name}</span>}
+      {...props}
+    />
+  )
+}
+
+function scrollTo(viewport, top) {
+  Object.defineProperty(viewport, 'scrollTop', { value: top, configurable: true })
+  fireEvent.scroll(viewport)
+}
+
+describe('VirtualList', () => {
+  it('mounts only the rows in the viewport plus overscan', () => {
+    const { container } = renderList()
+
+    // 500px / 50px = 10 visible rows, plus 2 below; none above row 0
+    expect(screen.getAllByText(/^item\d+$/)).toHaveLength(12)
+    expect(screen.getByText('item1')).toBeInTheDocument()
+    expect(screen.queryByText('item13')).not.toBeInTheDocument()
+
+    // The spacer keeps the full scroll height
+    const viewport = container.querySelector('[data-slot="virtual-list"]')
+    expect(viewport.firstChild.style.height).toBe('2500000px')
+  })
+
+  it('moves the window when scrolled', () => {
+    const { container } = renderList()
+    const viewport = container.querySelector('[data-slot="virtual-list"]')
+
+    scrollTo(viewport, 50 * 1000)
+
+    expect(screen.queryByText('item1')).not.toBeInTheDocument()
+    expect(screen.getByText('item999')).toBeInTheDocument()
+    expect(screen.getByText('item1001')).toBeInTheDocument()
+    expect(screen.getAllByText(/^item\d+$/)).toHaveLength(14)
+  })
+
+  it('shrinks to its content when shorter than the viewport', () => {
+    const { container } = renderList({ items: items.slice(0, 3) })
+    const viewport = container.querySelector('[data-slot="virtual-list"]')
+
+    expect(viewport.style.height).toBe('150px')
+    expect(screen.getAllByText(/^item\d+$/)).toHaveLength(3)
+  })
+
+  it('calls onEndReached only near the end of the items', () => {
+    const onEndReached = vi.fn()
+    const { container } = renderList({ onEndReached, endThreshold: 10 })
+    const viewport = container.querySelector('[data-slot="virtual-list"]')
+
+    expect(onEndReached).not.toHaveBeenCalled()
+
+    scrollTo(viewport, 50 * (items.length - 10))
+
+    expect(onEndReached).toHaveBeenCalledTimes(1)
+  })
+})
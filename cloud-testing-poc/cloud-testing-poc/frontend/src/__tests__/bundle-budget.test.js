@@ -0,0 +1,57 @@
+/**
+ * Bundle Budget Tests for User Management App
+ * Demonstrates enforcing performance budgets at build time
+ */
+import { describe, it, expect } from 'vitest'
+import { checkBudgets, measureBundle } from '../../bundle-budget.js'
+
+const chunk = (fileName, name, code, extra = {}) => ({ type: 'chunk', fileName, name, code, imports: [], ...extra })
+
+const bundle = {
+  'assets/index.js': chunk('assets/index.js', 'index', 'x'.repeat(4000), {
+    isEntry: true,
+    imports: ['assets/react-vendor.js'],
+    viteMetadata: { importedCss: new Set(['assets/index.css']) }
+  }),
+  'assets/react-vendor.js': chunk('assets/react-vendor.js', 'react-vendor', 'r'.repeat(2000)),
+  'assets/ErrorBanner.js': chunk('assets/ErrorBanner.js', 'ErrorBanner', 'e'.repeat(500)),
+  'assets/index.css': { type: 'asset', fileName: 'assets/index.css', names: ['index.css'], source: '.a{}' },
+  'favicon.ico': { type: 'asset', fileName: 'favicon.ico', names: ['favicon.ico'], source: new Uint8Array(10) }
+}
+
+describe('bundle budgets', () => {
+  it('measures JS chunks and CSS but not other assets', () => {
+    const { rows } = measureBundle(bundle)
+
+    expect(rows.map((row) => row.name).sort()).toEqual(['ErrorBanner', 'index', 'index.css', 'react-vendor'])
+    expect(rows.find((row) => row.name === 'index').size).toBe(4000)
+  })
+
+  it('counts only statically reachable files as the initial load', () => {
+    const { initial } = measureBundle(bundle)
+
+    expect([...initial].sort()).toEqual(['assets/index.css', 'assets/index.js', 'assets/react-vendor.js'])
+  })
+
+  it('passes within budget', () => {
+    const { failures } = checkBudgets(measureBundle(bundle), { initial: 10, '*': 5 })
+
+    expect(failures).toEqual([])
+  })
+
+  it('reports a chunk over its own budget and falls back to the default', () => {
+    const measured = measureBundle(bundle)
+    const gzip = measured.rows.find((row) => row.name === 'ErrorBanner').gzip
+
+    const { failures } = checkBudgets(measured, { '*': (gzip - 1) / 1024, index: 5, 'react-vendor': 5, 'index.css': 5 })
+
+    expect(failures).toHaveLength(1)
+    expect(failures[0]).toMatch(/^assets\/ErrorBanner\.js is .* over its .* KB budget$/)
+  })
+
+  it('reports an initial load over budget', () => {
+    const { failures } = checkBudgets(measureBundle(bundle), { initial: 0.01 })
+
+    expect(failures).toEqual([expect.stringMatching(/^initial load is .* over its 0.01 KB budget$/)])
+  })
+})
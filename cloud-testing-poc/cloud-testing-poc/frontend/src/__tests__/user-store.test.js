@@ -0,0 +1,95 @@
+/**
+ * Client Store Tests for User Management App
+ * Demonstrates testing optimistic state transitions without a server
+ */
+import { describe, it, expect } from 'vitest'
+import { initialState, selectUsers, tempId, userStoreReducer } from '../lib/user-store'
+
+const user = (id, name = `user${id}`) => ({ id, username: name, email: `${name}@example.com` })
+
+function reduce(...actions) {
+  return actions.reduce(userStoreReducer, initialState)
+}
+
+const names = (state) => selectUsers(state).map((u) => u.username)
+
+describe('userStoreReducer', () => {
+  it('appends pages without duplicating users', () => {
+    const state = reduce(
+      { type: 'pageLoaded', users: [user(1), user(2)], reset: true, total: 3 },
+      { type: 'pageLoaded', users: [user(2), user(3)], reset: false, total: 3 }
+    )
+
+    expect(state.ids).toEqual([1, 2, 3])
+    expect(state.total).toBe(3)
+  })
+
+  it('keeps an in-flight create across a reload', () => {
+    const id = tempId()
+    const state = reduce(
+      { type: 'pageLoaded', users: [user(1)], reset: true, total: 1 },
+      { type: 'insert', user: { ...user(id, 'draft'), pending: true }, delta: 1 },
+      { type: 'pageLoaded', users: [user(1), user(2)], reset: true, total: 2 }
+    )
+
+    expect(names(state)).toEqual(['user1', 'user2', 'draft'])
+  })
+
+  it('replaces a temp entry with the created user', () => {
+    const id = tempId()
+    const state = reduce(
+      { type: 'pageLoaded', users: [user(1)], reset: true, total: 1 },
+      { type: 'insert', user: { ...user(id, 'new'), pending: true }, delta: 1 },
+      { type: 'upsert', user: user(7, 'new'), replace: id }
+    )
+
+    expect(state.ids).toEqual([1, 7])
+    expect(state.byId[id]).toBeUndefined()
+    expect(state.byId[7].pending).toBeUndefined()
+    expect(state.total).toBe(2)
+  })
+
+  it('restores a deleted user at its old position on rollback', () => {
+    const state = reduce(
+      { type: 'pageLoaded', users: [user(1), user(2), user(3)], reset: true, total: 3 },
+      { type: 'remove', id: 2, delta: -1 },
+      { type: 'insert', user: user(2), index: 1, delta: 1 }
+    )
+
+    expect(state.ids).toEqual([1, 2, 3])
+    expect(state.total).toBe(3)
+  })
+
+  it('does not resurrect a user removed while its update was in flight', () => {
+    const state = reduce(
+      { type: 'pageLoaded', users: [user(1)], reset: true, total: 1 },
+      { type: 'remove', id: 1, delta: -1 },
+      { type: 'upsert', user: user(1, 'late') }
+    )
+
+    expect(state.ids).toEqual([])
+    expect(state.total).toBe(0)
+  })
+
+  it('replaces only the revalidated page range', () => {
+    const state = reduce(
+      { type: 'pageLoaded', users: [user(1), user(2)], reset: true, total: 4 },
+      { type: 'pageLoaded', users: [user(3), user(4)], reset: false, total: 4 },
+      // The first page (ids up to 2) changed: 1 was deleted, 2 renamed
+      { type: 'pageRevalidated', after: null, until: 3, users: [user(2, 'renamed'), user(3)], total: 3 }
+    )
+
+    expect(names(state)).toEqual(['renamed', 'user3', 'user4'])
+    expect(state.byId[1]).toBeUndefined()
+    expect(state.total).toBe(3)
+  })
+
+  it('treats the last page range as open-ended', () => {
+    const state = reduce(
+      { type: 'pageLoaded', users: [user(1), user(2), user(3)], reset: true, total: 3 },
+      { type: 'pageRevalidated', after: 1, until: null, users: [user(3)], total: 2 }
+    )
+
+    expect(state.ids).toEqual([1, 3])
+  })
+})
@@ -0,0 +1,10 @@
+import { Alert, AlertDescription } from '@/components/ui/alert.jsx'
+
+// Loaded on demand: most sessions never show an error.
+export default function ErrorBanner({ message }) {
+  return (
+    <Alert className="mb-6 border-red-200 bg-red-50">
+      <AlertDescription className="text-red-800">{message}</AlertDescription>
+    </Alert>
+  )
+}
@@ -0,0 +1,55 @@
+import { Button } from '@/components/ui/button.jsx'
+import { VirtualList } from '@/components/VirtualList.jsx'
+import { cn } from '@/lib/utils'
+import { Trash2, Edit } from 'lucide-react'
+
+// Row pitch in pixels: the 76px card plus the 12px gap below it.
+export const USER_ROW_HEIGHT = 88
+
+// Rows awaiting the server's answer to an optimistic change are dimmed and
+// cannot be edited or deleted until it arrives.
+export function UserRow({ user, onEdit, onDelete, disabled }) {
+  const locked = disabled || user.pending
+  return (
+    <div className={cn('flex h-full items-center justify-between p-4 border rounded-lg', user.pending && 'opacity-60')}>
+      <div>
+        <h3 className="font-medium">{user.username}</h3>
+        <p className="text-sm text-gray-600">{user.email}</p>
+      </div>
+      <div className="flex gap-2">
+        <Button
+          size="sm"
+          variant="outline"
+          onClick={() => onEdit(user)}
+          disabled={locked}
+        >
+          <Edit className="h-4 w-4" />
+        </Button>
+        <Button
+          size="sm"
+          variant="outline"
+          onClick={() => onDelete(user.id)}
+          disabled={locked}
+          className="text-red-600 hover:text-red-700"
+        >
+          <Trash2 className="h-4 w-4" />
+        </Button>
+      </div>
+    </div>
+  )
+}
+
+export function UserList({ users, onEdit, onDelete, onEndReached, disabled }) {
+  return (
+    <VirtualList
+      items={users}
+      rowHeight={USER_ROW_HEIGHT}
+      onEndReached={onEndReached}
+      renderItem={(user) => (
+        <div className="h-full pb-3">
+          <UserRow user={user} onEdit={onEdit} onDelete={onDelete} disabled={disabled} />
+        </div>
+      )}
+    />
+  )
+}
@@ -0,0 +1,64 @@
+import * as React from "react"
+
+import { cn } from "@/lib/utils"
+
+// Returns the [first, last) slice of rows to mount for a viewport.
+function getVisibleRange(firstVisible, viewportHeight, rowHeight, count, overscan) {
+  const first = Math.max(0, firstVisible - overscan)
+  const last = Math.min(count, firstVisible + Math.ceil(viewportHeight / rowHeight) + overscan)
+  return [first, last]
+}
+
+// Fixed-height windowed list: only the rows in (or near) the viewport are
+// mounted, so render cost depends on the viewport, not on items.length.
+// onEndReached fires when the window comes within endThreshold rows of the
+// end, which is where the caller fetches the next page.
+function VirtualList({
+  items,
+  rowHeight,
+  maxHeight = 600,
+  overscan = 5,
+  endThreshold = 20,
+  onEndReached,
+  getKey = (item) => item.id,
+  renderItem,
+  className,
+}) {
+  const [firstVisible, setFirstVisible] = React.useState(0)
+  const totalHeight = items.length * rowHeight
+  const height = Math.min(maxHeight, totalHeight)
+  const [first, last] = getVisibleRange(firstVisible, height, rowHeight, items.length, overscan)
+
+  // Scrolling within a row keeps the same state, so React skips the render.
+  const handleScroll = (e) => {
+    setFirstVisible(Math.floor(e.currentTarget.scrollTop / rowHeight))
+  }
+
+  React.useEffect(() => {
+    if (onEndReached && last >= items.length - endThreshold) onEndReached()
+  }, [last, items.length, endThreshold, onEndReached])
+
+  const rows = []
+  for (let index = first; index < last; index++) {
+    const item = items[index]
+    rows.push(
+      <div
+        key={getKey(item)}
+        style={{ position: "absolute", top: index * rowHeight, left: 0, right: 0, height: rowHeight }}>
+        {renderItem(item, index)}
+      </div>
+    )
+  }
+
+  return (
+    <div
+      data-slot="virtual-list"
+      className={cn("overflow-y-auto", className)}
+      style={{ height }}
+      onScroll={handleScroll}>
+      <div style={{ position: "relative", height: totalHeight }}>{rows}</div>
+    </div>
+  );
+}
+
+export { VirtualList }
@@ -0,0 +1,186 @@
+import * as React from "react"
+
+import { initialState, selectUsers, tempId, userStoreReducer } from "@/lib/user-store"
+
+const PAGE_SIZE = 100
+const JSON_HEADERS = { "Content-Type": "application/json" }
+
+// Fetches one keyset page. The API sends X-Next-Cursor only when the page
+// is full and X-Total-Count whenever a limit is given. With an etag the
+// request is conditional and an unchanged page comes back as notModified.
+export async function fetchUserPage(after, limit, etag) {
+  const params = new URLSearchParams({ limit: String(limit) })
+  if (after != null) params.set("after", after)
+  const url = `/api/users?${params}`
+  const response = await (etag ? fetch(url, { headers: { "If-None-Match": etag } }) : fetch(url))
+  const total = response.headers?.get("X-Total-Count")
+  const page = { total: total != null ? Number(total) : null, notModified: response.status === 304 }
+  if (page.notModified) return page
+  if (!response.ok) throw new Error("Failed to fetch users")
+  const next = response.headers?.get("X-Next-Cursor")
+  return {
+    ...page,
+    users: await response.json(),
+    next: next != null ? Number(next) : null,
+    etag: response.headers?.get("ETag") ?? null,
+  }
+}
+
+// Cursor-paginated users in a normalized store.
+//
+// loadMore appends the next page and is a no-op while a page is in flight or
+// once the last page has arrived; reload starts over from the first page and
+// discards any response still in flight. Mutations apply to the store at
+// once, send a single request, then reconcile with the server's answer or
+// roll back and rethrow. Loaded pages are revalidated with If-None-Match
+// when the window regains focus, so unchanged pages cost a bodiless 304.
+export function useUsers(pageSize = PAGE_SIZE) {
+  const [state, dispatch] = React.useReducer(userStoreReducer, initialState)
+  const [hasMore, setHasMore] = React.useState(true)
+  const [loading, setLoading] = React.useState(false)
+  const [error, setError] = React.useState("")
+  const cursor = React.useRef(null)
+  const done = React.useRef(false)
+  const pending = React.useRef(false)
+  const generation = React.useRef(0)
+  // after-cursor -> { etag, until } for every page loaded since the last reload
+  const pages = React.useRef(new Map())
+  const revalidating = React.useRef(false)
+
+  const users = React.useMemo(() => selectUsers(state), [state])
+
+  const loadPage = React.useCallback(async (reset) => {
+    if (reset) {
+      generation.current += 1
+    } else if (pending.current || done.current) {
+      return
+    }
+    const current = generation.current
+    const after = reset ? null : cursor.current
+    pending.current = true
+    setLoading(true)
+    try {
+      const page = await fetchUserPage(after, pageSize)
+      if (current !== generation.current) return
+      if (reset) pages.current.clear()
+      pages.current.set(after, { etag: page.etag, until: page.next })
+      cursor.current = page.next
+      done.current = page.next === null
+      dispatch({ type: "pageLoaded", users: page.users, reset, total: page.total })
+      setHasMore(!done.current)
+      setError("")
+    } catch (err) {
+      if (current === generation.current) setError("Failed to load users: " + err.message)
+    } finally {
+      if (current === generation.current) {
+        pending.current = false
+        setLoading(false)
+      }
+    }
+  }, [pageSize])
+
+  const loadMore = React.useCallback(() => loadPage(false), [loadPage])
+  const reload = React.useCallback(() => loadPage(true), [loadPage])
+
+  const revalidate = React.useCallback(async () => {
+    if (revalidating.current || pending.current) return
+    revalidating.current = true
+    const current = generation.current
+    try {
+      for (const [after, known] of [...pages.current]) {
+        if (!known.etag) continue
+        const page = await fetchUserPage(after, pageSize, known.etag)
+        if (current !== generation.current) return
+        if (page.notModified) {
+          if (page.total !== null) dispatch({ type: "totalChanged", total: page.total })
+          continue
+        }
+        pages.current.set(after, { etag: page.etag, until: page.next })
+        dispatch({ type: "pageRevalidated", after, until: page.next, users: page.users, total: page.total })
+      }
+    } catch {
+      // Background revalidation is best effort; the next focus retries.
+    } finally {
+      revalidating.current = false
+    }
+  }, [pageSize])
+
+  React.useEffect(() => {
+    const onVisible = () => {
+      if (document.visibilityState === "visible") revalidate()
+    }
+    window.addEventListener("focus", revalidate)
+    document.addEventListener("visibilitychange", onVisible)
+    return () => {
+      window.removeEventListener("focus", revalidate)
+      document.removeEventListener("visibilitychange", onVisible)
+    }
+  }, [revalidate])
+
+  const createUser = React.useCallback(async (fields) => {
+    const id = tempId()
+    dispatch({ type: "insert", user: { ...fields, id, pending: true }, delta: 1 })
+    try {
+      const response = await fetch("/api/users", {
+        method: "POST",
+        headers: JSON_HEADERS,
+        body: JSON.stringify(fields)
+      })
+      if (!response.ok) throw new Error("Failed to save user")
+      dispatch({ type: "upsert", user: await response.json(), replace: id })
+    } catch (err) {
+      dispatch({ type: "remove", id, delta: -1 })
+      throw err
+    }
+  }, [])
+
+  // The edit carries the version it started from, so a change someone else
+  // saved in the meantime is refused with 412 instead of overwritten, and
+  // the row rolls back to that change rather than to the stale copy.
+  const updateUser = React.useCallback(async (previous, fields) => {
+    dispatch({ type: "upsert", user: { ...previous, ...fields, pending: true } })
+    let restore = previous
+    try {
+      const response = await fetch(`/api/users/${previous.id}`, {
+        method: "PUT",
+        headers: JSON_HEADERS,
+        body: JSON.stringify(previous.version != null ? { ...fields, version: previous.version } : fields)
+      })
+      if (response.status === 412) {
+        restore = (await response.json()).current
+        throw new Error("User was changed by someone else; review and save again")
+      }
+      if (!response.ok) throw new Error("Failed to save user")
+      dispatch({ type: "upsert", user: await response.json() })
+    } catch (err) {
+      dispatch({ type: "upsert", user: restore })
+      throw err
+    }
+  }, [])
+
+  const deleteUser = React.useCallback(async (user, index) => {
+    dispatch({ type: "remove", id: user.id, delta: -1 })
+    try {
+      const response = await fetch(`/api/users/${user.id}`, { method: "DELETE" })
+      // A 404 means someone else deleted it first, which is what we wanted.
+      if (!response.ok && response.status !== 404) throw new Error("Failed to delete user")
+    } catch (err) {
+      dispatch({ type: "insert", user, index, delta: 1 })
+      throw err
+    }
+  }, [])
+
+  return {
+    users,
+    total: state.total,
+    hasMore,
+    loading,
+    error,
+    loadMore,
+    reload,
+    revalidate,
+    createUser,
+    updateUser,
+    deleteUser,
+  }
+}
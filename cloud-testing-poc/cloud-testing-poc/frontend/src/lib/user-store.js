@@ -0,0 +1,113 @@
+// Normalized client-side user store.
+//
+// byId holds each user once; ids is the display order: server ids ascending,
+// as the API pages them, followed by optimistic creates that have no server
+// id yet. Those carry string temp ids so they can never collide with a
+// server id. total mirrors X-Total-Count and is null until the API sends it.
+
+let tempSerial = 0
+
+export const initialState = { byId: {}, ids: [], total: null }
+
+export function tempId() {
+  tempSerial += 1
+  return `tmp-${tempSerial}`
+}
+
+export function isTemp(id) {
+  return typeof id === "string"
+}
+
+export function selectUsers(state) {
+  return state.ids.map((id) => state.byId[id])
+}
+
+function adjustTotal(total, delta) {
+  return total === null || !delta ? total : total + delta
+}
+
+function mergeUsers(byId, users) {
+  const next = { ...byId }
+  for (const user of users) next[user.id] = user
+  return next
+}
+
+function pageLoaded(state, { users, reset, total }) {
+  const pending = state.ids.filter(isTemp)
+  const nextTotal = total ?? state.total
+  if (reset) {
+    const byId = {}
+    for (const id of pending) byId[id] = state.byId[id]
+    return { byId: mergeUsers(byId, users), ids: users.map((user) => user.id).concat(pending), total: nextTotal }
+  }
+  const known = new Set(state.ids)
+  const added = users.filter((user) => !known.has(user.id)).map((user) => user.id)
+  const loaded = state.ids.filter((id) => !isTemp(id))
+  return { byId: mergeUsers(state.byId, users), ids: loaded.concat(added, pending), total: nextTotal }
+}
+
+// Replaces the ids in the page's range (after, until] with what the server
+// sent now: rows deleted elsewhere disappear and edited rows are refreshed.
+// until is null for the last page, whose range is open-ended.
+function pageRevalidated(state, { after, until, users, total }) {
+  const inRange = (id) => !isTemp(id) && (after === null || id > after) && (until === null || id <= until)
+  const byId = { ...state.byId }
+  for (const id of state.ids) if (inRange(id)) delete byId[id]
+  const before = state.ids.filter((id) => !isTemp(id) && after !== null && id <= after)
+  const beyond = state.ids.filter((id) => !isTemp(id) && until !== null && id > until)
+  const later = new Set(beyond)
+  const fresh = users.map((user) => user.id).filter((id) => !later.has(id))
+  return {
+    byId: mergeUsers(byId, users),
+    ids: before.concat(fresh, beyond, state.ids.filter(isTemp)),
+    total: total ?? state.total,
+  }
+}
+
+// Stores a user the server returned. With replace, it takes the place of
+// that (temp) entry; otherwise it refreshes an entry that is still listed.
+function upsert(state, { user, replace }) {
+  if (replace !== undefined) {
+    const byId = { ...state.byId, [user.id]: user }
+    delete byId[replace]
+    const ids = state.ids.includes(user.id)
+      ? state.ids.filter((id) => id !== replace)
+      : state.ids.map((id) => (id === replace ? user.id : id))
+    return { ...state, byId, ids }
+  }
+  if (!(user.id in state.byId)) return state
+  return { ...state, byId: { ...state.byId, [user.id]: user } }
+}
+
+function insert(state, { user, index, delta }) {
+  if (user.id in state.byId) return state
+  const ids = state.ids.slice()
+  ids.splice(index ?? ids.length, 0, user.id)
+  return { byId: { ...state.byId, [user.id]: user }, ids, total: adjustTotal(state.total, delta) }
+}
+
+function remove(state, { id, delta }) {
+  if (!(id in state.byId)) return state
+  const byId = { ...state.byId }
+  delete byId[id]
+  return { byId, ids: state.ids.filter((other) => other !== id), total: adjustTotal(state.total, delta) }
+}
+
+export function userStoreReducer(state, action) {
+  switch (action.type) {
+    case "pageLoaded":
+      return pageLoaded(state, action)
+    case "pageRevalidated":
+      return pageRevalidated(state, action)
+    case "totalChanged":
+      return action.total === state.total ? state : { ...state, total: action.total }
+    case "upsert":
+      return upsert(state, action)
+    case "insert":
+      return insert(state, action)
+    case "remove":
+      return remove(state, action)
+    default:
+      throw new Error(`Unknown user store action: ${action.type}`)
+  }
+}
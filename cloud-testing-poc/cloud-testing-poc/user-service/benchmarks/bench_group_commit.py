@@ -0,0 +1,47 @@
+"""
+Group Commit Benchmark
+Measures user creation throughput with and without group commit
+
+Usage: python benchmarks/bench_group_commit.py [--writes 2000]
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from common import run_clients, temp_app
+
+CLIENT_COUNTS = (1, 8, 64)
+
+
+def measure(clients, total_writes, group_commit):
+    with temp_app(GROUP_COMMIT_ENABLED=group_commit) as app:
+        ops_per_client = max(1, total_writes // clients)
+
+        def create(client_index, op_index):
+            response = app.test_client().post(
+                '/api/users',
+                data=json.dumps({'username': f'u{client_index}-{op_index}',
+                                 'email': f'u{client_index}-{op_index}@example.com'}),
+                content_type='application/json')
+            assert response.status_code == 201, response.status_code
+
+        return run_clients(clients, ops_per_client, create)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--writes', type=int, default=2000, help='writes per run')
+    args = parser.parse_args()
+
+    print(f"{'clients':>8} {'per-request':>14} {'group commit':>14}")
+    for clients in CLIENT_COUNTS:
+        baseline = measure(clients, args.writes, group_commit=False)
+        grouped = measure(clients, args.writes, group_commit=True)
+        print(f'{clients:>8} {baseline:>10.0f} w/s {grouped:>10.0f} w/s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""
+Import/Export Benchmark
+Measures streaming NDJSON/CSV import and export throughput into SQLite
+
+Usage: python benchmarks/bench_import.py [--rows 200000] [--dir PATH]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from common import temp_app
+
+
+def ndjson_body(rows):
+    return ''.join(json.dumps({'username': f'user{i}', 'email': f'user{i}@example.com'}) + '\n'
+                   for i in range(rows)).encode()
+
+
+def timed(label, rows, request):
+    start = time.perf_counter()
+    response = request()
+    data = response.data
+    elapsed = time.perf_counter() - start
+    assert response.status_code == 200, response.status_code
+    print(f'{label:<24} {rows / elapsed:>12.0f} rows/s')
+    return data
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=200000, help='rows to import')
+    parser.add_argument('--dir', default=None, help='directory to create the database in')
+    args = parser.parse_args()
+
+    body = ndjson_body(args.rows)
+    with temp_app(dir=args.dir) as app:
+        client = app.test_client()
+        progress = timed('import ndjson', args.rows,
+                         lambda: client.post('/api/users/import', data=body, content_type='application/x-ndjson'))
+        assert json.loads(progress.decode().splitlines()[-1]).get('done'), progress[-200:]
+        snapshot = timed('export csv', args.rows, lambda: client.get('/api/users/export?format=csv'))
+        timed('export ndjson', args.rows, lambda: client.get('/api/users/export'))
+
+    with temp_app(dir=args.dir) as app:
+        client = app.test_client()
+        timed('import csv', args.rows,
+              lambda: client.post('/api/users/import?format=csv', data=snapshot, content_type='text/csv'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""
+Multi-Get Benchmark
+Compares fetching N users with one GET per id against one multi-get request
+
+Usage: python benchmarks/bench_multi_get.py [--users 5000] [--ids 1000] [--repeat 5]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from common import temp_app
+
+
+def timed(operation, repeat):
+    """Median wall time of ``operation`` in milliseconds."""
+    operation()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        operation()
+        samples.append((time.perf_counter() - start) * 1000)
+    return sorted(samples)[len(samples) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, default=5000, help='rows in the table')
+    parser.add_argument('--ids', type=int, default=1000, help='ids fetched per round')
+    parser.add_argument('--repeat', type=int, default=5, help='timed repetitions')
+    args = parser.parse_args()
+
+    with temp_app() as app:
+        client = app.test_client()
+        client.post('/api/users/bulk', data=json.dumps([{'username': f'user{i}', 'email': f'user{i}@example.com'}
+                                                        for i in range(args.users)]),
+                    content_type='application/json')
+        # A tenth of the ids do not exist, as with a stale client's list.
+        ids = random.Random(0).sample(range(1, args.users * 10 // 9 + 1), args.ids)
+
+        def one_per_id():
+            for user_id in ids:
+                client.get(f'/api/users/{user_id}').get_data()
+
+        def query_string():
+            client.get(f"/api/users?ids={','.join(map(str, ids))}").get_data()
+
+        def post_body():
+            client.post('/api/users/lookup', data=json.dumps({'ids': ids}),
+                        content_type='application/json').get_data()
+
+        one_get = timed(lambda: client.get(f'/api/users/{ids[0]}').get_data(), args.repeat)
+        print(f'{args.ids} ids, {args.users} users')
+        print(f"{'path':<28} {'ms':>10} {'vs one GET':>11}")
+        for label, ms in (('GET /api/users/<id> x N', timed(one_per_id, args.repeat)),
+                          ('GET /api/users?ids=', timed(query_string, args.repeat)),
+                          ('POST /api/users/lookup', timed(post_body, args.repeat)),
+                          ('GET /api/users/<id> x 1', one_get)):
+            print(f'{label:<28} {ms:>10.2f} {ms / one_get:>10.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+Optimistic Update Benchmark
+Measures read-modify-write throughput when many clients edit the same users
+
+Every operation reads a user, waits ``--think`` milliseconds (the client
+round trip or editing time between reading and saving), increments a
+counter kept in its email and writes it back. Three strategies are
+compared:
+
+  blind        GET then unconditional PATCH; fast, but concurrent edits are lost
+  pessimistic  one lock held from the GET to the PATCH, as BEGIN IMMEDIATE
+               would hold SQLite's database-wide write lock
+  optimistic   GET then PATCH with If-Match, retrying from the 412 body
+
+Usage: python benchmarks/bench_optimistic_updates.py [--clients 8] [--ops 200] [--users 1,4,64] [--think 2]
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from common import run_clients, temp_app
+
+
+def counter(user):
+    return int(user['email'].split('@')[0][1:])
+
+
+def bump(user):
+    domain = user['email'].split('@')[1]
+    return {'email': f"n{counter(user) + 1}@{domain}"}
+
+
+def run(strategy, clients, ops, users, think):
+    with temp_app() as app:
+        client = app.test_client()
+        client.post('/api/users/bulk', data=json.dumps([{'username': f'user{i}', 'email': f'n0@{i}.example.com'}
+                                                        for i in range(users)]),
+                    content_type='application/json')
+        lock = threading.Lock()
+        retries = [0] * clients
+
+        def read(user_id):
+            user = client.get(f'/api/users/{user_id}').get_json()
+            time.sleep(think)
+            return user
+
+        def write(user_id, user, headers=None):
+            return client.patch(f'/api/users/{user_id}', data=json.dumps(bump(user)), headers=headers or {},
+                                content_type='application/json')
+
+        def operation(client_index, op_index):
+            user_id = (client_index + op_index) % users + 1
+            if strategy == 'blind':
+                write(user_id, read(user_id))
+            elif strategy == 'pessimistic':
+                with lock:
+                    write(user_id, read(user_id))
+            else:
+                user = read(user_id)
+                while True:
+                    response = write(user_id, user, {'If-Match': f"\"{user['version']}\""})
+                    if response.status_code != 412:
+                        break
+                    retries[client_index] += 1
+                    user = response.get_json()['current']
+
+        throughput = run_clients(clients, ops, operation)
+        applied = sum(counter(user) for user in client.get('/api/users').get_json())
+        return throughput, sum(retries) / (clients * ops), clients * ops - applied
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--clients', type=int, default=8, help='concurrent editors')
+    parser.add_argument('--ops', type=int, default=200, help='read-modify-writes per editor')
+    parser.add_argument('--users', default='1,4,64', help='comma-separated hot-set sizes (fewer = more contention)')
+    parser.add_argument('--think', type=float, default=2.0, help='milliseconds between read and write')
+    args = parser.parse_args()
+
+    print(f'{args.clients} clients x {args.ops} read-modify-writes, {args.think} ms think time')
+    print(f"{'users':>6} {'strategy':<12} {'ops/s':>10} {'retries/op':>11} {'lost':>6}")
+    for users in (int(value) for value in args.users.split(',')):
+        for strategy in ('blind', 'pessimistic', 'optimistic'):
+            throughput, retries, lost = run(strategy, args.clients, args.ops, users, args.think / 1000)
+            print(f'{users:>6} {strategy:<12} {throughput:>10.0f} {retries:>11.2f} {lost:>6}')
+
+
+if __name__ == '__main__':
+    main()
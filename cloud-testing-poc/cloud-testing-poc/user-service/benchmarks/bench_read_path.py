@@ -0,0 +1,72 @@
+"""
+Read Path Benchmark
+Compares the ORM read path (User.query) with column-only Core selects
+
+Usage: python benchmarks/bench_read_path.py [--users 5000] [--repeat 20]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from common import temp_app
+
+from src.models.user import User, db
+
+
+def seed(app, users):
+    body = ''.join(json.dumps({'username': f'user{i}', 'email': f'user{i}@example.com'}) + '\n'
+                   for i in range(users))
+    app.test_client().post('/api/users/import', data=body).get_data()
+
+
+def measure(operation, rows, repeat):
+    """Rows per second and peak traced bytes per row."""
+    operation()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        operation()
+    rate = rows * repeat / (time.perf_counter() - start)
+
+    tracemalloc.start()
+    operation()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return rate, peak / rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, default=5000, help='rows in the table')
+    parser.add_argument('--repeat', type=int, default=20, help='timed repetitions')
+    args = parser.parse_args()
+
+    print(f"{'path':<34} {'rows/sec':>10} {'peak B/row':>11}")
+    for core_reads in (False, True):
+        with temp_app(SQL_CORE_READS=core_reads) as app:
+            seed(app, args.users)
+            repository = app.extensions['user_repository']
+            client = app.test_client()
+            with app.app_context():
+                cases = {
+                    'User.query.all() + to_dict': lambda: [u.to_dict() for u in User.query.all()],
+                    'repository.list_users()': repository.list_users,
+                    'GET /api/users': lambda: client.get('/api/users').get_data(),
+                } if not core_reads else {
+                    'repository.list_users() [core]': repository.list_users,
+                    'GET /api/users [core]': lambda: client.get('/api/users').get_data(),
+                }
+                for label, operation in cases.items():
+                    def run():
+                        operation()
+                        db.session.remove()
+                    rate, peak = measure(run, args.users, args.repeat)
+                    print(f'{label:<34} {rate:>10.0f} {peak:>11.0f}')
+
+
+if __name__ == '__main__':
+    main()
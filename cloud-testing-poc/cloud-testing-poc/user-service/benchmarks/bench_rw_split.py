@@ -0,0 +1,62 @@
+"""
+Read/Write Split Benchmark
+Measures mixed read/write throughput with and without separate reader and writer pools
+
+Usage: python benchmarks/bench_rw_split.py [--ops 4000] [--write-ratio 0.1]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from common import run_clients, temp_app
+
+CLIENT_COUNTS = (1, 8, 32)
+SEED_USERS = 2000
+
+
+def measure(clients, total_ops, write_ratio, split):
+    with temp_app(RW_SPLIT_ENABLED=split) as app:
+        app.test_client().post('/api/users/bulk',
+                               data=json.dumps([{'username': f'seed{i}', 'email': f'seed{i}@example.com'}
+                                                for i in range(SEED_USERS)]),
+                               content_type='application/json')
+        ops_per_client = max(1, total_ops // clients)
+
+        def operation(client_index, op_index):
+            client = app.test_client()
+            rng = random.Random(client_index * 1_000_003 + op_index)
+            if rng.random() < write_ratio:
+                response = client.post('/api/users',
+                                       data=json.dumps({'username': f'w{client_index}-{op_index}',
+                                                        'email': f'w{client_index}-{op_index}@example.com'}),
+                                       content_type='application/json')
+                assert response.status_code == 201, response.status_code
+            else:
+                response = client.get(f'/api/users?limit=100&after={rng.randrange(SEED_USERS)}')
+                assert response.status_code == 200, response.status_code
+
+        result = run_clients(clients, ops_per_client, operation)
+        if split:
+            app.extensions['rw_split'].reader.dispose()
+        return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--ops', type=int, default=4000, help='operations per run')
+    parser.add_argument('--write-ratio', type=float, default=0.1, help='fraction of operations that write')
+    args = parser.parse_args()
+
+    print(f"{'clients':>8} {'shared engine':>16} {'read/write split':>18}")
+    for clients in CLIENT_COUNTS:
+        shared = measure(clients, args.ops, args.write_ratio, split=False)
+        split = measure(clients, args.ops, args.write_ratio, split=True)
+        print(f'{clients:>8} {shared:>12.0f} op/s {split:>14.0f} op/s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""
+Sharding Benchmark
+Measures concurrent user creation throughput as the shard count grows
+
+Usage: python benchmarks/bench_sharding.py [--writes 2000] [--clients 16] [--dir PATH]
+
+Point --dir at the disk the service will use: on tmpfs commits cost no fsync
+and the numbers only reflect CPU time.
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from common import run_clients
+
+from src.repositories.sharded import ShardedUserRepository
+
+SHARD_COUNTS = (1, 2, 4, 8)
+
+
+def measure(shard_count, total_writes, clients, parent):
+    tmpdir = tempfile.mkdtemp(dir=parent)
+    try:
+        repo = ShardedUserRepository(tmpdir, shard_count)
+
+        def create(client_index, op_index):
+            repo.create(f'u{client_index}-{op_index}', f'u{client_index}-{op_index}@example.com')
+
+        result = run_clients(clients, max(1, total_writes // clients), create)
+        for shard in repo.shards:
+            shard.engine.dispose()
+        return result
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--writes', type=int, default=2000, help='writes per run')
+    parser.add_argument('--clients', type=int, default=16, help='concurrent writers')
+    parser.add_argument('--dir', default=None, help='directory to create the shard files in')
+    args = parser.parse_args()
+
+    print(f"{'shards':>8} {'writes/sec':>12}")
+    for shard_count in SHARD_COUNTS:
+        print(f'{shard_count:>8} {measure(shard_count, args.writes, args.clients, args.dir):>12.0f}')
+
+
+if __name__ == '__main__':
+    main()
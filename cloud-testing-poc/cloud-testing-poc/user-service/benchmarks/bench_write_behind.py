@@ -0,0 +1,65 @@
+"""
+Write-Behind Benchmark
+Measures user ingest throughput with synchronous, group-committed and write-behind creates
+
+Write-behind is timed twice: until every request has been answered
+(accepted/s) and until the queue has drained to the database (written/s).
+
+Usage: python benchmarks/bench_write_behind.py [--writes 20000] [--clients 8] [--dir <disk>]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from common import run_clients, temp_app
+
+MODES = {
+    'per-request': {},
+    'group commit': {'GROUP_COMMIT_ENABLED': True},
+    'write-behind': {'WRITE_BEHIND_ENABLED': True},
+}
+
+
+def measure(mode, clients, total_writes, directory):
+    with temp_app(directory, **MODES[mode]) as app:
+        ops_per_client = max(1, total_writes // clients)
+        headers = {'Prefer': 'respond-async'} if mode == 'write-behind' else {}
+        expected = 202 if mode == 'write-behind' else 201
+
+        def create(client_index, op_index):
+            response = app.test_client().post(
+                '/api/users', headers=headers,
+                data=json.dumps({'username': f'u{client_index}-{op_index}',
+                                 'email': f'u{client_index}-{op_index}@example.com'}),
+                content_type='application/json')
+            assert response.status_code == expected, response.status_code
+
+        start = time.perf_counter()
+        accepted = run_clients(clients, ops_per_client, create)
+        writer = app.extensions.get('write_behind')
+        if writer is None:
+            return accepted, accepted
+        writer.flush()
+        return accepted, clients * ops_per_client / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--writes', type=int, default=20000, help='creates per run')
+    parser.add_argument('--clients', type=int, default=8, help='concurrent clients')
+    parser.add_argument('--dir', default=None, help='directory for the database (put it on the disk to test)')
+    args = parser.parse_args()
+
+    print(f'{args.writes} creates from {args.clients} clients')
+    print(f"{'mode':<14} {'accepted/s':>11} {'written/s':>11}")
+    for mode in MODES:
+        accepted, written = measure(mode, args.clients, args.writes, args.dir)
+        print(f'{mode:<14} {accepted:>11.0f} {written:>11.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""
+Shared helpers for the user-service benchmarks
+"""
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+# Add the service root to the path so `src` imports resolve
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.main import create_app
+
+
+@contextmanager
+def temp_app(dir=None, **config):
+    """Yield an application backed by a throwaway SQLite file under ``dir``."""
+    tmpdir = tempfile.mkdtemp(dir=dir)
+    settings = {
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tmpdir, 'bench.db')}",
+    }
+    settings.update(config)
+    app = create_app(settings)
+    try:
+        yield app
+    finally:
+        writer = app.extensions.get('group_commit')
+        if writer is not None:
+            writer.stop()
+        write_behind = app.extensions.get('write_behind')
+        if write_behind is not None:
+            write_behind.close()
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+def run_clients(clients, ops_per_client, operation):
+    """Run ``operation(client_index, op_index)`` from ``clients`` threads.
+
+    Returns the achieved operations per second.
+    """
+    barrier = threading.Barrier(clients + 1)
+
+    def worker(client_index):
+        barrier.wait()
+        for op_index in range(ops_per_client):
+            operation(client_index, op_index)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return clients * ops_per_client / elapsed
@@ -0,0 +1,63 @@
+"""
+Soak Test
+Runs a long mixed workload and flags object types whose counts only grow
+
+Usage: python benchmarks/soak.py [--ops 1000000] [--sample-every 50000] [--backend memory]
+                                 [--min-growth 100] [--no-trace] [--profile]
+
+Exits with status 1 when a type grows monotonically, so it can gate a nightly job.
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from common import temp_app
+
+from src.services.soak import SoakRunner, find_monotonic_growth
+
+
+def print_sample(sample):
+    rate = sample.operations / sample.elapsed if sample.elapsed else 0
+    traced = f'{sample.traced / 1e6:>10.2f} MB' if sample.traced is not None else f"{'-':>13}"
+    print(f'{sample.operations:>10} {rate:>10.0f} op/s {traced} {sum(sample.objects.values()):>12} objects',
+          flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--ops', type=int, default=1_000_000, help='operations to run')
+    parser.add_argument('--sample-every', type=int, default=50_000, help='operations between samples')
+    parser.add_argument('--backend', default='memory', help='USER_STORAGE_BACKEND to soak')
+    parser.add_argument('--max-users', type=int, default=1000, help='size of the live data set')
+    parser.add_argument('--min-growth', type=int, default=100, help='objects a type must gain to be flagged')
+    parser.add_argument('--no-trace', action='store_true', help='skip tracemalloc for a faster run')
+    parser.add_argument('--profile', action='store_true', help='also report allocation per endpoint')
+    args = parser.parse_args()
+
+    with temp_app(USER_STORAGE_BACKEND=args.backend, MEMORY_PROFILING_ENABLED=args.profile) as app:
+        print(f"{'ops':>10} {'rate':>15} {'traced':>13} {'gc objects':>20}")
+        samples = SoakRunner(app, max_users=args.max_users).run(args.ops, args.sample_every,
+                                                                on_sample=print_sample, trace=not args.no_trace)
+        if args.profile:
+            report = app.extensions['memory_profile'].report()
+            print('\nper endpoint (bytes):')
+            for endpoint, stats in report['endpoints'].items():
+                print(f"  {endpoint:<32} net mean {stats['net_mean']:>10.0f}  peak max {stats['peak_max']:>10}")
+            print('top allocation sites:')
+            for site in report['top_allocations']:
+                print(f"  {site['file']}:{site['line']}  {site['size']} B in {site['count']} blocks")
+
+    flagged = find_monotonic_growth(samples, min_growth=args.min_growth)
+    if not flagged:
+        print('\nno monotonic growth detected')
+        return 0
+    print('\nmonotonic growth detected:')
+    for name, counts in sorted(flagged.items(), key=lambda item: item[1][0] - item[1][-1]):
+        print(f'  {name:<40} {counts[0]} -> {counts[-1]}')
+    return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
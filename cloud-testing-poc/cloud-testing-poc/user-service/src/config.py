@@ -0,0 +1,32 @@
+import os
+
+
+def env_bool(name, default=False):
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+def env_float(name, default):
+    value = os.environ.get(name)
+    return float(value) if value else default
+
+
+def env_str(name, default):
+    return os.environ.get(name) or default
+
+
+def debug_routes_enabled(app):
+    """Whether extensions that are on by default expose their ``/api/debug`` routes.
+
+    Off unless ``DEBUG_ROUTES_ENABLED`` is set, since the routes have no
+    authentication. Opt-in extensions register theirs when enabled.
+    """
+    app.config.setdefault('DEBUG_ROUTES_ENABLED', env_bool('DEBUG_ROUTES_ENABLED'))
+    return app.config['DEBUG_ROUTES_ENABLED']
@@ -4,36 +4,80 @@ import sys
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
 from flask import Flask, send_from_directory
+from src.middleware.access_log import access_log
+from src.middleware.admission import admission
+from src.middleware.memory_profile import memory_profiler
+from src.middleware.server_timing import server_timing
+from src.middleware.single_flight import single_flight
+from src.middleware.tracing import tracing
+from src.middleware.validation import request_validation
 from src.models.user import db
+from src.repositories.backend import storage
+from src.routes.job import job_bp
 from src.routes.user import user_bp
+from src.services.group_commit import group_commit
+from src.services.jobs import jobs
+from src.services.reconcile import count_reconciler
+from src.services.rw_split import rw_split
+from src.services.negative_cache import missing_user_cache
+from src.services.snapshot import user_list_snapshot
+from src.services.uniqueness import uniqueness_precheck
+from src.services.write_behind import write_behind
 
-app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
-app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
-
-app.register_blueprint(user_bp, url_prefix='/api')
-
-# uncomment if you need to use database
-app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db.init_app(app)
-with app.app_context():
-    db.create_all()
-
-@app.route('/', defaults={'path': ''})
-@app.route('/<path:path>')
-def serve(path):
-    static_folder_path = app.static_folder
-    if static_folder_path is None:
-            return "Static folder not configured", 404
-
-    if path != "" and os.path.exists(os.path.join(static_folder_path, path)):
-        return send_from_directory(static_folder_path, path)
-    else:
-        index_path = os.path.join(static_folder_path, 'index.html')
-        if os.path.exists(index_path):
-            return send_from_directory(static_folder_path, 'index.html')
+
+def create_app(config=None):
+    app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
+    app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
+
+    # uncomment if you need to use database
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    if config:
+        app.config.update(config)
+
+    tracing.init_app(app)
+    server_timing.init_app(app)
+    access_log.init_app(app)
+    admission.init_app(app)
+    memory_profiler.init_app(app)
+    single_flight.init_app(app)
+    app.register_blueprint(user_bp, url_prefix='/api')
+    app.register_blueprint(job_bp, url_prefix='/api')
+
+    rw_split.init_app(app)
+    db.init_app(app)
+    storage.init_app(app)
+    request_validation.init_app(app)
+    group_commit.init_app(app)
+    count_reconciler.init_app(app)
+    user_list_snapshot.init_app(app)
+    missing_user_cache.init_app(app)
+    with app.app_context():
+        db.create_all()
+    jobs.init_app(app)
+    uniqueness_precheck.init_app(app)
+    write_behind.init_app(app)
+
+    @app.route('/', defaults={'path': ''})
+    @app.route('/<path:path>')
+    def serve(path):
+        static_folder_path = app.static_folder
+        if static_folder_path is None:
+                return "Static folder not configured", 404
+
+        if path != "" and os.path.exists(os.path.join(static_folder_path, path)):
+            return send_from_directory(static_folder_path, path)
         else:
-            return "index.html not found", 404
+            index_path = os.path.join(static_folder_path, 'index.html')
+            if os.path.exists(index_path):
+                return send_from_directory(static_folder_path, 'index.html')
+            else:
+                return "index.html not found", 404
+
+    return app
+
+
+app = create_app()
 
 
 if __name__ == '__main__':
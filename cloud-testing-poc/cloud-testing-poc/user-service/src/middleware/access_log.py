@@ -0,0 +1,164 @@
+import atexit
+import json
+import random
+import re
+import sys
+import time
+
+from flask import current_app, g, jsonify, request
+
+from src.config import env_bool, env_float, env_int, env_str
+from src.middleware import db_timing
+from src.services.batch_writer import BatchWriter
+
+REQUEST_ID_HEADER = 'X-Request-ID'
+# Client-supplied ids are echoed into logs, so only plain tokens are trusted.
+REQUEST_ID_PATTERN = re.compile(r'[A-Za-z0-9._:-]{1,128}')
+
+
+def parse_sample_rates(value):
+    """Parse ``"GET /api/users=0.1,GET /api/users/<int:user_id>=0.5"``.
+
+    Keys are the method and URL rule of a route; a rate of 0.1 logs one
+    successful request in ten.
+    """
+    rates = {}
+    for item in filter(None, (part.strip() for part in value.split(','))):
+        route, sep, rate = item.rpartition('=')
+        if not sep:
+            raise ValueError(f'expected ROUTE=RATE, got {item!r}')
+        rates[route.strip()] = min(1.0, max(0.0, float(rate)))
+    return rates
+
+
+class AccessLogWriter(BatchWriter):
+    """Writes access log records to ``stream`` as JSON lines, a batch per write."""
+
+    thread_name = 'access-log'
+
+    def __init__(self, stream, **kwargs):
+        self.stream = stream
+        super().__init__(**kwargs)
+
+    def write_batch(self, batch):
+        self.stream.write(''.join(json.dumps(record, separators=(',', ':')) + '\n' for record in batch))
+        self.stream.flush()
+
+
+class AccessLogState:
+    __slots__ = ('writer', 'sample_rates', 'sampled_out')
+
+    def __init__(self, writer, sample_rates):
+        self.writer = writer
+        self.sample_rates = sample_rates
+        self.sampled_out = 0
+
+
+class AccessLog:
+    """Structured JSON access log written off the request thread.
+
+    Off unless ``ACCESS_LOG_ENABLED`` is set. Every request then gets a
+    request id (taken from ``X-Request-ID`` when the client sent a usable
+    one) that is echoed in the response. When the
+    response has been sent, a record with method, route, status, latency,
+    database time and statement count, response bytes and request id goes
+    to an :class:`AccessLogWriter` writing to ``ACCESS_LOG_PATH`` (``-`` is
+    stderr).
+
+    ``ACCESS_LOG_SAMPLE_RATES`` thins out high-volume routes; errors
+    (status 400 and above) are always logged, and sampled records carry
+    their ``sample_rate`` so counts can be scaled back up. ``GET
+    /api/debug/access-log`` reports how many records were written, sampled
+    out and dropped. Should be initialised before other request hooks so
+    latency covers them and requests they reject are logged too.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('ACCESS_LOG_ENABLED', env_bool('ACCESS_LOG_ENABLED'))
+        app.config.setdefault('ACCESS_LOG_PATH', env_str('ACCESS_LOG_PATH', '-'))
+        app.config.setdefault('ACCESS_LOG_QUEUE_SIZE', env_int('ACCESS_LOG_QUEUE_SIZE', 10000))
+        app.config.setdefault('ACCESS_LOG_BATCH_SIZE', env_int('ACCESS_LOG_BATCH_SIZE', 256))
+        app.config.setdefault('ACCESS_LOG_FLUSH_INTERVAL', env_float('ACCESS_LOG_FLUSH_INTERVAL', 0.5))
+        app.config.setdefault('ACCESS_LOG_SAMPLE_RATES', env_str('ACCESS_LOG_SAMPLE_RATES', ''))
+
+        if not app.config['ACCESS_LOG_ENABLED']:
+            return
+
+        path = app.config['ACCESS_LOG_PATH']
+        stream = sys.stderr if path == '-' else open(path, 'a', encoding='utf-8', buffering=1 << 16)
+        writer = AccessLogWriter(stream, queue_size=app.config['ACCESS_LOG_QUEUE_SIZE'],
+                                 batch_size=app.config['ACCESS_LOG_BATCH_SIZE'],
+                                 flush_interval=app.config['ACCESS_LOG_FLUSH_INTERVAL'])
+        atexit.register(writer.close)
+        app.extensions['access_log'] = AccessLogState(writer, parse_sample_rates(app.config['ACCESS_LOG_SAMPLE_RATES']))
+
+        db_timing.install()
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.add_url_rule('/api/debug/access-log', 'access_log_stats', self._stats, methods=['GET'])
+
+    @staticmethod
+    def _before_request():
+        g.request_id = request_id = _request_id()
+        g.access_log = (time.perf_counter(), request_id, db_timing.begin_request())
+
+    @staticmethod
+    def _after_request(response):
+        entry = g.pop('access_log', None)
+        if entry is None:
+            return response
+        start, request_id, stats = entry
+        # Resolve the context proxies once; each access costs a lookup.
+        req = request._get_current_object()
+        state = current_app.extensions['access_log']
+        response.headers[REQUEST_ID_HEADER] = request_id
+        route = req.url_rule.rule if req.url_rule is not None else '<unmatched>'
+        rate = state.sample_rates.get(f'{req.method} {route}', 1.0) if state.sample_rates else 1.0
+        if response.status_code < 400 and rate < 1.0 and random.random() >= rate:
+            state.sampled_out += 1
+            return response
+
+        record = {
+            'ts': time.time(),
+            'request_id': request_id,
+            'method': req.method,
+            'route': route,
+            'path': req.path,
+            'status': response.status_code,
+            'bytes': response.content_length,
+        }
+        if rate < 1.0:
+            record['sample_rate'] = rate
+        writer = state.writer
+
+        # Streamed bodies are produced after this hook returns, so the record
+        # is completed once the server has finished sending the response.
+        def finish():
+            record['latency_ms'] = round((time.perf_counter() - start) * 1000, 3)
+            record['db_ms'] = round(stats.seconds * 1000, 3)
+            record['db_statements'] = stats.count
+            writer.submit(record)
+
+        response.call_on_close(finish)
+        return response
+
+    @staticmethod
+    def _stats():
+        state = current_app.extensions['access_log']
+        return jsonify(dict(state.writer.stats(), sampled_out=state.sampled_out))
+
+
+def _request_id():
+    value = request.headers.get(REQUEST_ID_HEADER)
+    if value and REQUEST_ID_PATTERN.fullmatch(value):
+        return value
+    # Ids only need to be unique, not unguessable; os.urandom-backed uuid4
+    # costs a syscall per request.
+    return f'{random.getrandbits(128):032x}'
+
+
+access_log = AccessLog()
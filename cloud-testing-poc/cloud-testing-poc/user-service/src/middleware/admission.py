@@ -0,0 +1,217 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, g, jsonify, request
+
+from src.config import env_bool, env_float, env_int
+
+READ_METHODS = frozenset(('GET', 'HEAD', 'OPTIONS'))
+
+
+class TokenBucket:
+    """Token bucket that refills lazily whenever it is consulted."""
+
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate, capacity, now):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def take(self, now, cost=1.0):
+        """Consume ``cost`` tokens.
+
+        Returns 0 when the tokens were taken, otherwise the number of
+        seconds until enough tokens will have accumulated.
+        """
+        elapsed = now - self.updated
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.updated = now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        if self.rate <= 0:
+            return math.inf
+        return (cost - self.tokens) / self.rate
+
+    def refund(self, cost=1.0):
+        self.tokens = min(self.capacity, self.tokens + cost)
+
+
+class ClientBuckets:
+    """Per-client buckets kept in LRU order so memory stays bounded."""
+
+    def __init__(self, rate, capacity, max_clients):
+        self.rate = rate
+        self.capacity = capacity
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def get(self, key, now):
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(self.rate, self.capacity, now)
+            self._buckets[key] = bucket
+            if len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket
+
+
+class Rejection:
+    __slots__ = ('status', 'retry_after', 'reason')
+
+    def __init__(self, status, retry_after, reason):
+        self.status = status
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class AdmissionState:
+    """Limiter state for one application.
+
+    Every check is a handful of dict operations and float arithmetic under
+    a single lock, so admission costs O(1) per request.
+    """
+
+    def __init__(self, config, clock=time.monotonic):
+        self.clock = clock
+        self.max_in_flight = config['ADMISSION_MAX_IN_FLIGHT']
+        self.shed_retry_after = config['ADMISSION_SHED_RETRY_AFTER']
+        now = clock()
+        max_clients = config['ADMISSION_MAX_CLIENTS']
+        self.client_reads = ClientBuckets(config['ADMISSION_CLIENT_READ_RATE'],
+                                          config['ADMISSION_CLIENT_READ_BURST'], max_clients)
+        self.client_writes = ClientBuckets(config['ADMISSION_CLIENT_WRITE_RATE'],
+                                           config['ADMISSION_CLIENT_WRITE_BURST'], max_clients)
+        self.global_reads = TokenBucket(config['ADMISSION_GLOBAL_READ_RATE'],
+                                        config['ADMISSION_GLOBAL_READ_BURST'], now)
+        self.global_writes = TokenBucket(config['ADMISSION_GLOBAL_WRITE_RATE'],
+                                         config['ADMISSION_GLOBAL_WRITE_BURST'], now)
+        self.in_flight = 0
+        self.queues = []
+        self.rejected = {'rate_limited': 0, 'shed': 0}
+        self._lock = threading.Lock()
+
+    def add_queue(self, depth, limit):
+        """Shed load while ``depth()`` is at or above ``limit``.
+
+        Lets components that buffer work (writers, job runners) take part
+        in load shedding alongside the in-flight request count.
+        """
+        self.queues.append((depth, limit))
+
+    def admit(self, client, is_write):
+        """Admit a request or return the :class:`Rejection` explaining why not."""
+        with self._lock:
+            if self.in_flight >= self.max_in_flight or self._queues_full():
+                self.rejected['shed'] += 1
+                return Rejection(503, self.shed_retry_after, 'overloaded')
+
+            now = self.clock()
+            if is_write:
+                client_bucket = self.client_writes.get(client, now)
+                global_bucket = self.global_writes
+            else:
+                client_bucket = self.client_reads.get(client, now)
+                global_bucket = self.global_reads
+
+            wait = client_bucket.take(now)
+            if not wait:
+                wait = global_bucket.take(now)
+                if wait:
+                    client_bucket.refund()
+            if wait:
+                self.rejected['rate_limited'] += 1
+                return Rejection(429, wait, 'rate limited')
+
+            self.in_flight += 1
+            return None
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def _queues_full(self):
+        for depth, limit in self.queues:
+            if depth() >= limit:
+                return True
+        return False
+
+
+class AdmissionController:
+    """Token-bucket rate limiting and load shedding for the API.
+
+    Requests under ``ADMISSION_PATH_PREFIX`` draw from a per-client and a
+    global bucket, with separate budgets for reads and writes. When too
+    much work is already in flight the request is shed with a 503 before
+    it reaches the database.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('ADMISSION_CONTROL_ENABLED', env_bool('ADMISSION_CONTROL_ENABLED'))
+        app.config.setdefault('ADMISSION_PATH_PREFIX', '/api/')
+        app.config.setdefault('ADMISSION_CLIENT_HEADER', None)
+        app.config.setdefault('ADMISSION_MAX_CLIENTS', env_int('ADMISSION_MAX_CLIENTS', 10000))
+        app.config.setdefault('ADMISSION_MAX_IN_FLIGHT', env_int('ADMISSION_MAX_IN_FLIGHT', 64))
+        app.config.setdefault('ADMISSION_SHED_RETRY_AFTER', env_float('ADMISSION_SHED_RETRY_AFTER', 1.0))
+        app.config.setdefault('ADMISSION_CLIENT_READ_RATE', env_float('ADMISSION_CLIENT_READ_RATE', 50.0))
+        app.config.setdefault('ADMISSION_CLIENT_READ_BURST', env_float('ADMISSION_CLIENT_READ_BURST', 100.0))
+        app.config.setdefault('ADMISSION_CLIENT_WRITE_RATE', env_float('ADMISSION_CLIENT_WRITE_RATE', 10.0))
+        app.config.setdefault('ADMISSION_CLIENT_WRITE_BURST', env_float('ADMISSION_CLIENT_WRITE_BURST', 20.0))
+        app.config.setdefault('ADMISSION_GLOBAL_READ_RATE', env_float('ADMISSION_GLOBAL_READ_RATE', 1000.0))
+        app.config.setdefault('ADMISSION_GLOBAL_READ_BURST', env_float('ADMISSION_GLOBAL_READ_BURST', 2000.0))
+        app.config.setdefault('ADMISSION_GLOBAL_WRITE_RATE', env_float('ADMISSION_GLOBAL_WRITE_RATE', 200.0))
+        app.config.setdefault('ADMISSION_GLOBAL_WRITE_BURST', env_float('ADMISSION_GLOBAL_WRITE_BURST', 400.0))
+
+        if not app.config['ADMISSION_CONTROL_ENABLED']:
+            return
+
+        app.extensions['admission'] = AdmissionState(app.config)
+        app.before_request(self._before_request)
+        app.teardown_request(self._teardown_request)
+
+    @staticmethod
+    def _before_request():
+        if not request.path.startswith(current_app.config['ADMISSION_PATH_PREFIX']):
+            return None
+
+        state = current_app.extensions['admission']
+        rejection = state.admit(_client_key(), request.method not in READ_METHODS)
+        if rejection is None:
+            g.admitted = True
+            return None
+
+        response = jsonify({'error': rejection.reason})
+        response.status_code = rejection.status
+        response.headers['Retry-After'] = str(max(1, math.ceil(min(rejection.retry_after, 3600))))
+        return response
+
+    @staticmethod
+    def _teardown_request(exc):
+        if g.pop('admitted', False):
+            current_app.extensions['admission'].release()
+
+
+def _client_key():
+    header = current_app.config['ADMISSION_CLIENT_HEADER']
+    if header:
+        value = request.headers.get(header)
+        if value:
+            return value
+    return request.remote_addr or 'anonymous'
+
+
+admission = AdmissionController()
@@ -0,0 +1,62 @@
+import threading
+import time
+
+from flask import g, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class StatementStats:
+    """SQL statements executed on behalf of one request and their total time."""
+
+    __slots__ = ('count', 'seconds')
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+
+def begin_request():
+    """Start counting statements for the current request, if not already."""
+    if 'db_stats' not in g:
+        g.db_stats = StatementStats()
+    return g.db_stats
+
+
+def current_stats():
+    """The current request's :class:`StatementStats`, or None outside one."""
+    return g.get('db_stats') if has_request_context() else None
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None and current_stats() is not None:
+        context._statement_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, '_statement_start', None)
+    if start is None:
+        return
+    stats = current_stats()
+    if stats is not None:
+        stats.count += 1
+        stats.seconds += time.perf_counter() - start
+
+
+_install_lock = threading.Lock()
+_installed = False
+
+
+def install():
+    """Time cursor executions on every engine, once per process.
+
+    Statements run outside a request (the group-commit writer, background
+    jobs) are not attributed to anything.
+    """
+    global _installed
+    with _install_lock:
+        if _installed:
+            return
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        _installed = True
@@ -0,0 +1,170 @@
+import threading
+import tracemalloc
+
+from flask import current_app, g, jsonify, request
+
+from src.config import env_bool, env_int
+
+# Allocations made by the profiler itself or by imports are noise when
+# hunting for what a request retains.
+SNAPSHOT_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    tracemalloc.Filter(False, '<unknown>'),
+)
+
+
+class EndpointMemory:
+    """Running allocation totals for one endpoint."""
+
+    __slots__ = ('requests', 'net_total', 'net_max', 'peak_total', 'peak_max')
+
+    def __init__(self):
+        self.requests = 0
+        self.net_total = 0
+        self.net_max = 0
+        self.peak_total = 0
+        self.peak_max = 0
+
+    def add(self, net, peak):
+        self.requests += 1
+        self.net_total += net
+        self.net_max = max(self.net_max, net)
+        self.peak_total += peak
+        self.peak_max = max(self.peak_max, peak)
+
+    def to_dict(self):
+        return {
+            'requests': self.requests,
+            'net_mean': self.net_total / self.requests,
+            'net_max': self.net_max,
+            'net_total': self.net_total,
+            'peak_mean': self.peak_total / self.requests,
+            'peak_max': self.peak_max,
+        }
+
+
+class MemoryProfile:
+    """Per-endpoint allocation statistics for one application.
+
+    ``net`` is how much more memory is traced after a request than before
+    it, i.e. what the request left behind; ``peak`` is the high-water mark
+    above the starting point while it ran. tracemalloc counts the whole
+    process, so the numbers are exact when requests run one at a time (a
+    profiling run) and approximate under concurrency.
+    """
+
+    def __init__(self, top=10):
+        self.top = top
+        self.endpoints = {}
+        self.baseline = None
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, net, peak):
+        with self._lock:
+            stats = self.endpoints.get(endpoint)
+            if stats is None:
+                stats = self.endpoints[endpoint] = EndpointMemory()
+            stats.add(net, peak)
+
+    def take_baseline(self):
+        self.baseline = take_snapshot()
+
+    def report(self, limit=None):
+        limit = limit or self.top
+        snapshot = take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        with self._lock:
+            endpoints = {name: stats.to_dict() for name, stats in sorted(self.endpoints.items())}
+        report = {
+            'traced': {'current': current, 'peak': peak},
+            'endpoints': endpoints,
+            'top_allocations': top_allocation_sites(snapshot, limit),
+        }
+        if self.baseline is not None:
+            report['growth_since_baseline'] = allocation_growth(self.baseline, snapshot, limit)
+        return report
+
+
+def take_snapshot():
+    return tracemalloc.take_snapshot().filter_traces(SNAPSHOT_FILTERS)
+
+
+def _site(frame):
+    return {'file': frame.filename, 'line': frame.lineno}
+
+
+def top_allocation_sites(snapshot, limit=10):
+    """The source lines holding the most traced memory in ``snapshot``."""
+    return [dict(_site(stat.traceback[0]), size=stat.size, count=stat.count)
+            for stat in snapshot.statistics('lineno')[:limit]]
+
+
+def allocation_growth(before, after, limit=10):
+    """The source lines whose traced memory grew the most between snapshots."""
+    diffs = [diff for diff in after.compare_to(before, 'lineno') if diff.size_diff > 0]
+    return [dict(_site(diff.traceback[0]), size_diff=diff.size_diff, count_diff=diff.count_diff)
+            for diff in diffs[:limit]]
+
+
+class MemoryProfiler:
+    """tracemalloc-based allocation tracking per endpoint.
+
+    Enabled with ``MEMORY_PROFILING_ENABLED``. Tracing slows every
+    allocation down, so this is meant for profiling and soak runs rather
+    than production. ``GET /api/debug/memory`` reports per-endpoint net and
+    peak allocation plus the top allocation sites; ``POST
+    /api/debug/memory/baseline`` snapshots the heap so later reports also
+    list the sites that grew since then.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('MEMORY_PROFILING_ENABLED', env_bool('MEMORY_PROFILING_ENABLED'))
+        app.config.setdefault('MEMORY_PROFILING_FRAMES', env_int('MEMORY_PROFILING_FRAMES', 1))
+        app.config.setdefault('MEMORY_PROFILING_TOP', env_int('MEMORY_PROFILING_TOP', 10))
+
+        if not app.config['MEMORY_PROFILING_ENABLED']:
+            return
+
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(app.config['MEMORY_PROFILING_FRAMES'])
+        app.extensions['memory_profile'] = MemoryProfile(top=app.config['MEMORY_PROFILING_TOP'])
+        app.before_request(self._before_request)
+        app.teardown_request(self._teardown_request)
+        app.add_url_rule('/api/debug/memory', 'memory_report', self._report, methods=['GET'])
+        app.add_url_rule('/api/debug/memory/baseline', 'memory_baseline', self._baseline, methods=['POST'])
+
+    @staticmethod
+    def _before_request():
+        if request.endpoint in ('memory_report', 'memory_baseline'):
+            return
+        tracemalloc.reset_peak()
+        g.memory_start = tracemalloc.get_traced_memory()[0]
+
+    @staticmethod
+    def _teardown_request(exc):
+        start = g.pop('memory_start', None)
+        if start is None:
+            return
+        current, peak = tracemalloc.get_traced_memory()
+        rule = request.url_rule.rule if request.url_rule is not None else '<unmatched>'
+        current_app.extensions['memory_profile'].record(f'{request.method} {rule}',
+                                                        current - start, max(0, peak - start))
+
+    @staticmethod
+    def _report():
+        limit = request.args.get('limit', type=int)
+        return jsonify(current_app.extensions['memory_profile'].report(limit))
+
+    @staticmethod
+    def _baseline():
+        current_app.extensions['memory_profile'].take_baseline()
+        return '', 204
+
+
+memory_profiler = MemoryProfiler()
@@ -0,0 +1,57 @@
+import time
+
+from flask import has_request_context
+from flask.json.provider import DefaultJSONProvider
+
+ARRIVAL_KEY = 'request_timing.arrival_ns'
+
+_serialize_listeners = []
+
+
+class _StampArrival:
+    """WSGI wrapper noting when a request arrived, before Flask routes it."""
+
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+
+    def __call__(self, environ, start_response):
+        # The outermost wrapper stamps first and wins.
+        environ.setdefault(ARRIVAL_KEY, time.time_ns())
+        return self.wsgi_app(environ, start_response)
+
+
+def stamp_arrival(app):
+    """Record each request's arrival time (``time.time_ns()``) in its WSGI environ."""
+    if not isinstance(app.wsgi_app, _StampArrival):
+        app.wsgi_app = _StampArrival(app.wsgi_app)
+
+
+def arrival_ns(environ):
+    """When the request arrived, or None if the app does not stamp arrivals."""
+    return environ.get(ARRIVAL_KEY)
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """JSON provider that reports each encoding done during a request.
+
+    Listeners are called as ``listener(start_ns, duration_ns, size)`` and
+    must look up their own per-request state.
+    """
+
+    def dumps(self, obj, **kwargs):
+        if not _serialize_listeners or not has_request_context():
+            return super().dumps(obj, **kwargs)
+        start = time.time_ns()
+        encoded = super().dumps(obj, **kwargs)
+        duration = time.time_ns() - start
+        for listener in _serialize_listeners:
+            listener(start, duration, len(encoded))
+        return encoded
+
+
+def on_serialize(app, listener):
+    """Call ``listener`` after each JSON encoding done in ``app``'s requests."""
+    if not isinstance(app.json, TimedJSONProvider):
+        app.json = TimedJSONProvider(app)
+    if listener not in _serialize_listeners:
+        _serialize_listeners.append(listener)
@@ -0,0 +1,110 @@
+import time
+
+from flask import g, has_request_context, request
+
+from src.config import env_bool
+from src.middleware import db_timing, request_timing
+
+SERVER_TIMING_HEADER = 'Server-Timing'
+
+
+class RequestPhases:
+    """Where one request's time went, in nanoseconds."""
+
+    __slots__ = ('arrival_ns', 'routed_ns', 'serialize_ns', 'serialize_count', 'cache_lookups', 'db')
+
+    def __init__(self, arrival_ns, routed_ns, db):
+        self.arrival_ns = arrival_ns
+        self.routed_ns = routed_ns
+        self.serialize_ns = 0
+        self.serialize_count = 0
+        self.cache_lookups = []
+        self.db = db
+
+
+def current_phases():
+    """The current request's :class:`RequestPhases`, or None when not timed."""
+    return g.get('server_timing') if has_request_context() else None
+
+
+def record_cache(name, hit, seconds=None):
+    """Report a cache lookup made for the current request."""
+    phases = current_phases()
+    if phases is not None:
+        phases.cache_lookups.append((name, hit, seconds))
+
+
+def _add_serialize(start_ns, duration_ns, size):
+    phases = current_phases()
+    if phases is not None:
+        phases.serialize_ns += duration_ns
+        phases.serialize_count += 1
+
+
+def _ms(ns):
+    return f'{ns / 1e6:.3f}'
+
+
+def format_server_timing(phases, now_ns):
+    metrics = [
+        f'routing;dur={_ms(phases.routed_ns - phases.arrival_ns)}',
+        f'db;dur={phases.db.seconds * 1000:.3f};desc="{phases.db.count} statements"',
+    ]
+    if phases.serialize_count:
+        metrics.append(f'serialize;dur={_ms(phases.serialize_ns)}')
+    for name, hit, seconds in phases.cache_lookups:
+        lookup = f'cache;desc="{name} {"hit" if hit else "miss"}"'
+        metrics.append(lookup if seconds is None else f'{lookup};dur={seconds * 1000:.3f}')
+    metrics.append(f'total;dur={_ms(now_ns - phases.arrival_ns)}')
+    return ', '.join(metrics)
+
+
+class ServerTiming:
+    """``Server-Timing`` response headers showing where API requests spent their time.
+
+    Each ``/api/`` response reports ``routing`` (WSGI entry to the first
+    request hook), ``db`` with the statement count, ``serialize`` (JSON
+    encoding), one ``cache`` entry per lookup reported through
+    :func:`record_cache`, and ``total`` up to the point the headers are
+    written, so a streamed body is not included. Browsers show these in
+    the network panel and ``PerformanceResourceTiming.serverTiming``.
+
+    On unless ``SERVER_TIMING_ENABLED`` is false, which hardened
+    deployments should set: the timings tell a client how much work a
+    request caused. Should be initialised before other request hooks so
+    ``total`` covers them.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SERVER_TIMING_ENABLED', env_bool('SERVER_TIMING_ENABLED', True))
+        if not app.config['SERVER_TIMING_ENABLED']:
+            return
+
+        db_timing.install()
+        request_timing.stamp_arrival(app)
+        request_timing.on_serialize(app, _add_serialize)
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+
+    @staticmethod
+    def _before_request():
+        req = request._get_current_object()
+        if not req.path.startswith('/api/'):
+            return
+        now = time.time_ns()
+        arrival = request_timing.arrival_ns(req.environ) or now
+        g.server_timing = RequestPhases(arrival, now, db_timing.begin_request())
+
+    @staticmethod
+    def _after_request(response):
+        phases = g.pop('server_timing', None)
+        if phases is not None:
+            response.headers[SERVER_TIMING_HEADER] = format_server_timing(phases, time.time_ns())
+        return response
+
+
+server_timing = ServerTiming()
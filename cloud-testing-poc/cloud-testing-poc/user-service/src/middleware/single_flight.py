@@ -0,0 +1,137 @@
+import threading
+
+from flask import current_app, jsonify, request
+
+from src.config import debug_routes_enabled, env_bool, env_float
+from src.middleware.server_timing import record_cache
+from src.middleware.tracing import span
+from src.repositories.backend import get_user_repository
+
+
+class Flight:
+    """One in-progress computation and, once done, its encoded response."""
+
+    __slots__ = ('done', 'result', 'waiters')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.waiters = 0
+
+
+class FlightGroup:
+    """In-flight computations by key, with counts of how often they were shared."""
+
+    def __init__(self, timeout):
+        self.timeout = timeout
+        self.leaders = 0
+        self.coalesced = 0
+        self.fallbacks = 0
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, build):
+        """Return ``build()``'s response, or a copy of one already being built for ``key``.
+
+        The first caller for a key builds; callers arriving while it runs
+        wait for its status, headers and body. If the build fails, streams
+        its body or takes longer than the timeout, waiters build their own.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = Flight()
+                self.leaders += 1
+            else:
+                flight.waiters += 1
+
+        if leader:
+            try:
+                response = build()
+                if not response.is_streamed:
+                    flight.result = (response.get_data(), response.status_code, list(response.headers.items()))
+                return response
+            finally:
+                with self._lock:
+                    del self._flights[key]
+                flight.done.set()
+
+        with span('single-flight.wait'):
+            flight.done.wait(self.timeout)
+        result = flight.result
+        with self._lock:
+            if result is None:
+                self.fallbacks += 1
+            else:
+                self.coalesced += 1
+        record_cache('single-flight', result is not None)
+        if result is None:
+            return build()
+        body, status, headers = result
+        return current_app.response_class(body, status=status, headers=headers)
+
+    def stats(self):
+        with self._lock:
+            served = self.leaders + self.coalesced
+            return {
+                'leaders': self.leaders,
+                'coalesced': self.coalesced,
+                'fallbacks': self.fallbacks,
+                'in_flight': len(self._flights),
+                'waiting': sum(flight.waiters for flight in self._flights.values()),
+                'coalescing_ratio': round(self.coalesced / served, 4) if served else 0.0,
+            }
+
+
+def coalesce(build):
+    """Serve ``build()`` for the current read, sharing it with identical concurrent reads.
+
+    Reads are identical when they hit the same endpoint with the same path
+    and query arguments while the repository is at the same write version,
+    so a read never receives a result computed before a write that had
+    already finished when it arrived. ``build`` must return an
+    unconditional response; apply ETag handling to what this returns.
+    """
+    group = current_app.extensions.get('single_flight')
+    if group is None:
+        return build()
+    req = request._get_current_object()
+    key = (req.endpoint, tuple(sorted(req.view_args.items())), tuple(sorted(req.args.items(multi=True))),
+           get_user_repository().version)
+    return group.do(key, build)
+
+
+class SingleFlight:
+    """Coalesces identical concurrent reads into one computation.
+
+    Views opt in by wrapping their response in :func:`coalesce`. When many
+    clients ask for the same page at once, one request runs the query and
+    encodes the body while the others wait and get a copy of its bytes.
+    On unless ``SINGLE_FLIGHT_ENABLED`` is false; a waiter gives up after
+    ``SINGLE_FLIGHT_TIMEOUT`` seconds and computes its own response. With
+    ``DEBUG_ROUTES_ENABLED``, ``GET /api/debug/single-flight`` reports
+    leaders, coalesced followers and the coalescing ratio.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SINGLE_FLIGHT_ENABLED', env_bool('SINGLE_FLIGHT_ENABLED', True))
+        app.config.setdefault('SINGLE_FLIGHT_TIMEOUT', env_float('SINGLE_FLIGHT_TIMEOUT', 5.0))
+
+        if not app.config['SINGLE_FLIGHT_ENABLED']:
+            return
+
+        app.extensions['single_flight'] = FlightGroup(app.config['SINGLE_FLIGHT_TIMEOUT'])
+        if debug_routes_enabled(app):
+            app.add_url_rule('/api/debug/single-flight', 'single_flight_stats', self._stats, methods=['GET'])
+
+    @staticmethod
+    def _stats():
+        return jsonify(current_app.extensions['single_flight'].stats())
+
+
+single_flight = SingleFlight()
@@ -0,0 +1,384 @@
+import atexit
+import json
+import random
+import re
+import sys
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+
+from flask import current_app, g, has_request_context, jsonify, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from src.config import env_bool, env_float, env_int, env_str
+from src.middleware import request_timing
+from src.services.batch_writer import BatchWriter
+
+TRACEPARENT_HEADER = 'traceparent'
+TRACEPARENT_PATTERN = re.compile(r'([0-9a-f]{2})-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})')
+INVALID_TRACE_ID = '0' * 32
+INVALID_SPAN_ID = '0' * 16
+SAMPLED_FLAG = 0x01
+
+# OTLP span kinds and status codes
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+SPAN_KIND_CLIENT = 3
+STATUS_ERROR = 2
+
+SCOPE_NAME = 'user-service.tracing'
+MAX_STATEMENT_LENGTH = 1000
+
+
+def parse_traceparent(value):
+    """Return ``(trace_id, parent_span_id, sampled)`` from a W3C traceparent, or None.
+
+    Versions above 00 may append fields, which are ignored as the spec asks.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    match = TRACEPARENT_PATTERN.match(value)
+    if match is None:
+        return None
+    version, trace_id, span_id, flags = match.groups()
+    if version == 'ff' or trace_id == INVALID_TRACE_ID or span_id == INVALID_SPAN_ID:
+        return None
+    if len(value) > 55 and (version == '00' or value[55] != '-'):
+        return None
+    return trace_id, span_id, bool(int(flags, 16) & SAMPLED_FLAG)
+
+
+def format_traceparent(trace_id, span_id, sampled=True):
+    return f'00-{trace_id}-{span_id}-{SAMPLED_FLAG if sampled else 0:02x}'
+
+
+# Trace and span ids only need to be unique; os.urandom costs a syscall.
+def new_trace_id():
+    return f'{random.getrandbits(128) or 1:032x}'
+
+
+def new_span_id():
+    return f'{random.getrandbits(64) or 1:016x}'
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+def _otlp_attributes(attributes):
+    return [{'key': key, 'value': _otlp_value(value)} for key, value in attributes.items()]
+
+
+class Span:
+    __slots__ = ('span_id', 'parent_id', 'name', 'kind', 'start_ns', 'end_ns', 'attributes', 'error')
+
+    def __init__(self, name, kind, parent_id, start_ns, attributes=None):
+        self.span_id = new_span_id()
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.start_ns = start_ns
+        self.end_ns = None
+        self.attributes = attributes or {}
+        self.error = None
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def set_error(self, message):
+        self.error = str(message)
+
+    def to_otlp(self, trace_id):
+        span = {
+            'traceId': trace_id,
+            'spanId': self.span_id,
+            'name': self.name,
+            'kind': self.kind,
+            'startTimeUnixNano': str(self.start_ns),
+            'endTimeUnixNano': str(self.end_ns if self.end_ns is not None else self.start_ns),
+            'attributes': _otlp_attributes(self.attributes),
+        }
+        if self.parent_id:
+            span['parentSpanId'] = self.parent_id
+        if self.error is not None:
+            span['status'] = {'code': STATUS_ERROR, 'message': self.error}
+        return span
+
+
+class Trace:
+    """The spans recorded for one sampled request.
+
+    Spans opened with :meth:`start_span` nest: each new span's parent is
+    the innermost open one, and the first span's parent is the caller's
+    span from ``traceparent``, if any.
+    """
+
+    __slots__ = ('trace_id', 'remote_parent_id', 'spans', '_open')
+
+    def __init__(self, trace_id, remote_parent_id=None):
+        self.trace_id = trace_id
+        self.remote_parent_id = remote_parent_id
+        self.spans = []
+        self._open = []
+
+    def _parent_id(self):
+        return self._open[-1].span_id if self._open else self.remote_parent_id
+
+    def start_span(self, name, kind=SPAN_KIND_INTERNAL, attributes=None, start_ns=None):
+        span = Span(name, kind, self._parent_id(), start_ns or time.time_ns(), attributes)
+        self.spans.append(span)
+        self._open.append(span)
+        return span
+
+    def end_span(self, span, end_ns=None):
+        span.end_ns = end_ns or time.time_ns()
+        if span in self._open:
+            self._open.remove(span)
+
+    def record_span(self, name, kind, start_ns, end_ns, attributes=None, error=None):
+        """Add an already finished leaf span under the innermost open span."""
+        span = Span(name, kind, self._parent_id(), start_ns, attributes)
+        span.end_ns = end_ns
+        span.error = error
+        self.spans.append(span)
+        return span
+
+
+def current_trace():
+    """The current request's :class:`Trace`, or None when it is not sampled."""
+    return g.get('trace') if has_request_context() else None
+
+
+@contextmanager
+def span(name, kind=SPAN_KIND_INTERNAL, **attributes):
+    """Time the block as a span of the current trace; a no-op when there is none.
+
+    Attribute names use dots, so pass them as ``**{'cache.hit': True}``.
+    """
+    trace = current_trace()
+    if trace is None:
+        yield None
+        return
+    current = trace.start_span(name, kind, attributes)
+    try:
+        yield current
+    except Exception as exc:
+        current.set_error(exc)
+        raise
+    finally:
+        trace.end_span(current)
+
+
+def otlp_request(service_name, traces):
+    """Build an OTLP/JSON ExportTraceServiceRequest from ``(trace_id, spans)`` pairs."""
+    return {
+        'resourceSpans': [{
+            'resource': {'attributes': _otlp_attributes({'service.name': service_name})},
+            'scopeSpans': [{
+                'scope': {'name': SCOPE_NAME},
+                'spans': [span.to_otlp(trace_id) for trace_id, spans in traces for span in spans],
+            }],
+        }],
+    }
+
+
+class OTLPExporter(BatchWriter):
+    """Exports finished traces in OTLP/JSON, one export request per batch.
+
+    ``target`` is either a file, which gets one ExportTraceServiceRequest
+    per line (``-`` is stderr), or an ``http(s)://`` URL of an OTLP/HTTP
+    collector's ``/v1/traces`` endpoint. Encoding and I/O happen on the
+    writer thread.
+    """
+
+    thread_name = 'trace-export'
+
+    def __init__(self, target, service_name='user-service', **kwargs):
+        self.service_name = service_name
+        self.url = target if target.startswith(('http://', 'https://')) else None
+        if self.url is None:
+            self.stream = sys.stderr if target == '-' else open(target, 'a', encoding='utf-8')
+        super().__init__(**kwargs)
+
+    def write_batch(self, batch):
+        payload = json.dumps(otlp_request(self.service_name, batch), separators=(',', ':'))
+        if self.url is None:
+            self.stream.write(payload + '\n')
+            self.stream.flush()
+            return
+        post = urllib.request.Request(self.url, data=payload.encode(), method='POST',
+                                      headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(post, timeout=5):
+            pass
+
+
+def _statement_attributes(conn, statement, executemany):
+    return {
+        'db.system': conn.dialect.name,
+        'db.operation': statement.lstrip().split(None, 1)[0].upper() if statement.strip() else '',
+        'db.statement': statement[:MAX_STATEMENT_LENGTH],
+        'db.executemany': executemany,
+    }
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None and current_trace() is not None:
+        context._trace_start_ns = time.time_ns()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, '_trace_start_ns', None)
+    trace = current_trace() if start is not None else None
+    if trace is not None:
+        attributes = _statement_attributes(conn, statement, executemany)
+        trace.record_span(attributes['db.operation'] or 'SQL', SPAN_KIND_CLIENT, start, time.time_ns(), attributes)
+
+
+def _handle_error(exception_context):
+    start = getattr(exception_context.execution_context, '_trace_start_ns', None)
+    trace = current_trace() if start is not None else None
+    if trace is not None and exception_context.statement is not None:
+        attributes = _statement_attributes(exception_context.connection, exception_context.statement, False)
+        trace.record_span(attributes['db.operation'] or 'SQL', SPAN_KIND_CLIENT, start, time.time_ns(),
+                          attributes, error=exception_context.original_exception)
+
+
+_install_lock = threading.Lock()
+_installed = False
+
+
+def _install_statement_spans():
+    global _installed
+    with _install_lock:
+        if _installed:
+            return
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(Engine, 'handle_error', _handle_error)
+        _installed = True
+
+
+def _serialize_span(start_ns, duration_ns, size):
+    trace = current_trace()
+    if trace is not None:
+        trace.record_span('serialize', SPAN_KIND_INTERNAL, start_ns, start_ns + duration_ns,
+                          {'serialize.format': 'json', 'serialize.bytes': size})
+
+
+class TracingState:
+    __slots__ = ('exporter', 'sample_rate', 'sampled', 'unsampled')
+
+    def __init__(self, exporter, sample_rate):
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+        self.sampled = 0
+        self.unsampled = 0
+
+
+class Tracing:
+    """Request tracing with W3C trace context and an OTLP/JSON exporter.
+
+    Enabled with ``TRACING_ENABLED``. A request continues the trace in its
+    ``traceparent`` header and honours the caller's sampling decision;
+    otherwise ``TRACING_SAMPLE_RATE`` decides up front, so unsampled
+    requests cost a header parse and a random number. A sampled request
+    records a server span for the whole request, a ``routing`` span from
+    WSGI entry to the first request hook, a client span per SQL statement
+    and a ``serialize`` span per JSON encoding; :func:`span` adds more (the
+    snapshot and negative caches record ``cache.snapshot`` and
+    ``cache.negative`` lookups with ``cache.hit``). Finished traces are
+    queued to an :class:`OTLPExporter` writing to ``TRACING_EXPORT``; a
+    full queue drops traces. ``GET /api/debug/tracing`` reports the counts.
+    Must be initialised before other request hooks so the server span
+    covers them.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('TRACING_ENABLED', env_bool('TRACING_ENABLED'))
+        app.config.setdefault('TRACING_SAMPLE_RATE', env_float('TRACING_SAMPLE_RATE', 1.0))
+        app.config.setdefault('TRACING_EXPORT', env_str('TRACING_EXPORT', 'traces.jsonl'))
+        app.config.setdefault('TRACING_SERVICE_NAME', env_str('TRACING_SERVICE_NAME', 'user-service'))
+        app.config.setdefault('TRACING_QUEUE_SIZE', env_int('TRACING_QUEUE_SIZE', 1000))
+        app.config.setdefault('TRACING_BATCH_SIZE', env_int('TRACING_BATCH_SIZE', 64))
+        app.config.setdefault('TRACING_FLUSH_INTERVAL', env_float('TRACING_FLUSH_INTERVAL', 1.0))
+
+        if not app.config['TRACING_ENABLED']:
+            return
+
+        exporter = OTLPExporter(app.config['TRACING_EXPORT'], service_name=app.config['TRACING_SERVICE_NAME'],
+                                queue_size=app.config['TRACING_QUEUE_SIZE'],
+                                batch_size=app.config['TRACING_BATCH_SIZE'],
+                                flush_interval=app.config['TRACING_FLUSH_INTERVAL'])
+        atexit.register(exporter.close)
+        app.extensions['tracing'] = TracingState(exporter, app.config['TRACING_SAMPLE_RATE'])
+
+        _install_statement_spans()
+        request_timing.stamp_arrival(app)
+        request_timing.on_serialize(app, _serialize_span)
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.add_url_rule('/api/debug/tracing', 'tracing_stats', self._stats, methods=['GET'])
+
+    @staticmethod
+    def _before_request():
+        state = current_app.extensions['tracing']
+        parent = parse_traceparent(request.headers.get(TRACEPARENT_HEADER))
+        sampled = parent[2] if parent is not None else random.random() < state.sample_rate
+        if not sampled:
+            state.unsampled += 1
+            return
+        state.sampled += 1
+
+        req = request._get_current_object()
+        now = time.time_ns()
+        start = request_timing.arrival_ns(req.environ) or now
+        trace = Trace(parent[0], parent[1]) if parent is not None else Trace(new_trace_id())
+        route = req.url_rule.rule if req.url_rule is not None else None
+        trace.start_span(f'{req.method} {route}' if route else req.method, SPAN_KIND_SERVER, {
+            'http.request.method': req.method,
+            'http.route': route or '',
+            'url.path': req.path,
+        }, start_ns=start)
+        trace.record_span('routing', SPAN_KIND_INTERNAL, start, now)
+        g.trace = trace
+
+    @staticmethod
+    def _after_request(response):
+        trace = g.pop('trace', None)
+        if trace is None:
+            return response
+        root = trace.spans[0]
+        root.set_attribute('http.response.status_code', response.status_code)
+        if response.status_code >= 500:
+            root.set_error(f'HTTP {response.status_code}')
+        exporter = current_app.extensions['tracing'].exporter
+
+        # Streamed bodies are produced after this hook returns, so the trace
+        # is exported once the server has finished sending the response.
+        def finish():
+            trace.end_span(root)
+            exporter.submit((trace.trace_id, trace.spans))
+
+        response.call_on_close(finish)
+        return response
+
+    @staticmethod
+    def _stats():
+        state = current_app.extensions['tracing']
+        return jsonify(dict(state.exporter.stats(), sampled=state.sampled, unsampled=state.unsampled))
+
+
+tracing = Tracing()
@@ -0,0 +1,233 @@
+import re
+
+from flask import current_app, jsonify, request
+from werkzeug.exceptions import RequestEntityTooLarge
+
+from src.config import env_int
+from src.models.user import User
+
+EMAIL_PATTERN = re.compile(r'[^@\s]+@[^@\s.]+(\.[^@\s.]+)+')
+# Long enough for any out-of-range value to be read and then refused by range.
+INTEGER_PATTERN = re.compile(r'-?[0-9]{1,20}')
+# SQLite INTEGER is a signed 64-bit value; a larger int fails when it is bound.
+INTEGER_MIN = -2 ** 63
+INTEGER_MAX = 2 ** 63 - 1
+# A body with thousands of bad items is answered with the first few.
+MAX_ERRORS = 20
+
+
+def _join(path, name):
+    return f'{path}.{name}' if path else name
+
+
+def string(max_length, pattern=None, description=None):
+    """Check for a non-blank string of at most ``max_length`` characters matching ``pattern``."""
+    def check(value, path, errors):
+        if not isinstance(value, str) or not value.strip():
+            errors.append((path, 'must be a non-empty string'))
+        elif len(value) > max_length:
+            errors.append((path, f'must be at most {max_length} characters'))
+        elif pattern is not None and not pattern.fullmatch(value):
+            errors.append((path, f'must be {description}'))
+    return check
+
+
+def integer(minimum=INTEGER_MIN, maximum=INTEGER_MAX):
+    """Check for an integer from ``minimum`` to ``maximum``, by default any that SQLite can store."""
+    def check(value, path, errors):
+        if type(value) is not int:
+            errors.append((path, 'must be an integer'))
+        elif value < minimum:
+            errors.append((path, f'must be at least {minimum}'))
+        elif value > maximum:
+            errors.append((path, f'must be at most {maximum}'))
+    return check
+
+
+def as_id(value):
+    """``value`` as an id if it is an integer or a string of digits that SQLite can store, else None."""
+    if isinstance(value, str):
+        value = value.strip()
+        if not INTEGER_PATTERN.fullmatch(value):
+            return None
+        value = int(value)
+    elif type(value) is not int:
+        return None
+    return value if INTEGER_MIN <= value <= INTEGER_MAX else None
+
+
+def identifier(value, path, errors):
+    """An id as an integer or a string of digits, as multi-get accepts."""
+    if as_id(value) is None:
+        errors.append((path, f'must be an integer id from {INTEGER_MIN} to {INTEGER_MAX}'))
+
+
+def array(items, max_items, min_items=0):
+    def check(value, path, errors):
+        if not isinstance(value, list):
+            errors.append((path, 'must be an array'))
+        elif len(value) > max_items:
+            errors.append((path, f'must have at most {max_items} items'))
+        elif len(value) < min_items:
+            errors.append((path, f'must have at least {min_items} items'))
+        else:
+            for index, item in enumerate(value):
+                items(item, f'{path}[{index}]', errors)
+                if len(errors) >= MAX_ERRORS:
+                    return
+    return check
+
+
+def record(required=None, optional=None):
+    """Check an object's known fields; fields not named here are ignored."""
+    required = dict(required or {})
+    optional = dict(optional or {})
+
+    def check(value, path, errors):
+        if not isinstance(value, dict):
+            errors.append((path, 'must be an object'))
+            return
+        for name, field in required.items():
+            if name in value:
+                field(value[name], _join(path, name), errors)
+            else:
+                errors.append((_join(path, name), 'is required'))
+        for name, field in optional.items():
+            if name in value:
+                field(value[name], _join(path, name), errors)
+    return check
+
+
+USERNAME_LENGTH = User.__table__.c.username.type.length
+EMAIL_LENGTH = User.__table__.c.email.type.length
+USERNAME = string(USERNAME_LENGTH)
+EMAIL = string(EMAIL_LENGTH, EMAIL_PATTERN, 'an email address')
+# One user as created, bulk created, upserted or imported.
+USER = record(required={'username': USERNAME, 'email': EMAIL})
+
+
+def is_user(value):
+    """Whether ``value`` passes :data:`USER`, without building error messages.
+
+    Cheaper than running the checks, for bulk paths that only need the
+    messages once something has failed.
+    """
+    username = value.get('username')
+    email = value.get('email')
+    # The email pattern already rules out blank strings.
+    return (isinstance(username, str) and isinstance(email, str)
+            and 0 < len(username) <= USERNAME_LENGTH and not username.isspace()
+            and len(email) <= EMAIL_LENGTH and EMAIL_PATTERN.fullmatch(email) is not None)
+
+
+def first_error(check, value):
+    """Run ``check`` on ``value`` and return its first ``(field, message)``, or None."""
+    errors = []
+    check(value, '', errors)
+    return errors[0] if errors else None
+
+
+def compile_validators(config):
+    """Build the body check and size limit for every user endpoint that takes JSON."""
+    user = USER
+    changes = record(optional={'username': USERNAME, 'email': EMAIL, 'version': integer(minimum=1)})
+    max_items = config['VALIDATION_MAX_BATCH_ITEMS']
+    body = config['VALIDATION_MAX_BODY']
+    batch_body = config['VALIDATION_MAX_BATCH_BODY']
+    return {
+        'user.create_user': (user, body),
+        'user.upsert_user': (user, body),
+        'user.update_user': (changes, body),
+        'user.bulk_create_users': (array(user, max_items, min_items=1), batch_body),
+        'user.bulk_delete_users': (record(required={'ids': array(integer(), max_items)}), batch_body),
+        'user.lookup_users': (record(required={'ids': array(identifier, config['MULTI_GET_MAX_IDS'],
+                                                            min_items=1)}), batch_body),
+    }
+
+
+def invalid(message, errors=(), status=400):
+    body = {'error': message}
+    if errors:
+        body['details'] = [{'field': path or '(body)', 'message': text} for path, text in errors]
+    return jsonify(body), status
+
+
+def integer_arg(name, check=integer()):
+    """Read query arg ``name`` as an integer that passes ``check``.
+
+    Returns ``(value, None)``, where ``None`` means the arg was not sent,
+    or ``(None, error response)``.
+    """
+    value = request.args.get(name)
+    if value is None:
+        return None, None
+    value = value.strip()
+    if INTEGER_PATTERN.fullmatch(value):
+        value = int(value)
+    errors = []
+    check(value, name, errors)
+    if errors:
+        return None, invalid('invalid query string', errors)
+    return value, None
+
+
+class RequestValidation:
+    """Checks JSON bodies of user endpoints before the view runs.
+
+    Validators for each endpoint are compiled once from the user model's
+    column limits when the app is set up. A body over
+    ``VALIDATION_MAX_BODY`` bytes (default 64 KiB), or
+    ``VALIDATION_MAX_BATCH_BODY`` (default 16 MiB) for bulk endpoints, is
+    refused with ``413`` from its Content-Length before it is read, or as
+    soon as a streamed body passes the limit. Non-JSON bodies get ``415``
+    or ``400``, and bodies that fail their schema get ``400`` listing each
+    bad field (``[3].email``). Bulk arrays are capped at
+    ``VALIDATION_MAX_BATCH_ITEMS`` (default 10000). Nothing reaches the
+    database until the body has passed. Streaming imports cannot be checked
+    up front; :mod:`src.services.transfer` runs every row through
+    :data:`USER` as it is parsed instead. Must be initialised after the
+    storage backend.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('VALIDATION_MAX_BODY', env_int('VALIDATION_MAX_BODY', 64 * 1024))
+        app.config.setdefault('VALIDATION_MAX_BATCH_BODY', env_int('VALIDATION_MAX_BATCH_BODY', 16 * 1024 * 1024))
+        app.config.setdefault('VALIDATION_MAX_BATCH_ITEMS', env_int('VALIDATION_MAX_BATCH_ITEMS', 10000))
+
+        app.extensions['request_validators'] = compile_validators(app.config)
+        app.before_request(self._validate)
+
+    @staticmethod
+    def _validate():
+        entry = current_app.extensions['request_validators'].get(request.endpoint)
+        if entry is None:
+            return None
+        check, max_bytes = entry
+        if request.content_length is not None and request.content_length > max_bytes:
+            return invalid(f'body must be at most {max_bytes} bytes', status=413)
+        if not request.is_json:
+            return invalid('Content-Type must be application/json', status=415)
+        # A body sent without a Content-Length is read up to one byte past
+        # the limit, which is enough to know it is too large.
+        request.max_content_length = max_bytes + 1
+        try:
+            too_large = len(request.get_data(cache=True)) > max_bytes
+        except RequestEntityTooLarge:
+            too_large = True
+        if too_large:
+            return invalid(f'body must be at most {max_bytes} bytes', status=413)
+        data = request.get_json(silent=True)
+        if data is None:
+            return invalid('body must be valid JSON')
+        errors = []
+        check(data, '', errors)
+        if errors:
+            return invalid('invalid request body', errors)
+        return None
+
+
+request_validation = RequestValidation()
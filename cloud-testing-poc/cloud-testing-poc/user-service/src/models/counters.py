@@ -0,0 +1,97 @@
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+from src.models.user import db
+
+user_counter = db.Table(
+    'user_counter',
+    db.Column('name', db.String(40), primary_key=True),
+    db.Column('value', db.Integer, nullable=False),
+)
+
+USER_COUNT = 'users'
+INSERT_TRIGGER = 'user_count_insert'
+
+# While a trigger is named here its per-row work is skipped, so a batch
+# insert can add its total once instead (see :func:`deferred`).
+deferred_trigger = db.Table(
+    'deferred_trigger',
+    db.Column('name', db.String(40), primary_key=True),
+)
+
+
+def unless_deferred(name):
+    """The WHEN clause that skips trigger ``name`` while it is deferred."""
+    return f"WHEN NOT EXISTS (SELECT 1 FROM deferred_trigger WHERE name = '{name}')"
+
+
+# Triggers keep the counter inside the same transaction as the row change,
+# so the count is exact without the application issuing extra statements.
+COUNTER_DDL = (
+    f"CREATE TRIGGER IF NOT EXISTS {INSERT_TRIGGER} AFTER INSERT ON user {unless_deferred(INSERT_TRIGGER)} BEGIN "
+    "UPDATE user_counter SET value = value + 1 WHERE name = 'users'; END",
+    "CREATE TRIGGER IF NOT EXISTS user_count_delete AFTER DELETE ON user BEGIN "
+    "UPDATE user_counter SET value = value - 1 WHERE name = 'users'; END",
+)
+
+SEED_SQL = "INSERT OR IGNORE INTO user_counter (name, value) SELECT 'users', COUNT(*) FROM user"
+
+RECONCILE_SQL = (
+    "UPDATE user_counter SET value = (SELECT COUNT(*) FROM user) "
+    "WHERE name = 'users' AND value != (SELECT COUNT(*) FROM user) "
+    "RETURNING value"
+)
+
+
+ADD_SQL = "UPDATE user_counter SET value = value + ? WHERE name = 'users'"
+TRIGGER_SQL = "SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = ?"
+
+
+def install_trigger(connection, name, ddl):
+    """Create trigger ``name``, replacing a definition without the deferral guard."""
+    current = connection.exec_driver_sql(TRIGGER_SQL, (name,)).scalar()
+    if current is not None and 'deferred_trigger' not in current:
+        connection.exec_driver_sql(f'DROP TRIGGER {name}')
+    connection.exec_driver_sql(ddl)
+
+
+def install_counters(connection):
+    """Create the counter triggers and seed the counter from the table."""
+    install_trigger(connection, INSERT_TRIGGER, COUNTER_DDL[0])
+    connection.exec_driver_sql(COUNTER_DDL[1])
+    connection.exec_driver_sql(SEED_SQL)
+
+
+@event.listens_for(db.metadata, 'after_create')
+def _install_counters(target, connection, **kw):
+    install_counters(connection)
+
+
+@contextmanager
+def deferred(connection, *triggers):
+    """Skip the per-row work of ``triggers`` for the statements in the block.
+
+    The flags are rows written in the caller's transaction and removed
+    before it commits, so other connections never see them and a rollback
+    discards them. The schema is never changed, so prepared statements stay
+    valid. The caller must apply what the triggers would have done.
+    """
+    flags = [(name,) for name in triggers]
+    connection.exec_driver_sql('INSERT INTO deferred_trigger (name) VALUES (?)', flags)
+    try:
+        yield
+    finally:
+        connection.exec_driver_sql('DELETE FROM deferred_trigger WHERE name = ?', flags)
+
+
+def insert_counted_once(connection, sql, rows):
+    """Run an executemany INSERT with one counter update instead of one per row.
+
+    ``sql`` must only insert (no DO UPDATE), so that its rowcount is the
+    number of new rows.
+    """
+    with deferred(connection, INSERT_TRIGGER):
+        inserted = connection.exec_driver_sql(sql, rows).rowcount
+    connection.exec_driver_sql(ADD_SQL, (inserted,))
+    return inserted
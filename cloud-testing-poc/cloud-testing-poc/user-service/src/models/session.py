@@ -0,0 +1,26 @@
+from flask import current_app, has_request_context, request
+from flask_sqlalchemy.session import Session
+
+READ_METHODS = frozenset(('GET', 'HEAD', 'OPTIONS'))
+
+
+class RoutingSession(Session):
+    """Session that sends read-only requests to the reader engine.
+
+    When the read/write split is enabled, requests with a read method, or
+    endpoints listed in ``RW_SPLIT_READ_ENDPOINTS``, are bound to the
+    reader pool. Everything else, including flushes and work done outside
+    a request (e.g. the group-commit writer), uses the writer engine.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and has_request_context():
+            engines = current_app.extensions.get('rw_split')
+            if engines is not None and _is_read_request():
+                return engines.reader
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def _is_read_request():
+    return (request.method in READ_METHODS
+            or request.endpoint in current_app.config['RW_SPLIT_READ_ENDPOINTS'])
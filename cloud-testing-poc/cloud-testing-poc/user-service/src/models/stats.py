@@ -0,0 +1,110 @@
+import string
+from collections import Counter
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+from src.models.counters import deferred, install_trigger, unless_deferred
+from src.models.user import db
+
+user_domain_count = db.Table(
+    'user_domain_count',
+    db.Column('domain', db.String(120), primary_key=True),
+    db.Column('value', db.Integer, nullable=False),
+)
+
+# One row per UTC hour (seconds since the epoch // 3600) in which users signed up.
+user_signup_count = db.Table(
+    'user_signup_count',
+    db.Column('hour', db.Integer, primary_key=True),
+    db.Column('value', db.Integer, nullable=False),
+)
+
+# Everything after the first '@', or the whole address if there is none.
+DOMAIN_SQL = "lower(substr({email}, instr({email}, '@') + 1))"
+_NEW = DOMAIN_SQL.format(email='NEW.email')
+_OLD = DOMAIN_SQL.format(email='OLD.email')
+
+INSERT_TRIGGER = 'user_stats_insert'
+
+# Like the user count, the aggregates change inside the transaction that
+# changes the row, so reading them never needs a scan of the user table.
+STATS_DDL = (
+    f"CREATE TRIGGER IF NOT EXISTS {INSERT_TRIGGER} AFTER INSERT ON user {unless_deferred(INSERT_TRIGGER)} BEGIN "
+    f"INSERT INTO user_domain_count (domain, value) VALUES ({_NEW}, 1) "
+    "ON CONFLICT(domain) DO UPDATE SET value = value + 1; "
+    "INSERT INTO user_signup_count (hour, value) VALUES (CAST(strftime('%s', 'now') AS INTEGER) / 3600, 1) "
+    "ON CONFLICT(hour) DO UPDATE SET value = value + 1; END",
+    "CREATE TRIGGER IF NOT EXISTS user_stats_delete AFTER DELETE ON user BEGIN "
+    f"UPDATE user_domain_count SET value = value - 1 WHERE domain = {_OLD}; "
+    f"DELETE FROM user_domain_count WHERE domain = {_OLD} AND value <= 0; END",
+    f"CREATE TRIGGER IF NOT EXISTS user_stats_update AFTER UPDATE OF email ON user WHEN {_OLD} != {_NEW} BEGIN "
+    f"INSERT INTO user_domain_count (domain, value) VALUES ({_NEW}, 1) "
+    "ON CONFLICT(domain) DO UPDATE SET value = value + 1; "
+    f"UPDATE user_domain_count SET value = value - 1 WHERE domain = {_OLD}; "
+    f"DELETE FROM user_domain_count WHERE domain = {_OLD} AND value <= 0; END",
+    # Serves the top-domains query in order, so it reads only the rows it returns.
+    "CREATE INDEX IF NOT EXISTS ix_user_domain_count_top ON user_domain_count (value DESC, domain)",
+)
+
+DOMAIN_COUNTS_SQL = f"SELECT {DOMAIN_SQL.format(email='email')} AS domain, COUNT(*) FROM user GROUP BY domain"
+SEED_DOMAINS_SQL = f"INSERT OR IGNORE INTO user_domain_count (domain, value) {DOMAIN_COUNTS_SQL}"
+# Signup history only exists in the buckets (rows carry no creation time),
+# so a recompute keeps it and only drops buckets past the retention.
+SIGNUP_RETENTION_HOURS = 24 * 90
+PRUNE_SIGNUPS_SQL = "DELETE FROM user_signup_count WHERE hour < CAST(strftime('%s', 'now') AS INTEGER) / 3600 - ?"
+
+
+ADD_DOMAIN_SQL = ("INSERT INTO user_domain_count (domain, value) VALUES (?, ?) "
+                  "ON CONFLICT(domain) DO UPDATE SET value = value + excluded.value")
+ADD_SIGNUPS_SQL = ("INSERT INTO user_signup_count (hour, value) VALUES (CAST(strftime('%s', 'now') AS INTEGER) / 3600, ?) "
+                   "ON CONFLICT(hour) DO UPDATE SET value = value + excluded.value")
+# SQLite's lower() only folds ASCII letters.
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+
+def email_domain(email):
+    """The domain the stats count ``email`` under, as :data:`DOMAIN_SQL` computes it."""
+    domain = email[email.find('@') + 1:]
+    return domain.lower() if domain.isascii() else domain.translate(_ASCII_LOWER)
+
+
+def install_stats(connection):
+    """Create the stats triggers and index and seed the domain counts from the table."""
+    install_trigger(connection, INSERT_TRIGGER, STATS_DDL[0])
+    for ddl in STATS_DDL[1:]:
+        connection.exec_driver_sql(ddl)
+    connection.exec_driver_sql(SEED_DOMAINS_SQL)
+
+
+def recompute_stats(connection):
+    """Rebuild the domain counts from the rows and return how many users were miscounted."""
+    before = dict(connection.exec_driver_sql('SELECT domain, value FROM user_domain_count').all())
+    after = dict(connection.exec_driver_sql(DOMAIN_COUNTS_SQL).all())
+    connection.exec_driver_sql('DELETE FROM user_domain_count')
+    if after:
+        connection.exec_driver_sql('INSERT INTO user_domain_count (domain, value) VALUES (?, ?)',
+                                   list(after.items()))
+    connection.exec_driver_sql(PRUNE_SIGNUPS_SQL, (SIGNUP_RETENTION_HOURS,))
+    return sum(abs(after.get(domain, 0) - before.get(domain, 0)) for domain in before.keys() | after.keys())
+
+
+@contextmanager
+def stats_counted_once(connection, emails):
+    """Count an insert of every one of ``emails`` with one statement per domain instead of a trigger per row.
+
+    The insert trigger is :func:`~src.models.counters.deferred` for the
+    block, as in :func:`src.models.counters.insert_counted_once`. The block
+    must insert every row or raise.
+    """
+    with deferred(connection, INSERT_TRIGGER):
+        yield
+    domains = Counter(email_domain(email) for email in emails)
+    if domains:
+        connection.exec_driver_sql(ADD_DOMAIN_SQL, list(domains.items()))
+        connection.exec_driver_sql(ADD_SIGNUPS_SQL, (len(emails),))
+
+
+@event.listens_for(db.metadata, 'after_create')
+def _install_stats(target, connection, **kw):
+    install_stats(connection)
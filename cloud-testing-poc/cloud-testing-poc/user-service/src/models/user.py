@@ -1,11 +1,20 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
 
-db = SQLAlchemy()
+from src.models.session import RoutingSession
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+# Tables created before row versions existed get the column on startup;
+# every existing row starts at version 1.
+ADD_VERSION_SQL = 'ALTER TABLE user ADD COLUMN version INTEGER NOT NULL DEFAULT 1'
 
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
+    # Bumped by every write that changes the row; compared by conditional updates.
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
 
     def __repr__(self):
         return f'<User {self.username}>'
@@ -14,5 +23,18 @@ class User(db.Model):
         return {
             'id': self.id,
             'username': self.username,
-            'email': self.email
+            'email': self.email,
+            'version': self.version
         }
+
+
+def add_version_column(connection):
+    """Add the version column to a user table that predates it."""
+    columns = {row[1] for row in connection.exec_driver_sql('PRAGMA table_info(user)')}
+    if 'version' not in columns:
+        connection.exec_driver_sql(ADD_VERSION_SQL)
+
+
+@event.listens_for(db.metadata, 'after_create')
+def _add_version_column(target, connection, **kw):
+    add_version_column(connection)
@@ -0,0 +1,54 @@
+import os
+
+from flask import current_app
+
+from src.config import env_bool, env_int, env_str
+from src.repositories.memory import InMemoryUserRepository
+from src.repositories.sharded import ShardedUserRepository
+from src.repositories.sql import SQLAlchemyUserRepository
+from src.repositories.versioned import VersionedRepository
+
+BACKENDS = {
+    'sqlalchemy': lambda app: SQLAlchemyUserRepository(core_reads=app.config['SQL_CORE_READS']),
+    'memory': lambda app: InMemoryUserRepository(),
+    'sharded': lambda app: ShardedUserRepository(app.config['SHARD_DIRECTORY'], app.config['SHARD_COUNT']),
+}
+
+
+class StorageBackend:
+    """Selects the user repository with ``USER_STORAGE_BACKEND``.
+
+    ``sqlalchemy`` (the default) stores users in the configured database,
+    reading through Core selects unless ``SQL_CORE_READS`` is off;
+    ``memory`` keeps them in process for load tests and ephemeral
+    environments and loses them on restart; ``sharded`` spreads them over
+    ``SHARD_COUNT`` SQLite files in ``SHARD_DIRECTORY``. The repository is
+    wrapped in a :class:`VersionedRepository` so read caches can tell when
+    a write has happened.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('USER_STORAGE_BACKEND', env_str('USER_STORAGE_BACKEND', 'sqlalchemy'))
+        app.config.setdefault('SQL_CORE_READS', env_bool('SQL_CORE_READS', True))
+        app.config.setdefault('USER_IMPORT_BATCH_SIZE', env_int('USER_IMPORT_BATCH_SIZE', 20000))
+        app.config.setdefault('MULTI_GET_MAX_IDS', env_int('MULTI_GET_MAX_IDS', 10000))
+        app.config.setdefault('UPDATE_REQUIRE_VERSION', env_bool('UPDATE_REQUIRE_VERSION', False))
+        app.config.setdefault('SHARD_COUNT', env_int('SHARD_COUNT', 4))
+        app.config.setdefault('SHARD_DIRECTORY', env_str(
+            'SHARD_DIRECTORY', os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database', 'shards')))
+
+        backend = app.config['USER_STORAGE_BACKEND']
+        if backend not in BACKENDS:
+            raise ValueError(f'Unknown USER_STORAGE_BACKEND {backend!r}; expected one of {sorted(BACKENDS)}')
+        app.extensions['user_repository'] = VersionedRepository(BACKENDS[backend](app))
+
+
+def get_user_repository():
+    return current_app.extensions['user_repository']
+
+
+storage = StorageBackend()
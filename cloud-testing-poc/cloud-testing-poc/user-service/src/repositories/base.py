@@ -0,0 +1,135 @@
+from abc import ABC, abstractmethod
+
+
+class DuplicateUserError(Exception):
+    """Raised when a write would violate username or email uniqueness."""
+
+
+class VersionConflictError(Exception):
+    """Raised when a conditional update finds the user at another version.
+
+    ``current`` is the user as it is now, so callers can report it.
+    """
+
+    def __init__(self, current):
+        super().__init__(f"user {current['id']} is at version {current['version']}")
+        self.current = current
+
+
+class UserRepository(ABC):
+    """Storage interface for users.
+
+    Users are exchanged as plain ``{'id', 'username', 'email', 'version'}``
+    dicts so that callers never hold on to backend state such as ORM
+    instances. ``version`` starts at 1 and goes up by one with every write
+    that changes the row. Writes raise :class:`DuplicateUserError` on a
+    uniqueness violation and return ``None``/``False`` when the target user
+    does not exist.
+    """
+
+    @abstractmethod
+    def list_users(self, after_id=None, limit=None):
+        """Return users in id order, starting after ``after_id``."""
+
+    @abstractmethod
+    def get(self, user_id):
+        """Return the user with ``user_id`` or ``None``."""
+
+    @abstractmethod
+    def get_many(self, user_ids):
+        """Return the users among ``user_ids`` in a dict keyed by id; missing ids are left out."""
+
+    @abstractmethod
+    def create(self, username, email):
+        """Insert a user and return it."""
+
+    @abstractmethod
+    def update(self, user_id, fields, expected_version=None):
+        """Apply ``fields`` to a user and return it, or ``None`` if missing.
+
+        With ``expected_version`` the update only applies if the user is
+        still at that version, and raises :class:`VersionConflictError`
+        otherwise.
+        """
+
+    @abstractmethod
+    def delete(self, user_id):
+        """Delete a user, returning whether it existed."""
+
+    @abstractmethod
+    def upsert(self, username, email):
+        """Insert a user, or update the email of the user with ``username``."""
+
+    @abstractmethod
+    def search(self, prefix, limit=50):
+        """Return users whose username or email starts with ``prefix``."""
+
+    @abstractmethod
+    def is_taken(self, username, email):
+        """Return whether some user already has ``username`` or ``email``."""
+
+    @abstractmethod
+    def bulk_create(self, users):
+        """Insert all of ``users`` atomically and return them with ids."""
+
+    @abstractmethod
+    def bulk_delete(self, user_ids):
+        """Delete the given ids atomically and return the ids that existed."""
+
+    @abstractmethod
+    def count(self):
+        """Return the number of users in constant time."""
+
+    @abstractmethod
+    def reconcile_count(self):
+        """Repair the maintained count from the rows and return the drift found."""
+
+    @abstractmethod
+    def stats(self, since_hour, top_domains):
+        """Return the maintained stats without scanning users.
+
+        Gives ``(domains, signups)``: the ``top_domains`` email domains with
+        the most users as ``(domain, users)`` pairs, largest first, and a
+        ``{hour: signups}`` dict for the UTC hours (epoch seconds // 3600)
+        from ``since_hour`` on.
+        """
+
+    @abstractmethod
+    def recompute_stats(self):
+        """Rebuild the domain counts from the rows and return the number of users miscounted."""
+
+    def reindex(self):
+        """Rebuild the backend's secondary indexes; a no-op where they cannot degrade."""
+
+    def iter_users(self, page_size=1000):
+        """Yield every user in id order, holding one page in memory at a time."""
+        after_id = None
+        while True:
+            page = self.list_users(after_id=after_id, limit=page_size)
+            yield from page
+            if len(page) < page_size:
+                return
+            after_id = page[-1]['id']
+
+    def import_batch(self, users, on_conflict):
+        """Write one batch of imported users and return how many were written.
+
+        ``on_conflict`` decides what happens to a user whose username or
+        email is taken: ``'fail'`` raises :class:`DuplicateUserError` and
+        keeps nothing from the batch, ``'skip'`` leaves the existing user
+        alone and ``'overwrite'`` updates the email of the user with the
+        same username, as :meth:`upsert` does. This default goes through
+        the single-user methods and assigns fresh ids; backends override it
+        with a faster path that keeps the ids being imported.
+        """
+        if on_conflict == 'fail':
+            return len(self.bulk_create(users))
+        write = self.upsert if on_conflict == 'overwrite' else self.create
+        written = 0
+        for user in users:
+            try:
+                write(user['username'], user['email'])
+            except DuplicateUserError:
+                continue
+            written += 1
+        return written
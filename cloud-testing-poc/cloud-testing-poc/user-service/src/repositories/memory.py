@@ -0,0 +1,196 @@
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+from collections import Counter
+
+from src.models.stats import email_domain
+from src.repositories.base import DuplicateUserError, UserRepository, VersionConflictError
+
+# Upper bound on keys examined per prefix scan so a one-letter search
+# cannot walk the whole index.
+_SCAN_WINDOW = 10000
+
+
+class SortedIndex:
+    """Unique string keys kept in a dict plus a sorted list for prefix scans."""
+
+    __slots__ = ('ids', 'keys')
+
+    def __init__(self):
+        self.ids = {}
+        self.keys = []
+
+    def __contains__(self, key):
+        return key in self.ids
+
+    def add(self, key, user_id):
+        self.ids[key] = user_id
+        insort(self.keys, key)
+
+    def remove(self, key):
+        del self.ids[key]
+        del self.keys[bisect_left(self.keys, key)]
+
+    def prefix(self, prefix):
+        start = bisect_left(self.keys, prefix)
+        for key in self.keys[start:start + _SCAN_WINDOW]:
+            if not key.startswith(prefix):
+                break
+            yield self.ids[key]
+
+
+class InMemoryUserRepository(UserRepository):
+    """Dict-backed repository for load tests and ephemeral environments.
+
+    Rows live in a dict keyed by id with a sorted id list for pagination and
+    sorted unique indexes on username and email. A single lock makes every
+    operation, bulk ones included, atomic. Domain and signup counts are
+    kept alongside the rows.
+    """
+
+    def __init__(self):
+        self._rows = {}
+        self._ids = []
+        self._usernames = SortedIndex()
+        self._emails = SortedIndex()
+        self._next_id = 1
+        self._domains = Counter()
+        self._signups = Counter()
+        self._lock = threading.RLock()
+
+    def list_users(self, after_id=None, limit=None):
+        with self._lock:
+            start = bisect_right(self._ids, after_id) if after_id is not None else 0
+            end = start + limit if limit is not None else len(self._ids)
+            return [dict(self._rows[user_id]) for user_id in self._ids[start:end]]
+
+    def get(self, user_id):
+        with self._lock:
+            row = self._rows.get(user_id)
+            return dict(row) if row is not None else None
+
+    def get_many(self, user_ids):
+        with self._lock:
+            return {user_id: dict(self._rows[user_id]) for user_id in user_ids if user_id in self._rows}
+
+    def create(self, username, email):
+        with self._lock:
+            self._check_unique(username, email)
+            return dict(self._insert(username, email))
+
+    def update(self, user_id, fields, expected_version=None):
+        with self._lock:
+            row = self._rows.get(user_id)
+            if row is None:
+                return None
+            if expected_version is not None and row['version'] != expected_version:
+                raise VersionConflictError(dict(row))
+            if not fields:
+                return dict(row)
+            username = fields.get('username', row['username'])
+            email = fields.get('email', row['email'])
+            self._check_unique(username if username != row['username'] else None,
+                               email if email != row['email'] else None)
+            if username != row['username']:
+                self._usernames.remove(row['username'])
+                self._usernames.add(username, user_id)
+            if email != row['email']:
+                self._emails.remove(row['email'])
+                self._emails.add(email, user_id)
+                self._count_domain(row['email'], -1)
+                self._count_domain(email, 1)
+            row['username'] = username
+            row['email'] = email
+            row['version'] += 1
+            return dict(row)
+
+    def delete(self, user_id):
+        with self._lock:
+            return self._remove(user_id)
+
+    def upsert(self, username, email):
+        with self._lock:
+            user_id = self._usernames.ids.get(username)
+            if user_id is None:
+                return self.create(username, email)
+            return self.update(user_id, {'email': email})
+
+    def search(self, prefix, limit=50):
+        with self._lock:
+            ids = set(self._usernames.prefix(prefix))
+            ids.update(self._emails.prefix(prefix))
+            return [dict(self._rows[user_id]) for user_id in sorted(ids)[:limit]]
+
+    def is_taken(self, username, email):
+        with self._lock:
+            return username in self._usernames or email in self._emails
+
+    def bulk_create(self, users):
+        with self._lock:
+            usernames = set()
+            emails = set()
+            for user in users:
+                if user['username'] in usernames or user['email'] in emails:
+                    raise DuplicateUserError('duplicate username or email in batch')
+                self._check_unique(user['username'], user['email'])
+                usernames.add(user['username'])
+                emails.add(user['email'])
+            return [dict(self._insert(user['username'], user['email'])) for user in users]
+
+    def bulk_delete(self, user_ids):
+        with self._lock:
+            return sorted(user_id for user_id in set(user_ids) if self._remove(user_id))
+
+    def count(self):
+        with self._lock:
+            return len(self._rows)
+
+    def reconcile_count(self):
+        # The count is the size of the row dict itself and cannot drift.
+        return 0
+
+    def stats(self, since_hour, top_domains):
+        with self._lock:
+            domains = sorted(self._domains.items(), key=lambda item: (-item[1], item[0]))[:top_domains]
+            return domains, {hour: count for hour, count in self._signups.items() if hour >= since_hour}
+
+    def recompute_stats(self):
+        with self._lock:
+            actual = Counter(email_domain(row['email']) for row in self._rows.values())
+            drift = sum(abs(actual[domain] - self._domains[domain]) for domain in actual.keys() | self._domains.keys())
+            self._domains = actual
+            return drift
+
+    def _check_unique(self, username, email):
+        if username is not None and username in self._usernames:
+            raise DuplicateUserError(f'username {username!r} already exists')
+        if email is not None and email in self._emails:
+            raise DuplicateUserError(f'email {email!r} already exists')
+
+    def _insert(self, username, email):
+        user_id = self._next_id
+        self._next_id += 1
+        row = {'id': user_id, 'username': username, 'email': email, 'version': 1}
+        self._rows[user_id] = row
+        self._ids.append(user_id)
+        self._usernames.add(username, user_id)
+        self._emails.add(email, user_id)
+        self._count_domain(email, 1)
+        self._signups[int(time.time()) // 3600] += 1
+        return row
+
+    def _remove(self, user_id):
+        row = self._rows.pop(user_id, None)
+        if row is None:
+            return False
+        del self._ids[bisect_left(self._ids, user_id)]
+        self._usernames.remove(row['username'])
+        self._emails.remove(row['email'])
+        self._count_domain(row['email'], -1)
+        return True
+
+    def _count_domain(self, email, delta):
+        domain = email_domain(email)
+        self._domains[domain] += delta
+        if self._domains[domain] <= 0:
+            del self._domains[domain]
@@ -0,0 +1,399 @@
+import heapq
+import os
+import threading
+import zlib
+from collections import Counter
+from itertools import islice
+
+from sqlalchemy import (Column, Integer, MetaData, Table, bindparam, create_engine, delete, event, insert, or_, select,
+                        text, update)
+from sqlalchemy.exc import IntegrityError
+
+from src.models.counters import RECONCILE_SQL, SEED_SQL, deferred_trigger, install_counters, user_counter
+from src.models.stats import install_stats, recompute_stats, user_domain_count, user_signup_count
+from src.models.user import User, add_version_column
+from src.repositories.base import DuplicateUserError, UserRepository, VersionConflictError
+from src.repositories.sql import BULK_CHUNK_SIZE, COUNT_QUERY, SIGNUPS_QUERY, TOP_DOMAINS_QUERY
+
+user_table = User.__table__
+COLUMNS = (user_table.c.id, user_table.c.username, user_table.c.email, user_table.c.version)
+DOMAIN_COUNTS_QUERY = (select(user_domain_count.c.domain, user_domain_count.c.value)
+                       .where(user_domain_count.c.domain.in_(bindparam('domains', expanding=True))))
+
+meta = MetaData()
+id_allocator_table = Table('id_allocator', meta, Column('next_id', Integer, nullable=False))
+
+
+def shard_for(user_id, shard_count):
+    """Stable shard number for ``user_id``, identical across processes."""
+    return zlib.crc32(user_id.to_bytes(8, 'little', signed=True)) % shard_count
+
+
+class IdAllocator:
+    """Hands out globally unique ids in blocks reserved from ``meta.db``.
+
+    Reserving ``block_size`` ids per write to the allocator table keeps the
+    shared file off the per-user write path.
+    """
+
+    def __init__(self, engine, block_size=1000, floor=1):
+        self.engine = engine
+        self.block_size = block_size
+        self._next = 0
+        self._limit = 0
+        self._lock = threading.Lock()
+        meta.create_all(engine)
+        with engine.begin() as conn:
+            current = conn.execute(select(id_allocator_table.c.next_id)).scalar()
+            if current is None:
+                conn.execute(insert(id_allocator_table).values(next_id=floor))
+            elif current < floor:
+                conn.execute(update(id_allocator_table).values(next_id=floor))
+
+    def allocate(self, count=1):
+        with self._lock:
+            if self._next + count > self._limit:
+                self._reserve(max(count, self.block_size))
+            start = self._next
+            self._next += count
+            return range(start, start + count)
+
+    def _reserve(self, size):
+        with self.engine.begin() as conn:
+            start = conn.execute(
+                update(id_allocator_table)
+                .values(next_id=id_allocator_table.c.next_id + size)
+                .returning(id_allocator_table.c.next_id - size)
+            ).scalar()
+        self._next = start
+        self._limit = start + size
+
+
+class UniqueIndex:
+    """Process-wide routing index from username/email to user id.
+
+    Keys are reserved here before the owning shard is written, which is what
+    makes uniqueness hold across shards. Entries are ``(user_id, username,
+    email)`` triples; ``None`` stands for a key that is not being changed.
+    """
+
+    def __init__(self):
+        self.usernames = {}
+        self.emails = {}
+        self._lock = threading.Lock()
+
+    def add(self, user_id, username, email):
+        self.usernames[username] = user_id
+        self.emails[email] = user_id
+
+    def reserve(self, entries):
+        """Atomically claim every key in ``entries`` or raise DuplicateUserError."""
+        with self._lock:
+            claimed_usernames = {}
+            claimed_emails = {}
+            for user_id, username, email in entries:
+                if username is not None:
+                    owner = claimed_usernames.get(username, self.usernames.get(username, user_id))
+                    if owner != user_id:
+                        raise DuplicateUserError(f'username {username!r} already exists')
+                    claimed_usernames[username] = user_id
+                if email is not None:
+                    owner = claimed_emails.get(email, self.emails.get(email, user_id))
+                    if owner != user_id:
+                        raise DuplicateUserError(f'email {email!r} already exists')
+                    claimed_emails[email] = user_id
+            self.usernames.update(claimed_usernames)
+            self.emails.update(claimed_emails)
+
+    def release(self, entries):
+        with self._lock:
+            for user_id, username, email in entries:
+                if username is not None and self.usernames.get(username) == user_id:
+                    del self.usernames[username]
+                if email is not None and self.emails.get(email) == user_id:
+                    del self.emails[email]
+
+
+class Shard:
+    __slots__ = ('engine', 'write_lock')
+
+    def __init__(self, path):
+        self.engine = create_engine(f'sqlite:///{path}')
+        event.listen(self.engine, 'connect', _configure_shard)
+        user_table.create(self.engine, checkfirst=True)
+        for table in (user_counter, deferred_trigger, user_domain_count, user_signup_count):
+            table.create(self.engine, checkfirst=True)
+        with self.engine.begin() as conn:
+            add_version_column(conn)
+            install_counters(conn)
+            install_stats(conn)
+        self.write_lock = threading.RLock()
+
+
+def _configure_shard(dbapi_connection, connection_record):
+    dbapi_connection.execute('PRAGMA journal_mode=WAL')
+
+
+class ShardedUserRepository(UserRepository):
+    """Users hash-partitioned by id across ``shard_count`` SQLite files.
+
+    SQLite allows one writer per file, so spreading users over several files
+    lets writes to different shards proceed in parallel. Ids come from a
+    block-based :class:`IdAllocator`, and username/email uniqueness is
+    enforced by an in-process :class:`UniqueIndex` that is rebuilt from the
+    shards at startup. The index is per process, so a sharded deployment
+    must have a single writer process.
+    """
+
+    def __init__(self, directory, shard_count):
+        os.makedirs(directory, exist_ok=True)
+        self.shards = [Shard(os.path.join(directory, f'users-{i}.db')) for i in range(shard_count)]
+        self.index = UniqueIndex()
+        max_id = 0
+        for shard in self.shards:
+            with shard.engine.connect() as conn:
+                for user_id, username, email in conn.execute(select(*COLUMNS[:3])):
+                    self.index.add(user_id, username, email)
+                    max_id = max(max_id, user_id)
+        self.ids = IdAllocator(create_engine(f"sqlite:///{os.path.join(directory, 'meta.db')}"), floor=max_id + 1)
+
+    def shard(self, user_id):
+        return self.shards[shard_for(user_id, len(self.shards))]
+
+    def list_users(self, after_id=None, limit=None):
+        query = select(*COLUMNS).order_by(user_table.c.id)
+        if after_id is not None:
+            query = query.where(user_table.c.id > after_id)
+        if limit is not None:
+            query = query.limit(limit)
+        return self._merge(query, limit)
+
+    def get(self, user_id):
+        with self.shard(user_id).engine.connect() as conn:
+            row = conn.execute(select(*COLUMNS).where(user_table.c.id == user_id)).first()
+        return dict(row._mapping) if row is not None else None
+
+    def get_many(self, user_ids):
+        by_shard = {}
+        for user_id in dict.fromkeys(user_ids):
+            by_shard.setdefault(shard_for(user_id, len(self.shards)), []).append(user_id)
+        found = {}
+        for index, ids in by_shard.items():
+            with self.shards[index].engine.connect() as conn:
+                for i in range(0, len(ids), BULK_CHUNK_SIZE):
+                    query = select(*COLUMNS).where(user_table.c.id.in_(ids[i:i + BULK_CHUNK_SIZE]))
+                    found.update((row.id, dict(row._mapping)) for row in conn.execute(query))
+        return found
+
+    def create(self, username, email):
+        user_id = self.ids.allocate()[0]
+        entries = [(user_id, username, email)]
+        self.index.reserve(entries)
+        try:
+            return self._write_one(user_id, insert(user_table).values(id=user_id, username=username, email=email))
+        except Exception:
+            self.index.release(entries)
+            raise
+
+    def update(self, user_id, fields, expected_version=None):
+        shard = self.shard(user_id)
+        # Holding the shard lock keeps the read and the write consistent, so
+        # the keys released below really are the ones being replaced and the
+        # version compared is the one being overwritten.
+        with shard.write_lock:
+            current = self.get(user_id)
+            if current is None:
+                return None
+            if expected_version is not None and current['version'] != expected_version:
+                raise VersionConflictError(current)
+            if not fields:
+                return current
+            username = fields.get('username', current['username'])
+            email = fields.get('email', current['email'])
+            new_keys = [(user_id,
+                         username if username != current['username'] else None,
+                         email if email != current['email'] else None)]
+            self.index.reserve(new_keys)
+            statement = update(user_table).where(user_table.c.id == user_id)
+            try:
+                row = self._write_one(user_id, statement.values(**fields, version=user_table.c.version + 1))
+            except Exception:
+                self.index.release(new_keys)
+                raise
+        self.index.release([(user_id,
+                             current['username'] if username != current['username'] else None,
+                             current['email'] if email != current['email'] else None)])
+        return row
+
+    def delete(self, user_id):
+        row = self._write_one(user_id, delete(user_table).where(user_table.c.id == user_id))
+        if row is None:
+            return False
+        self.index.release([(user_id, row['username'], row['email'])])
+        return True
+
+    def upsert(self, username, email):
+        user_id = self.index.usernames.get(username)
+        if user_id is None:
+            try:
+                return self.create(username, email)
+            except DuplicateUserError:
+                # Lost a race with a concurrent create of the same username.
+                user_id = self.index.usernames.get(username)
+                if user_id is None:
+                    raise
+        return self.update(user_id, {'email': email})
+
+    def search(self, prefix, limit=50):
+        query = select(*COLUMNS).where(or_(user_table.c.username.startswith(prefix, autoescape=True),
+                                           user_table.c.email.startswith(prefix, autoescape=True)))
+        return self._merge(query.order_by(user_table.c.id).limit(limit), limit)
+
+    def is_taken(self, username, email):
+        # The routing index holds every key, so no shard needs to be asked.
+        return username in self.index.usernames or email in self.index.emails
+
+    def bulk_create(self, users):
+        if not users:
+            return []
+        ids = self.ids.allocate(len(users))
+        rows = [{'id': user_id, 'username': u['username'], 'email': u['email'], 'version': 1}
+                for user_id, u in zip(ids, users)]
+        entries = [(row['id'], row['username'], row['email']) for row in rows]
+        self.index.reserve(entries)
+        try:
+            self._write_grouped(rows, lambda chunk: insert(user_table).values(chunk))
+        except Exception:
+            self.index.release(entries)
+            raise
+        return rows
+
+    def bulk_delete(self, user_ids):
+        deleted = self._write_grouped(
+            [{'id': user_id} for user_id in set(user_ids)],
+            lambda chunk: delete(user_table).where(user_table.c.id.in_([row['id'] for row in chunk])),
+        )
+        self.index.release([(row['id'], row['username'], row['email']) for row in deleted])
+        return sorted(row['id'] for row in deleted)
+
+    def count(self):
+        total = 0
+        for shard in self.shards:
+            with shard.engine.connect() as conn:
+                total += conn.execute(COUNT_QUERY).scalar() or 0
+        return total
+
+    def reindex(self):
+        for shard in self.shards:
+            with shard.write_lock, shard.engine.begin() as conn:
+                conn.execute(text('REINDEX user'))
+                conn.execute(text('ANALYZE user'))
+
+    def reconcile_count(self):
+        drift = 0
+        for shard in self.shards:
+            with shard.write_lock, shard.engine.begin() as conn:
+                before = conn.execute(COUNT_QUERY).scalar() or 0
+                conn.execute(text(SEED_SQL))
+                repaired = conn.execute(text(RECONCILE_SQL)).scalar()
+                if repaired is not None:
+                    drift += repaired - before
+        return drift
+
+    def stats(self, since_hour, top_domains):
+        signups = Counter()
+        for shard in self.shards:
+            with shard.engine.connect() as conn:
+                signups.update(dict(conn.execute(SIGNUPS_QUERY, {'since': since_hour}).all()))
+        return self._top_domains(top_domains), dict(signups)
+
+    def _top_domains(self, limit):
+        """The ``limit`` domains with the most users over all shards.
+
+        A domain's users can sit on every shard, so each shard's top ``depth``
+        domains are fetched, the candidates' exact totals summed, and the
+        lists deepened until no domain outside them could still rank: one
+        missing from every list has at most the sum of the full lists' last
+        counts. Usually the first round, reading ``limit`` rows per shard
+        from the index, settles it.
+        """
+        if limit <= 0:
+            return []
+        depth = limit
+        while True:
+            lists = []
+            for shard in self.shards:
+                with shard.engine.connect() as conn:
+                    lists.append(conn.execute(TOP_DOMAINS_QUERY, {'limit': depth}).all())
+            candidates = list({domain for rows in lists for domain, _ in rows})
+            totals = Counter()
+            for shard in self.shards:
+                with shard.engine.connect() as conn:
+                    for i in range(0, len(candidates), BULK_CHUNK_SIZE):
+                        totals.update(dict(conn.execute(DOMAIN_COUNTS_QUERY,
+                                                        {'domains': candidates[i:i + BULK_CHUNK_SIZE]}).all()))
+            top = heapq.nsmallest(limit, totals.items(), key=lambda item: (-item[1], item[0]))
+            full = [rows for rows in lists if len(rows) == depth]
+            if not full or (len(top) == limit and top[-1][1] > sum(rows[-1][1] for rows in full)):
+                return top
+            depth *= 4
+
+    def recompute_stats(self):
+        drift = 0
+        for shard in self.shards:
+            with shard.write_lock, shard.engine.begin() as conn:
+                drift += recompute_stats(conn)
+        return drift
+
+    def _merge(self, query, limit):
+        """Run ``query`` on every shard and merge the id-ordered results."""
+        results = []
+        for shard in self.shards:
+            with shard.engine.connect() as conn:
+                results.append([dict(row._mapping) for row in conn.execute(query)])
+        merged = heapq.merge(*results, key=lambda row: row['id'])
+        return list(islice(merged, limit) if limit is not None else merged)
+
+    def _write_one(self, user_id, statement):
+        shard = self.shard(user_id)
+        try:
+            with shard.write_lock, shard.engine.begin() as conn:
+                row = conn.execute(statement.returning(*COLUMNS)).first()
+        except IntegrityError as exc:
+            raise DuplicateUserError(str(exc.orig)) from exc
+        return dict(row._mapping) if row is not None else None
+
+    def _write_grouped(self, rows, make_statement):
+        """Apply a bulk write shard by shard and return the RETURNING rows.
+
+        Each shard commits its part in one transaction. If a later shard
+        fails for any reason, the inserts already committed to earlier
+        shards are deleted again, so bulk creates stay all-or-nothing.
+        """
+        by_shard = {}
+        for row in rows:
+            by_shard.setdefault(shard_for(row['id'], len(self.shards)), []).append(row)
+
+        returned = []
+        committed = []
+        for number, shard_rows in sorted(by_shard.items()):
+            shard = self.shards[number]
+            try:
+                with shard.write_lock, shard.engine.begin() as conn:
+                    for i in range(0, len(shard_rows), BULK_CHUNK_SIZE):
+                        statement = make_statement(shard_rows[i:i + BULK_CHUNK_SIZE]).returning(*COLUMNS)
+                        returned.extend(dict(row._mapping) for row in conn.execute(statement))
+            except Exception as exc:
+                self._undo_inserts(committed)
+                if isinstance(exc, IntegrityError):
+                    raise DuplicateUserError(str(exc.orig)) from exc
+                raise
+            committed.append((shard, shard_rows))
+        return returned
+
+    def _undo_inserts(self, committed):
+        for shard, shard_rows in committed:
+            ids = [row['id'] for row in shard_rows]
+            with shard.write_lock, shard.engine.begin() as conn:
+                for i in range(0, len(ids), BULK_CHUNK_SIZE):
+                    conn.execute(delete(user_table).where(user_table.c.id.in_(ids[i:i + BULK_CHUNK_SIZE])))
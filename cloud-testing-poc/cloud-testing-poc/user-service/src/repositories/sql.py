@@ -0,0 +1,266 @@
+from flask import current_app
+import threading
+
+from sqlalchemy import bindparam, delete, func, insert, or_, select, text, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+
+from src.models.counters import RECONCILE_SQL, SEED_SQL, USER_COUNT, insert_counted_once, user_counter
+from src.models.stats import recompute_stats, stats_counted_once, user_domain_count, user_signup_count
+from src.models.user import User, db
+from src.repositories.base import DuplicateUserError, UserRepository, VersionConflictError
+
+user_table = User.__table__
+RETURNING = (user_table.c.id, user_table.c.username, user_table.c.email, user_table.c.version)
+FIELDS = tuple(column.key for column in RETURNING)
+COUNT_QUERY = select(user_counter.c.value).where(user_counter.c.name == USER_COUNT)
+# Built once so every execution hits the engine's compiled-statement cache.
+# SQLite reads LIMIT -1 as "no limit", and ids are signed 64-bit integers.
+LIST_QUERY = (select(*RETURNING).where(user_table.c.id > bindparam('after_id'))
+              .order_by(user_table.c.id).limit(bindparam('limit')))
+GET_QUERY = select(*RETURNING).where(user_table.c.id == bindparam('user_id'))
+MAX_ID_QUERY = select(func.max(user_table.c.id))
+GET_MANY_QUERY = select(*RETURNING).where(user_table.c.id.in_(bindparam('user_ids', expanding=True)))
+TAKEN_QUERY = (select(user_table.c.id).where(or_(user_table.c.username == bindparam('username'),
+                                                  user_table.c.email == bindparam('email'))).limit(1))
+TOP_DOMAINS_QUERY = (select(user_domain_count.c.domain, user_domain_count.c.value)
+                     .order_by(user_domain_count.c.value.desc(), user_domain_count.c.domain)
+                     .limit(bindparam('limit')))
+SIGNUPS_QUERY = (select(user_signup_count.c.hour, user_signup_count.c.value)
+                 .where(user_signup_count.c.hour >= bindparam('since')))
+NO_LIMIT = -1
+MIN_ID = -2 ** 63
+# Keeps every bulk statement well under SQLite's bound-variable limit.
+BULK_CHUNK_SIZE = 500
+
+# Imports bind tuples straight into the driver's executemany; compiling a
+# Core statement and processing 5000 parameter dicts would cost more than
+# SQLite spends inserting the rows.
+IMPORT_SQL = 'INSERT INTO user (id, username, email) VALUES (?, ?, ?)'
+IMPORT_CONFLICT_CLAUSES = {
+    'fail': '',
+    'skip': ' ON CONFLICT DO NOTHING',
+    'overwrite': ' ON CONFLICT(username) DO UPDATE SET email = excluded.email, version = version + 1',
+}
+
+
+class IdSequence:
+    """In-process id counter for ids that must be known before their insert."""
+
+    def __init__(self, start):
+        self._next = start
+        self._lock = threading.Lock()
+
+    def take(self, count=1):
+        with self._lock:
+            start = self._next
+            self._next += count
+            return range(start, start + count)
+
+    def advance(self, past_id):
+        """Make sure no id up to ``past_id`` is handed out later."""
+        with self._lock:
+            self._next = max(self._next, past_id + 1)
+
+
+class SQLAlchemyUserRepository(UserRepository):
+    """Users stored through Flask-SQLAlchemy.
+
+    Every single-user write is one statement with RETURNING, committed
+    either directly or through the group-commit writer when it is enabled.
+    Bulk writes are chunked but still commit as one transaction.
+
+    With ``core_reads`` (the default), listing and fetching users run
+    prebuilt column-only Core selects and build the response dicts straight
+    from the driver rows, skipping ORM instances, their instrumentation and
+    the session identity map.
+    """
+
+    def __init__(self, core_reads=True):
+        self.core_reads = core_reads
+        self.id_sequence = None
+
+    def assign_ids(self):
+        """Assign ids in this process from now on, seeded from the table.
+
+        Afterwards :meth:`reserve_ids` can hand out ids ahead of their
+        inserts, and every insert through this repository takes its id
+        from the same sequence, so a reserved id is never taken by another
+        write. Only valid with a single writer process.
+        """
+        max_id = db.session.execute(MAX_ID_QUERY).scalar()
+        self.id_sequence = IdSequence(max(max_id or 0, 0) + 1)
+
+    def reserve_ids(self, count):
+        return self.id_sequence.take(count)
+
+    def _new_ids(self, count):
+        """Explicit ids for ``count`` inserts, or ``None``s for SQLite to pick."""
+        return self.id_sequence.take(count) if self.id_sequence is not None else [None] * count
+
+    def list_users(self, after_id=None, limit=None):
+        if self.core_reads:
+            rows = db.session.execute(LIST_QUERY, {
+                'after_id': MIN_ID if after_id is None else after_id,
+                'limit': NO_LIMIT if limit is None else limit,
+            })
+            return [dict(zip(FIELDS, row)) for row in rows]
+
+        query = User.query.order_by(User.id)
+        if after_id is not None:
+            query = query.filter(User.id > after_id)
+        if limit is not None:
+            query = query.limit(limit)
+        return [user.to_dict() for user in query]
+
+    def get(self, user_id):
+        if self.core_reads:
+            row = db.session.execute(GET_QUERY, {'user_id': user_id}).first()
+            return dict(zip(FIELDS, row)) if row is not None else None
+
+        user = db.session.get(User, user_id)
+        return user.to_dict() if user is not None else None
+
+    def get_many(self, user_ids):
+        # Always a Core select: one IN query per chunk, whatever core_reads says.
+        ids = list(dict.fromkeys(user_ids))
+        found = {}
+        for i in range(0, len(ids), BULK_CHUNK_SIZE):
+            for row in db.session.execute(GET_MANY_QUERY, {'user_ids': ids[i:i + BULK_CHUNK_SIZE]}):
+                found[row[0]] = dict(zip(FIELDS, row))
+        return found
+
+    def create(self, username, email):
+        statement = insert(user_table).values(id=self._new_ids(1)[0], username=username, email=email)
+        return self._write(statement.returning(*RETURNING))
+
+    def update(self, user_id, fields, expected_version=None):
+        # An empty update still has to prove the row exists, in the same statement.
+        values = {**fields, 'version': user_table.c.version + 1} if fields else {'id': user_table.c.id}
+        statement = update(user_table).where(user_table.c.id == user_id).values(values)
+        if expected_version is None:
+            return self._write(statement.returning(*RETURNING))
+        # Compare-and-swap: the version check and the write are one statement,
+        # so no lock is held between the client's read and this update.
+        row = self._write(statement.where(user_table.c.version == expected_version).returning(*RETURNING))
+        if row is None:
+            current = self.get(user_id)
+            if current is not None:
+                raise VersionConflictError(current)
+        return row
+
+    def delete(self, user_id):
+        statement = delete(user_table).where(user_table.c.id == user_id).returning(user_table.c.id)
+        return self._write(statement) is not None
+
+    def upsert(self, username, email):
+        statement = sqlite_insert(user_table).values(id=self._new_ids(1)[0], username=username, email=email)
+        statement = statement.on_conflict_do_update(
+            index_elements=[user_table.c.username],
+            set_={'email': statement.excluded.email, 'version': user_table.c.version + 1},
+        )
+        return self._write(statement.returning(*RETURNING))
+
+    def search(self, prefix, limit=50):
+        query = User.query.filter(or_(User.username.startswith(prefix, autoescape=True),
+                                      User.email.startswith(prefix, autoescape=True)))
+        return [user.to_dict() for user in query.order_by(User.id).limit(limit)]
+
+    def is_taken(self, username, email):
+        return db.session.execute(TAKEN_QUERY, {'username': username, 'email': email}).first() is not None
+
+    def bulk_create(self, users):
+        if not users:
+            return []
+        rows = [{'id': user_id, 'username': u['username'], 'email': u['email']}
+                for user_id, u in zip(self._new_ids(len(users)), users)]
+        statements = [insert(user_table).values(rows[i:i + BULK_CHUNK_SIZE]).returning(*RETURNING)
+                      for i in range(0, len(rows), BULK_CHUNK_SIZE)]
+        # SQLite does not promise RETURNING order; ids follow VALUES order.
+        return sorted(self._write(*statements, many=True), key=lambda row: row['id'])
+
+    def bulk_delete(self, user_ids):
+        if not user_ids:
+            return []
+        ids = list(user_ids)
+        statements = [delete(user_table).where(user_table.c.id.in_(ids[i:i + BULK_CHUNK_SIZE])).returning(user_table.c.id)
+                      for i in range(0, len(ids), BULK_CHUNK_SIZE)]
+        return sorted(row['id'] for row in self._write(*statements, many=True))
+
+    def import_batch(self, users, on_conflict):
+        # A missing id binds NULL, which SQLite replaces with a fresh rowid.
+        rows = [(u.get('id'), u['username'], u['email']) for u in users]
+        if not rows:
+            return 0
+        if self.id_sequence is not None:
+            given = [row[0] for row in rows if row[0] is not None]
+            if given:
+                self.id_sequence.advance(max(given))
+            fresh = iter(self.id_sequence.take(len(rows) - len(given)))
+            rows = [row if row[0] is not None else (next(fresh),) + row[1:] for row in rows]
+        sql = IMPORT_SQL + IMPORT_CONFLICT_CLAUSES[on_conflict]
+        try:
+            connection = db.session.connection()
+            if on_conflict == 'overwrite':
+                # Updated rows must not be counted, so the triggers stay on.
+                written = connection.exec_driver_sql(sql, rows).rowcount
+            elif on_conflict == 'fail':
+                # Every row is inserted or none is, so the stats can be added once.
+                with stats_counted_once(connection, [row[2] for row in rows]):
+                    written = insert_counted_once(connection, sql, rows)
+            else:
+                written = insert_counted_once(connection, sql, rows)
+            db.session.commit()
+        except IntegrityError as exc:
+            db.session.rollback()
+            raise DuplicateUserError(str(exc.orig)) from exc
+        return written
+
+    def count(self):
+        return db.session.execute(COUNT_QUERY).scalar() or 0
+
+    def reindex(self):
+        db.session.execute(text('REINDEX user'))
+        db.session.execute(text('ANALYZE user'))
+        db.session.commit()
+
+    def reconcile_count(self):
+        before = self.count()
+        db.session.execute(text(SEED_SQL))
+        repaired = db.session.execute(text(RECONCILE_SQL)).scalar()
+        db.session.commit()
+        return 0 if repaired is None else repaired - before
+
+    def stats(self, since_hour, top_domains):
+        domains = db.session.execute(TOP_DOMAINS_QUERY, {'limit': top_domains})
+        signups = db.session.execute(SIGNUPS_QUERY, {'since': since_hour})
+        return [tuple(row) for row in domains], dict(signups.all())
+
+    def recompute_stats(self):
+        drift = recompute_stats(db.session.connection())
+        db.session.commit()
+        return drift
+
+    def _write(self, *statements, many=False):
+        """Execute write statements in one transaction and commit it.
+
+        Returns the RETURNING rows as dicts: all of them when ``many`` is
+        set, otherwise the first one or ``None``.
+        """
+        def operation(session):
+            rows = [dict(row._mapping) for statement in statements for row in session.execute(statement)]
+            if many:
+                return rows
+            return rows[0] if rows else None
+
+        try:
+            writer = current_app.extensions.get('group_commit')
+            if writer is not None:
+                return writer.run(operation)
+            result = operation(db.session)
+            db.session.commit()
+            return result
+        except IntegrityError as exc:
+            db.session.rollback()
+            raise DuplicateUserError(str(exc.orig)) from exc
+
@@ -0,0 +1,49 @@
+import functools
+import threading
+
+WRITE_METHODS = ('create', 'update', 'delete', 'upsert', 'bulk_create', 'bulk_delete', 'import_batch',
+                 'reconcile_count', 'recompute_stats')
+
+
+class VersionedRepository:
+    """Delegates to a repository and counts the writes made through it.
+
+    ``version`` goes up when a write starts and again when it returns or
+    fails, so a read result that was computed entirely under one version
+    cannot be missing a write that had finished before the version was
+    read. It only sees writes made by this process. Listeners added with
+    :meth:`on_write` are called with the write method's name after each
+    write, successful or not.
+    """
+
+    def __init__(self, repository):
+        self.repository = repository
+        self.version = 0
+        self._listeners = []
+        self._lock = threading.Lock()
+        for name in WRITE_METHODS:
+            setattr(self, name, self._counted(getattr(repository, name)))
+
+    def __getattr__(self, name):
+        return getattr(self.repository, name)
+
+    def on_write(self, listener):
+        self._listeners.append(listener)
+
+    def _bump(self):
+        with self._lock:
+            self.version += 1
+
+    def _counted(self, write):
+        name = write.__name__
+
+        @functools.wraps(write)
+        def counted(*args, **kwargs):
+            self._bump()
+            try:
+                return write(*args, **kwargs)
+            finally:
+                self._bump()
+                for listener in self._listeners:
+                    listener(name)
+        return counted
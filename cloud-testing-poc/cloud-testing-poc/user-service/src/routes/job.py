@@ -0,0 +1,29 @@
+from flask import Blueprint, abort, jsonify, request
+from src.models.job import Job
+from src.models.user import db
+from src.services.jobs import get_job_runner
+
+job_bp = Blueprint('job', __name__)
+
+
+@job_bp.route('/jobs', methods=['GET'])
+def list_jobs():
+    limit = max(1, min(request.args.get('limit', 50, type=int), 500))
+    jobs = Job.query.order_by(Job.id.desc()).limit(limit)
+    return jsonify([job.to_dict() for job in jobs])
+
+@job_bp.route('/jobs/<int:job_id>', methods=['GET'])
+def get_job(job_id):
+    job = db.session.get(Job, job_id)
+    if job is None:
+        abort(404)
+    return jsonify(job.to_dict())
+
+@job_bp.route('/jobs/<int:job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    if db.session.get(Job, job_id) is None:
+        abort(404)
+    if not get_job_runner().cancel(job_id):
+        return jsonify({'error': 'job has already finished'}), 409
+    db.session.expire_all()
+    return jsonify(db.session.get(Job, job_id).to_dict()), 202
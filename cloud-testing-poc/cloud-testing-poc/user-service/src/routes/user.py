@@ -1,39 +1,282 @@
-from flask import Blueprint, jsonify, request
-from src.models.user import User, db
+import json
+import shutil
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from flask import Blueprint, abort, current_app, jsonify, request, stream_with_context, url_for
+from src.middleware.single_flight import coalesce
+from src.middleware.validation import as_id, integer, integer_arg
+from src.repositories.backend import get_user_repository
+from src.repositories.base import DuplicateUserError, VersionConflictError
+from src.services.group_commit import GroupCommitUnavailable
+from src.services.jobs import JobQueueFull, get_job_runner
+from src.services.negative_cache import get_user as find_user, get_users as find_users
+from src.services.snapshot import list_page, snapshot_response
+from src.services.uniqueness import note_users, precheck_unique
+from src.services.write_behind import WriteBehindFull, create_behind, held_keys
+from src.services.transfer import CONFLICT_POLICIES, EXPORT_FORMATS, IMPORT_FORMATS, import_users
+from src.services.user_jobs import bulk_delete_job, import_job, reindex_job
 
 user_bp = Blueprint('user', __name__)
 
-@user_bp.route('/users', methods=['GET'])
+WRITABLE_FIELDS = ('username', 'email')
+
+
+@user_bp.errorhandler(DuplicateUserError)
+def handle_conflict(error):
+    return jsonify({'error': 'username or email already exists'}), 409
+
+@user_bp.errorhandler(VersionConflictError)
+def handle_version_conflict(error):
+    return versioned(jsonify({'error': 'user was modified by another request', 'current': error.current}),
+                     error.current), 412
+
+@user_bp.errorhandler(GroupCommitUnavailable)
+@user_bp.errorhandler(JobQueueFull)
+@user_bp.errorhandler(WriteBehindFull)
+def handle_queue_full(error):
+    return jsonify({'error': str(error)}), 503, {'Retry-After': '1'}
+
+
+@user_bp.url_value_preprocessor
+def check_user_id(endpoint, values):
+    # The int converter takes ids of any size; one SQLite cannot store cannot exist.
+    if values and 'user_id' in values and as_id(values['user_id']) is None:
+        abort(404)
+
+
+def wants_async():
+    """Whether the client asked for a background job instead of a blocking call."""
+    return (request.args.get('async', '').lower() in ('1', 'true', 'yes')
+            or 'respond-async' in request.headers.get('Prefer', ''))
+
+
+def conditional(response):
+    """Tag a read with an ETag and answer 304 when the client's copy matches.
+
+    The query still runs, but an unchanged page costs no body on the wire and
+    no parsing or re-rendering in the client.
+    """
+    response.add_etag()
+    return response.make_conditional(request)
+
+
+def versioned(response, user):
+    """Tag a single-user response with the user's row version as its ETag."""
+    response.set_etag(str(user['version']))
+    return response
+
+
+def expected_version(data):
+    """The version an update is conditional on, from If-Match or ``version`` in the body.
+
+    Returns ``(version, None)``, where ``None`` means unconditional, or
+    ``(None, error response)``.
+    """
+    version = None
+    if request.if_match and not request.if_match.star_tag:
+        tags = request.if_match.as_set()
+        version = as_id(next(iter(tags))) if len(tags) == 1 else None
+        if version is None or version < 1:
+            return None, (jsonify({'error': 'If-Match must be a single user ETag'}), 400)
+    # The body's version has already been checked to be an integer.
+    if 'version' in data:
+        if version is not None and data['version'] != version:
+            return None, (jsonify({'error': 'If-Match and version disagree'}), 400)
+        version = data['version']
+    if version is None and not request.if_match and current_app.config['UPDATE_REQUIRE_VERSION']:
+        return None, (jsonify({'error': 'updates must send If-Match or version'}), 428)
+    return version, None
+
+
+def parse_ids(values):
+    """Validate a multi-get id list, returning ``(ids, None)`` or ``(None, error response)``."""
+    limit = current_app.config['MULTI_GET_MAX_IDS']
+    if isinstance(values, list) and len(values) > limit:
+        return None, (jsonify({'error': f'at most {limit} ids per request'}), 400)
+    user_ids = [as_id(value) for value in values] if isinstance(values, list) else None
+    if not user_ids or None in user_ids:
+        return None, (jsonify({'error': 'ids must be a non-empty list of 64-bit integers'}), 400)
+    return user_ids, None
+
+
+def multi_get(user_ids):
+    users, missing = find_users(user_ids)
+    return jsonify({'users': users, 'missing': missing})
+
+
+def accepted(job):
+    return jsonify(job), 202, {'Location': url_for('job.get_job', job_id=job['id'])}
+
+@user_bp.route('/users', methods=['GET', 'HEAD'])
 def get_users():
-    users = User.query.all()
-    return jsonify([user.to_dict() for user in users])
+    repository = get_user_repository()
+    if request.method == 'HEAD':
+        return '', 200, {'X-Total-Count': str(repository.count())}
+
+    if 'ids' in request.args:
+        user_ids, error = parse_ids(request.args['ids'].split(','))
+        if error:
+            return error
+        return conditional(coalesce(lambda: multi_get(user_ids)))
+
+    limit, error = integer_arg('limit', integer(minimum=1))
+    if error:
+        return error
+    after, error = integer_arg('after')
+    if error:
+        return error
+
+    def build():
+        users, headers = list_page(repository, after, limit)
+        response = jsonify(users)
+        response.headers.update(headers)
+        return response
+    response = snapshot_response(after, limit, request.accept_encodings)
+    return conditional(response if response is not None else coalesce(build))
 
 @user_bp.route('/users', methods=['POST'])
 def create_user():
-    
+
     data = request.json
-    user = User(username=data['username'], email=data['email'])
-    db.session.add(user)
-    db.session.commit()
-    return jsonify(user.to_dict()), 201
+    if 'write_behind' in current_app.extensions and wants_async():
+        user = create_behind(data['username'], data['email'])
+        return jsonify(user), 202, {'Location': url_for('user.get_user', user_id=user['id'])}
+    with held_keys([data]):
+        precheck_unique(data['username'], data['email'])
+        user = get_user_repository().create(data['username'], data['email'])
+        note_users([user])
+    return jsonify(user), 201
+
+@user_bp.route('/users/lookup', methods=['POST'])
+def lookup_users():
+    user_ids, error = parse_ids(request.json.get('ids') if isinstance(request.json, dict) else None)
+    if error:
+        return error
+    return multi_get(user_ids)
+
+@user_bp.route('/users/upsert', methods=['POST'])
+def upsert_user():
+    data = request.json
+    with held_keys([data]):
+        user = get_user_repository().upsert(data['username'], data['email'])
+        note_users([user])
+    return jsonify(user)
+
+@user_bp.route('/users/search', methods=['GET'])
+def search_users():
+    prefix = request.args.get('q', '')
+    limit = request.args.get('limit', 50, type=int)
+    if not prefix:
+        return jsonify({'error': 'q is required'}), 400
+    return coalesce(lambda: jsonify(get_user_repository().search(prefix, limit=max(1, min(limit, 1000)))))
+
+@user_bp.route('/users/stats', methods=['GET'])
+def user_stats():
+    top = request.args.get('domains', 20, type=int)
+    if top < 1 or top > 1000:
+        return jsonify({'error': 'domains must be between 1 and 1000'}), 400
+
+    def build():
+        repository = get_user_repository()
+        current_hour = int(time.time()) // 3600
+        domains, signups = repository.stats(current_hour - 23, top)
+        hourly = [{'hour': datetime.fromtimestamp(hour * 3600, timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+                   'users': signups.get(hour, 0)} for hour in range(current_hour - 23, current_hour + 1)]
+        last_day = sum(entry['users'] for entry in hourly)
+        return jsonify({
+            'total': repository.count(),
+            'domains': [{'domain': domain, 'users': users} for domain, users in domains],
+            'signups': {'last_hour': hourly[-1]['users'], 'last_24_hours': last_day,
+                        'per_hour': round(last_day / 24, 2), 'hourly': hourly},
+        })
+    return conditional(coalesce(build))
+
+@user_bp.route('/users/bulk', methods=['POST'])
+def bulk_create_users():
+    data = request.json
+    with held_keys(data):
+        users = get_user_repository().bulk_create(data)
+        note_users(users)
+    return jsonify(users), 201
+
+@user_bp.route('/users/bulk-delete', methods=['POST'])
+def bulk_delete_users():
+    data = request.json
+    if wants_async():
+        return accepted(get_job_runner().submit('bulk_delete', bulk_delete_job, {'count': len(data['ids'])},
+                                                user_ids=data['ids']))
+    return jsonify({'deleted': get_user_repository().bulk_delete(data['ids'])})
+
+@user_bp.route('/users/reindex', methods=['POST'])
+def reindex_users():
+    return accepted(get_job_runner().submit('reindex', reindex_job))
+
+@user_bp.route('/users/export', methods=['GET'])
+def export_users():
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'error': f'format must be one of {sorted(EXPORT_FORMATS)}'}), 400
+    render, mimetype = EXPORT_FORMATS[export_format]
+    users = get_user_repository().iter_users()
+    return current_app.response_class(
+        stream_with_context(render(users)), mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename=users.{export_format}'},
+    )
+
+@user_bp.route('/users/import', methods=['POST'])
+def import_users_stream():
+    default_format = 'csv' if request.mimetype == 'text/csv' else 'ndjson'
+    import_format = request.args.get('format', default_format)
+    on_conflict = request.args.get('on_conflict', 'fail')
+    if import_format not in IMPORT_FORMATS:
+        return jsonify({'error': f'format must be one of {sorted(IMPORT_FORMATS)}'}), 400
+    if on_conflict not in CONFLICT_POLICIES:
+        return jsonify({'error': f'on_conflict must be one of {list(CONFLICT_POLICIES)}'}), 400
+
+    batch_size = current_app.config['USER_IMPORT_BATCH_SIZE']
+    if wants_async():
+        # The job outlives the request, so spool the body to disk first.
+        with tempfile.NamedTemporaryFile(prefix='user-import-', delete=False) as spool:
+            shutil.copyfileobj(request.stream, spool, 1 << 20)
+        return accepted(get_job_runner().submit(
+            'import', import_job, {'format': import_format, 'on_conflict': on_conflict},
+            path=spool.name, import_format=import_format, on_conflict=on_conflict, batch_size=batch_size,
+        ))
+
+    chunks = IMPORT_FORMATS[import_format](request.stream)
+    progress = import_users(get_user_repository(), chunks, on_conflict, batch_size)
+    # The body is read while the response streams, one progress line per batch.
+    lines = (json.dumps(update) + '\n' for update in progress)
+    return current_app.response_class(stream_with_context(lines), mimetype='application/x-ndjson')
 
 @user_bp.route('/users/<int:user_id>', methods=['GET'])
 def get_user(user_id):
-    user = User.query.get_or_404(user_id)
-    return jsonify(user.to_dict())
+    def build():
+        user = find_user(user_id)
+        if user is None:
+            abort(404)
+        return versioned(jsonify(user), user)
+    return conditional(coalesce(build))
 
-@user_bp.route('/users/<int:user_id>', methods=['PUT'])
+@user_bp.route('/users/<int:user_id>', methods=['PUT', 'PATCH'])
 def update_user(user_id):
-    user = User.query.get_or_404(user_id)
     data = request.json
-    user.username = data.get('username', user.username)
-    user.email = data.get('email', user.email)
-    db.session.commit()
-    return jsonify(user.to_dict())
+    fields = {field: data[field] for field in WRITABLE_FIELDS if field in data}
+    version, error = expected_version(data)
+    if error:
+        return error
+    with held_keys([fields]):
+        user = get_user_repository().update(user_id, fields, expected_version=version)
+        if user is not None:
+            note_users([user])
+    if user is None:
+        abort(404)
+    return versioned(jsonify(user), user)
 
 @user_bp.route('/users/<int:user_id>', methods=['DELETE'])
 def delete_user(user_id):
-    user = User.query.get_or_404(user_id)
-    db.session.delete(user)
-    db.session.commit()
+    if not get_user_repository().delete(user_id):
+        abort(404)
     return '', 204
@@ -0,0 +1,94 @@
+import queue
+import threading
+from abc import ABC, abstractmethod
+
+_STOP = object()
+
+
+class BatchWriter(ABC):
+    """Background thread that hands queued records to :meth:`write_batch`.
+
+    Callers only ``put_nowait`` a record onto a bounded queue; encoding and
+    I/O happen on the writer thread. When the queue is full the record is
+    dropped and counted rather than making the caller wait. Once a record
+    arrives the writer lets up to ``flush_interval`` seconds' worth
+    accumulate, then passes up to ``batch_size`` records to
+    :meth:`write_batch` at once. A batch that fails with ``OSError`` or
+    ``ValueError`` is counted as dropped.
+    """
+
+    thread_name = 'batch-writer'
+
+    def __init__(self, queue_size=10000, batch_size=256, flush_interval=0.5):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self._lock = threading.Lock()
+        self._closing = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=self.thread_name, daemon=True)
+        self._thread.start()
+
+    def submit(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+    def close(self, timeout=5.0):
+        """Write everything queued so far and stop the thread."""
+        if not self._thread.is_alive():
+            return
+        self._closing.set()
+        try:
+            self.queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
+
+    def stats(self):
+        return {
+            'queued': self.queue.qsize(),
+            'written': self.written,
+            'dropped': self.dropped,
+            'batches': self.batches,
+        }
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            record = self.queue.get()
+            if record is _STOP:
+                break
+            batch = [record]
+            # Linger instead of blocking on the queue, so a caller does not
+            # wake this thread for every record it submits.
+            if self.queue.qsize() < self.batch_size - 1:
+                self._closing.wait(self.flush_interval)
+            while len(batch) < self.batch_size:
+                try:
+                    record = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if record is _STOP:
+                    stopping = True
+                    break
+                batch.append(record)
+            self._write(batch)
+
+    @abstractmethod
+    def write_batch(self, batch):
+        """Write a list of queued records; called on the writer thread only."""
+
+    def _write(self, batch):
+        try:
+            self.write_batch(batch)
+        except (OSError, ValueError):
+            with self._lock:
+                self.dropped += len(batch)
+            return
+        self.written += len(batch)
+        self.batches += 1
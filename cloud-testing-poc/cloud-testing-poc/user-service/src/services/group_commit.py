@@ -0,0 +1,223 @@
+import atexit
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+from sqlalchemy import event
+
+from src.config import env_bool, env_float, env_int
+from src.models.user import db
+
+_STOP = object()
+
+
+class GroupCommitUnavailable(Exception):
+    """Raised when a write cannot be handed to, or answered by, the writer."""
+
+
+class GroupCommitWriter:
+    """Single writer thread that commits concurrent writes together.
+
+    Each submitted operation is a callable taking the writer's session. The
+    writer collects operations for at most ``window_us`` microseconds or
+    ``max_batch`` items, runs each one inside its own SAVEPOINT and then
+    issues one COMMIT for the whole batch, so N concurrent requests cost a
+    single fsync. A failing operation (e.g. a unique constraint violation)
+    only rolls back its own savepoint; its future receives the exception
+    while the rest of the batch still commits. Once :meth:`stop` has been
+    called new writes are refused, and any write the thread leaves queued
+    fails rather than waiting forever.
+    """
+
+    def __init__(self, app, max_batch=64, window_us=2000, max_queue=1024, timeout=30.0):
+        self.app = app
+        self.max_batch = max_batch
+        self.window = window_us / 1_000_000
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.batches = 0
+        self.committed = 0
+        self._last_batch_size = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._stopping = False
+        # Held while enqueueing, so no write can land behind _STOP.
+        self._submit_lock = threading.Lock()
+
+    def start(self):
+        with self.app.app_context():
+            _enable_sqlite_savepoints(db.engine)
+        self._thread = threading.Thread(target=self._run, name='group-commit-writer', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5.0):
+        """Drain queued writes and stop the writer thread."""
+        with self._submit_lock:
+            if self._stopping:
+                return
+            self._stopping = True
+            if self._thread is None or not self._thread.is_alive():
+                return
+            self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def depth(self):
+        return self._queue.qsize()
+
+    def submit(self, operation):
+        """Queue ``operation(session)`` and return a Future for its result.
+
+        Blocks when ``max_queue`` writes are already waiting.
+        """
+        future = Future()
+        with self._submit_lock:
+            if self._stopping:
+                raise GroupCommitUnavailable('group commit writer is stopped')
+            self._queue.put((operation, future))
+        return future
+
+    def run(self, operation):
+        """Submit ``operation`` and wait up to ``timeout`` seconds for its result."""
+        try:
+            return self.submit(operation).result(self.timeout)
+        except FutureTimeout:
+            raise GroupCommitUnavailable(f'group commit did not answer within {self.timeout}s') from None
+
+    def _run(self):
+        try:
+            self._loop()
+        finally:
+            self._fail_queued()
+
+    def _loop(self):
+        with self.app.app_context():
+            stopping = False
+            while not stopping:
+                item = self._queue.get()
+                if item is _STOP:
+                    break
+                batch = [item]
+                # A lone writer gains nothing from waiting, so only hold the
+                # window open when writes are actually arriving concurrently.
+                window = self.window if self._last_batch_size > 1 or not self._queue.empty() else 0
+                deadline = time.perf_counter() + window
+                while len(batch) < self.max_batch:
+                    remaining = deadline - time.perf_counter()
+                    try:
+                        item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is _STOP:
+                        stopping = True
+                        break
+                    batch.append(item)
+                self._last_batch_size = len(batch)
+                self._commit(batch)
+
+    def _fail_queued(self):
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if item is not _STOP and item[1].set_running_or_notify_cancel():
+                item[1].set_exception(GroupCommitUnavailable('group commit writer is stopped'))
+
+    def _commit(self, batch):
+        session = db.session
+        outcomes = []
+        try:
+            for operation, future in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                savepoint = session.begin_nested()
+                try:
+                    result = operation(session)
+                    savepoint.commit()
+                except Exception as exc:
+                    savepoint.rollback()
+                    outcomes.append((future, None, exc))
+                else:
+                    outcomes.append((future, result, None))
+            session.commit()
+        except Exception as exc:
+            session.rollback()
+            errors = {future: error for future, _, error in outcomes}
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(errors.get(future) or exc)
+            return
+        finally:
+            session.remove()
+
+        self.batches += 1
+        for future, result, error in outcomes:
+            if error is None:
+                self.committed += 1
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+
+def _enable_sqlite_savepoints(engine):
+    """Let SAVEPOINT work with pysqlite by issuing BEGIN ourselves.
+
+    The stdlib driver only opens a transaction before DML, so a leading
+    SAVEPOINT would otherwise start (and its RELEASE commit) a transaction of
+    its own. This is the recipe from the SQLAlchemy SQLite dialect docs.
+    """
+    if engine.dialect.name != 'sqlite' or event.contains(engine, 'begin', _emit_begin):
+        return
+    event.listen(engine, 'begin', _emit_begin)
+
+
+def _emit_begin(conn):
+    # Done here rather than in a connect hook so that connections already
+    # sitting in the pool are covered too.
+    dbapi_connection = conn.connection.dbapi_connection
+    if dbapi_connection.isolation_level is not None:
+        dbapi_connection.isolation_level = None
+    conn.exec_driver_sql('BEGIN')
+
+
+class GroupCommit:
+    """Optional group-commit mode for single-user writes.
+
+    Enabled with ``GROUP_COMMIT_ENABLED``; the window is bounded by
+    ``GROUP_COMMIT_MAX_BATCH`` writes and ``GROUP_COMMIT_WINDOW_US``
+    microseconds. A write not answered within ``GROUP_COMMIT_TIMEOUT``
+    seconds (default 30), or submitted after shutdown began, gets ``503``.
+    Must be initialised after the storage backend.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('GROUP_COMMIT_ENABLED', env_bool('GROUP_COMMIT_ENABLED'))
+        app.config.setdefault('GROUP_COMMIT_MAX_BATCH', env_int('GROUP_COMMIT_MAX_BATCH', 64))
+        app.config.setdefault('GROUP_COMMIT_WINDOW_US', env_int('GROUP_COMMIT_WINDOW_US', 2000))
+        app.config.setdefault('GROUP_COMMIT_MAX_QUEUE', env_int('GROUP_COMMIT_MAX_QUEUE', 1024))
+        app.config.setdefault('GROUP_COMMIT_TIMEOUT', env_float('GROUP_COMMIT_TIMEOUT', 30.0))
+
+        # Only the SQLAlchemy backend has commits worth grouping.
+        if not app.config['GROUP_COMMIT_ENABLED'] or app.config.get('USER_STORAGE_BACKEND') != 'sqlalchemy':
+            return
+
+        writer = GroupCommitWriter(app,
+                                   max_batch=app.config['GROUP_COMMIT_MAX_BATCH'],
+                                   window_us=app.config['GROUP_COMMIT_WINDOW_US'],
+                                   max_queue=app.config['GROUP_COMMIT_MAX_QUEUE'],
+                                   timeout=app.config['GROUP_COMMIT_TIMEOUT'])
+        writer.start()
+        atexit.register(writer.stop)
+        app.extensions['group_commit'] = writer
+
+        admission_state = app.extensions.get('admission')
+        if admission_state is not None:
+            admission_state.add_queue(writer.depth, writer.max_queue)
+
+
+group_commit = GroupCommit()
@@ -0,0 +1,167 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+from sqlalchemy import update
+
+from src.config import env_int
+from src.models.job import ACTIVE_STATES, CANCELLED, FAILED, QUEUED, RUNNING, SUCCEEDED, Job
+from src.models.user import db
+
+job_table = Job.__table__
+
+
+class JobCancelled(Exception):
+    """Raised inside a job when its cancellation has been requested."""
+
+
+class JobQueueFull(Exception):
+    """Raised when the runner already holds its maximum number of jobs."""
+
+
+class JobContext:
+    """Handle passed to a running job for progress reporting."""
+
+    __slots__ = ('job_id', '_cancel')
+
+    def __init__(self, job_id, cancel):
+        self.job_id = job_id
+        self._cancel = cancel
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def report(self, processed, total=None, result=None):
+        """Record progress, then raise :class:`JobCancelled` if asked to stop.
+
+        Jobs call this between units of work they have already committed,
+        so a cancelled job stops at a consistent point.
+        """
+        values = {'processed': processed}
+        if total is not None:
+            values['total'] = total
+        if result is not None:
+            values['result'] = json.dumps(result)
+        _update_job(self.job_id, **values)
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+
+class JobRunner:
+    """Runs jobs on a bounded thread pool and records them in the job table.
+
+    At most ``max_workers`` jobs run at once and at most ``max_queued``
+    more wait for a worker; beyond that :meth:`submit` raises
+    :class:`JobQueueFull`. Cancellation is cooperative: queued jobs are
+    cancelled immediately, running ones stop at their next
+    :meth:`JobContext.report`.
+    """
+
+    def __init__(self, app, max_workers=2, max_queued=16):
+        self.app = app
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self._cancel_events = {}
+        self._lock = threading.Lock()
+
+    def active(self):
+        return len(self._cancel_events)
+
+    def submit(self, kind, func, params=None, **kwargs):
+        """Persist a queued job that will run ``func(context, **kwargs)``.
+
+        ``params`` is stored with the job for display. Returns the job dict.
+        """
+        with self._lock:
+            if len(self._cancel_events) >= self.max_workers + self.max_queued:
+                raise JobQueueFull(f'{len(self._cancel_events)} jobs are already queued or running')
+            job = Job(kind=kind, params=json.dumps(params or {}))
+            db.session.add(job)
+            db.session.commit()
+            cancel = threading.Event()
+            self._cancel_events[job.id] = cancel
+        self.executor.submit(self._run, job.id, cancel, func, kwargs)
+        return job.to_dict()
+
+    def cancel(self, job_id):
+        """Request cancellation of a job; returns whether it was still active."""
+        now = time.time()
+        cancelled = _update_job(job_id, _when=QUEUED, status=CANCELLED, cancel_requested=True, finished_at=now)
+        if not cancelled:
+            cancelled = _update_job(job_id, _when=RUNNING, cancel_requested=True)
+        cancel = self._cancel_events.get(job_id)
+        if cancel is not None:
+            cancel.set()
+        return cancelled
+
+    def _run(self, job_id, cancel, func, kwargs):
+        try:
+            with self.app.app_context():
+                # Loses against a cancel that arrived while the job was queued.
+                if not _update_job(job_id, _when=QUEUED, status=RUNNING, started_at=time.time()):
+                    return
+                try:
+                    result = func(JobContext(job_id, cancel), **kwargs)
+                except JobCancelled:
+                    db.session.rollback()
+                    _update_job(job_id, status=CANCELLED, finished_at=time.time())
+                except Exception as exc:
+                    db.session.rollback()
+                    self.app.logger.exception('Job %s failed', job_id)
+                    _update_job(job_id, status=FAILED, error=str(exc), finished_at=time.time())
+                else:
+                    values = {'result': json.dumps(result)} if result is not None else {}
+                    _update_job(job_id, status=SUCCEEDED, finished_at=time.time(), **values)
+        finally:
+            with self._lock:
+                self._cancel_events.pop(job_id, None)
+
+
+def _update_job(job_id, _when=None, **values):
+    """Update one job row, optionally only while it is in state ``_when``."""
+    statement = update(job_table).where(job_table.c.id == job_id).values(**values)
+    if _when is not None:
+        statement = statement.where(job_table.c.status == _when)
+    updated = db.session.execute(statement).rowcount
+    db.session.commit()
+    return updated == 1
+
+
+class Jobs:
+    """Local background jobs with no external broker.
+
+    ``JOBS_MAX_WORKERS`` bounds how many jobs run at once and
+    ``JOBS_MAX_QUEUED`` how many may wait. The runner lives in this
+    process, so jobs found queued or running at startup were interrupted
+    by a restart and are marked failed. Must be initialised after the
+    database tables exist.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('JOBS_MAX_WORKERS', env_int('JOBS_MAX_WORKERS', 2))
+        app.config.setdefault('JOBS_MAX_QUEUED', env_int('JOBS_MAX_QUEUED', 16))
+
+        with app.app_context():
+            db.session.execute(
+                update(job_table).where(job_table.c.status.in_(ACTIVE_STATES))
+                .values(status=FAILED, error='interrupted by a restart', finished_at=time.time())
+            )
+            db.session.commit()
+
+        app.extensions['jobs'] = JobRunner(app, max_workers=app.config['JOBS_MAX_WORKERS'],
+                                           max_queued=app.config['JOBS_MAX_QUEUED'])
+
+
+def get_job_runner():
+    return current_app.extensions['jobs']
+
+
+jobs = Jobs()
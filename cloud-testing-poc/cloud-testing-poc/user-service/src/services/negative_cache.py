@@ -0,0 +1,154 @@
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, jsonify
+
+from src.config import debug_routes_enabled, env_bool, env_float, env_int
+from src.middleware.server_timing import record_cache
+from src.middleware.tracing import span
+from src.repositories.backend import get_user_repository
+
+# Writes that can give a previously missing id a row.
+INSERTING_WRITES = frozenset({'create', 'upsert', 'bulk_create', 'import_batch'})
+
+
+class NegativeCache:
+    """Bounded set of ids recently found missing, each kept for ``ttl`` seconds.
+
+    :meth:`clear` is called after every inserting write. A lookup that was
+    already running when the cache was cleared may have raced the insert,
+    so :meth:`add` only stores an id if no clear has happened since the
+    caller read :attr:`generation`.
+    """
+
+    def __init__(self, max_size=10000, ttl=10.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self._expiry = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, key):
+        now = time.monotonic()
+        with self._lock:
+            expires = self._expiry.get(key)
+            if expires is not None and expires <= now:
+                del self._expiry[key]
+                expires = None
+            if expires is None:
+                self.misses += 1
+                return False
+            self.hits += 1
+            return True
+
+    def add(self, key, generation):
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._expiry[key] = time.monotonic() + self.ttl
+            self._expiry.move_to_end(key)
+            if len(self._expiry) > self.max_size:
+                self._expiry.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._expiry.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'size': len(self._expiry), 'hits': self.hits, 'misses': self.misses,
+                    'generation': self.generation}
+
+
+def get_user(user_id):
+    """Fetch a user, answering recently missing ids without a query."""
+    repository = get_user_repository()
+    cache = current_app.extensions.get('negative_cache')
+    if cache is None:
+        return repository.get(user_id)
+    with span('cache.negative') as lookup:
+        missing = user_id in cache
+        if lookup is not None:
+            lookup.set_attribute('cache.hit', missing)
+    record_cache('negative', missing)
+    if missing:
+        return None
+    generation = cache.generation
+    user = repository.get(user_id)
+    if user is None:
+        cache.add(user_id, generation)
+    return user
+
+
+def get_users(user_ids):
+    """Fetch users by id in request order, returning ``(users, missing_ids)``.
+
+    Ids known to be missing are not queried; the rest are fetched with
+    :meth:`get_many` and the ones it does not find are remembered.
+    """
+    repository = get_user_repository()
+    cache = current_app.extensions.get('negative_cache')
+    user_ids = list(dict.fromkeys(user_ids))
+    known_missing = set()
+    if cache is not None:
+        with span('cache.negative', **{'cache.lookups': len(user_ids)}) as lookup:
+            known_missing = {user_id for user_id in user_ids if user_id in cache}
+            if lookup is not None:
+                lookup.set_attribute('cache.hits', len(known_missing))
+        generation = cache.generation
+    found = repository.get_many([user_id for user_id in user_ids if user_id not in known_missing])
+    missing = [user_id for user_id in user_ids if user_id not in found]
+    if cache is not None:
+        for user_id in missing:
+            if user_id not in known_missing:
+                cache.add(user_id, generation)
+    return [found[user_id] for user_id in user_ids if user_id in found], missing
+
+
+class MissingUserCache:
+    """Remembers ids that ``GET /api/users/<id>`` recently found missing.
+
+    Scrapers and stale clients asking again for deleted or never-created
+    ids get their 404 without a query. Up to ``NEGATIVE_CACHE_SIZE`` ids
+    (default 10000, least recently missed dropped first) are kept for
+    ``NEGATIVE_CACHE_TTL`` seconds (default 10), and the whole cache is
+    dropped after any write that inserts users through this process. The
+    TTL bounds how long an id created by another process can still 404.
+    On unless ``NEGATIVE_CACHE_ENABLED`` is false; with
+    ``DEBUG_ROUTES_ENABLED``, ``GET /api/debug/negative-cache`` reports its
+    size and hit counts. Must be initialised after the storage backend.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('NEGATIVE_CACHE_ENABLED', env_bool('NEGATIVE_CACHE_ENABLED', True))
+        app.config.setdefault('NEGATIVE_CACHE_SIZE', env_int('NEGATIVE_CACHE_SIZE', 10000))
+        app.config.setdefault('NEGATIVE_CACHE_TTL', env_float('NEGATIVE_CACHE_TTL', 10.0))
+
+        if not app.config['NEGATIVE_CACHE_ENABLED']:
+            return
+
+        cache = NegativeCache(app.config['NEGATIVE_CACHE_SIZE'], app.config['NEGATIVE_CACHE_TTL'])
+
+        def clear_on_insert(name):
+            if name in INSERTING_WRITES:
+                cache.clear()
+
+        app.extensions['user_repository'].on_write(clear_on_insert)
+        app.extensions['negative_cache'] = cache
+        if debug_routes_enabled(app):
+            app.add_url_rule('/api/debug/negative-cache', 'negative_cache_stats', self._stats, methods=['GET'])
+
+    @staticmethod
+    def _stats():
+        return jsonify(current_app.extensions['negative_cache'].stats())
+
+
+missing_user_cache = MissingUserCache()
@@ -0,0 +1,78 @@
+import atexit
+import threading
+
+from src.config import env_float
+from src.repositories.backend import get_user_repository
+
+
+class CountReconciler:
+    """Background thread that repairs drift in the maintained user count.
+
+    The count behind ``HEAD /api/users`` and ``X-Total-Count`` is kept by
+    triggers, so it only drifts if rows are changed behind the application's
+    back (e.g. a trigger dropped during a manual migration). Every
+    ``USER_COUNT_RECONCILE_INTERVAL`` seconds the counter is compared with a
+    real ``COUNT(*)`` and rewritten when they differ. An interval of 0
+    disables the thread; ``flask reconcile-user-count`` runs one pass by
+    hand. ``flask recompute-user-stats`` rebuilds the per-domain user
+    counts behind ``GET /api/users/stats`` from the rows; it scans the
+    whole table, so it only runs on demand. Must be initialised after the
+    storage backend.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('USER_COUNT_RECONCILE_INTERVAL',
+                              env_float('USER_COUNT_RECONCILE_INTERVAL', 0.0 if app.testing else 300.0))
+
+        @app.cli.command('reconcile-user-count')
+        def reconcile_command():
+            """Repair the maintained user count."""
+            print(f'Repaired drift: {reconcile_user_count(app):+d}')
+
+        @app.cli.command('recompute-user-stats')
+        def recompute_stats_command():
+            """Rebuild the maintained user statistics."""
+            print(f'Users miscounted: {recompute_user_stats(app)}')
+
+        interval = app.config['USER_COUNT_RECONCILE_INTERVAL']
+        if interval <= 0:
+            return
+
+        stop = threading.Event()
+        thread = threading.Thread(target=_run, args=(app, interval, stop), name='count-reconciler', daemon=True)
+        thread.start()
+        atexit.register(stop.set)
+        app.extensions['count_reconciler'] = stop
+
+
+def reconcile_user_count(app):
+    """Run one reconciliation pass and return the drift that was repaired."""
+    with app.app_context():
+        drift = get_user_repository().reconcile_count()
+    if drift:
+        app.logger.warning('Repaired user count drift of %+d', drift)
+    return drift
+
+
+def recompute_user_stats(app):
+    """Rebuild the domain counts from the rows and return how many users were miscounted."""
+    with app.app_context():
+        drift = get_user_repository().recompute_stats()
+    if drift:
+        app.logger.warning('Recomputed user stats; %d users were miscounted', drift)
+    return drift
+
+
+def _run(app, interval, stop):
+    while not stop.wait(interval):
+        try:
+            reconcile_user_count(app)
+        except Exception:
+            app.logger.exception('User count reconciliation failed')
+
+
+count_reconciler = CountReconciler()
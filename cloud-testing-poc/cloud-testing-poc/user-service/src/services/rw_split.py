@@ -0,0 +1,68 @@
+import os
+import sqlite3
+from contextlib import closing
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+
+from src.config import env_bool, env_int
+
+
+class ReadWriteEngines:
+    __slots__ = ('reader', 'path')
+
+    def __init__(self, reader, path):
+        self.reader = reader
+        self.path = path
+
+
+class ReadWriteSplit:
+    """Separate reader and writer engines for a file-backed SQLite database.
+
+    The database is switched to WAL so readers never block the writer. The
+    Flask-SQLAlchemy engine becomes the writer and is limited to a single
+    pooled connection, which serialises writes in the pool instead of on
+    SQLite's lock. Reads go to a pool of ``mode=ro`` connections sized to
+    the CPU count; :class:`~src.models.session.RoutingSession` picks the
+    engine per request.
+
+    Must be initialised before the database, because it sets the writer's
+    engine options.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('RW_SPLIT_ENABLED', env_bool('RW_SPLIT_ENABLED'))
+        app.config.setdefault('RW_SPLIT_READ_POOL_SIZE', env_int('RW_SPLIT_READ_POOL_SIZE', os.cpu_count() or 1))
+        app.config.setdefault('RW_SPLIT_READ_ENDPOINTS', set())
+
+        if not app.config['RW_SPLIT_ENABLED']:
+            return
+
+        url = make_url(app.config['SQLALCHEMY_DATABASE_URI'])
+        if url.get_backend_name() != 'sqlite' or url.database in (None, '', ':memory:'):
+            raise ValueError('RW_SPLIT_ENABLED requires a file-backed SQLite database')
+        path = os.path.abspath(url.database)
+
+        # WAL is a property of the database file, so set it once up front.
+        with closing(sqlite3.connect(path)) as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+
+        engine_options = app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {})
+        engine_options.update(pool_size=1, max_overflow=0)
+
+        pool_size = app.config['RW_SPLIT_READ_POOL_SIZE']
+        reader = create_engine(f'sqlite:///file:{path}?mode=ro&uri=true',
+                               pool_size=pool_size, max_overflow=0)
+        event.listen(reader, 'connect', _configure_reader)
+        app.extensions['rw_split'] = ReadWriteEngines(reader, path)
+
+
+def _configure_reader(dbapi_connection, connection_record):
+    dbapi_connection.execute('PRAGMA query_only=ON')
+
+
+rw_split = ReadWriteSplit()
@@ -0,0 +1,211 @@
+import atexit
+import gzip
+import threading
+from collections import OrderedDict
+
+from flask import current_app, jsonify
+
+from src.config import env_bool, env_float, env_int
+from src.middleware.server_timing import record_cache
+from src.middleware.tracing import span
+from src.models.user import db
+
+
+def list_page(repository, after_id=None, limit=None):
+    """Return a page of users and the response headers that describe it."""
+    users = repository.list_users(after_id=after_id, limit=limit)
+    headers = {}
+    if limit is not None:
+        headers['X-Total-Count'] = str(repository.count())
+        if len(users) == limit:
+            headers['X-Next-Cursor'] = str(users[-1]['id'])
+    return users, headers
+
+
+class Snapshot:
+    """One page's response, encoded and ready to send, as of a repository version."""
+
+    __slots__ = ('version', 'body', 'headers', 'gzip_body', 'gzip_headers')
+
+    def __init__(self, version, body, headers, gzip_body=None, gzip_headers=None):
+        self.version = version
+        self.body = body
+        self.headers = headers
+        self.gzip_body = gzip_body
+        self.gzip_headers = gzip_headers
+
+
+class SnapshotCache:
+    """Encoded user list pages, rebuilt by a background thread after writes.
+
+    A page is keyed by its ``(after, limit)`` arguments. Asking for a page
+    that is missing or older than the repository's write version is a miss:
+    the page is remembered (up to ``max_pages``, least recently asked
+    dropped first) and the builder thread is woken to encode it. After
+    every write the builder waits ``rebuild_delay`` seconds, so a burst of
+    writes costs one rebuild, and re-encodes every remembered page.
+    """
+
+    def __init__(self, app, repository, max_pages=256, compress=True, rebuild_delay=0.05):
+        self.app = app
+        self.repository = repository
+        self.max_pages = max_pages
+        self.compress = compress
+        self.rebuild_delay = rebuild_delay
+        self.hits = 0
+        self.misses = 0
+        self.builds = 0
+        self._pages = OrderedDict()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        repository.on_write(lambda name: self._wake.set())
+        self._thread = threading.Thread(target=self._run, name='snapshot-builder', daemon=True)
+        self._thread.start()
+
+    def get(self, key):
+        """The current snapshot for ``key``, or None after scheduling a build."""
+        version = self.repository.version
+        with self._lock:
+            snapshot = self._pages.get(key)
+            if key in self._pages:
+                self._pages.move_to_end(key)
+            else:
+                self._pages[key] = None
+                if len(self._pages) > self.max_pages:
+                    self._pages.popitem(last=False)
+            if snapshot is not None and snapshot.version == version:
+                self.hits += 1
+                return snapshot
+            self.misses += 1
+        self._wake.set()
+        return None
+
+    def stop(self, timeout=5.0):
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(timeout)
+
+    def stats(self):
+        version = self.repository.version
+        with self._lock:
+            snapshots = [snapshot for snapshot in self._pages.values() if snapshot is not None]
+            return {
+                'pages': len(self._pages),
+                'current': sum(snapshot.version == version for snapshot in snapshots),
+                'bytes': sum(len(snapshot.body) + len(snapshot.gzip_body or b'') for snapshot in snapshots),
+                'hits': self.hits,
+                'misses': self.misses,
+                'builds': self.builds,
+            }
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            if self._stop.wait(self.rebuild_delay):
+                return
+            self._wake.clear()
+            try:
+                with self.app.app_context():
+                    try:
+                        self._rebuild()
+                    finally:
+                        db.session.remove()
+            except Exception:
+                self.app.logger.exception('User list snapshot rebuild failed')
+
+    def _rebuild(self):
+        with self._lock:
+            keys = list(self._pages)
+        for key in keys:
+            if self._stop.is_set():
+                return
+            version = self.repository.version
+            current = self._pages.get(key)
+            if current is not None and current.version == version:
+                continue
+            snapshot = self._build(key, version)
+            with self._lock:
+                # A write that overlapped the build may be missing from it.
+                if key in self._pages and self.repository.version == version:
+                    self._pages[key] = snapshot
+                    self.builds += 1
+                    continue
+            self._wake.set()
+
+    def _build(self, key, version):
+        after, limit = key
+        users, headers = list_page(self.repository, after, limit)
+        response = self.app.json.response(users)
+        response.headers.update(headers)
+        response.add_etag()
+        body = response.get_data()
+        if not self.compress:
+            return Snapshot(version, body, list(response.headers.items()))
+
+        response.headers['Vary'] = 'Accept-Encoding'
+        plain_headers = list(response.headers.items())
+        response.set_data(gzip.compress(body, 6))
+        response.headers['Content-Encoding'] = 'gzip'
+        response.add_etag(overwrite=True)
+        return Snapshot(version, body, plain_headers, response.get_data(), list(response.headers.items()))
+
+
+def snapshot_response(after, limit, accept_encodings):
+    """Serve a user list page from its snapshot, or None when there is none yet."""
+    cache = current_app.extensions.get('user_snapshot')
+    if cache is None:
+        return None
+    with span('cache.snapshot') as lookup:
+        snapshot = cache.get((after, limit))
+        if lookup is not None:
+            lookup.set_attribute('cache.hit', snapshot is not None)
+    record_cache('snapshot', snapshot is not None)
+    if snapshot is None:
+        return None
+    if snapshot.gzip_body is not None and accept_encodings['gzip']:
+        return current_app.response_class(snapshot.gzip_body, headers=snapshot.gzip_headers)
+    return current_app.response_class(snapshot.body, headers=snapshot.headers)
+
+
+class UserListSnapshot:
+    """Serves ``GET /api/users`` pages from pre-encoded snapshots.
+
+    Enabled with ``SNAPSHOT_ENABLED``. Pages that have been asked for are
+    kept encoded (and gzipped unless ``SNAPSHOT_COMPRESS`` is off, sent to
+    clients that accept it) together with their headers and ETag, so a hit
+    costs no query and no encoding. A snapshot is only served while the
+    repository is at the write version it was built from; after a write,
+    reads fall through to the database until the builder thread has
+    re-encoded the pages. Writes from other processes are not seen, so
+    only enable this where all writes go through one process. ``GET
+    /api/debug/snapshot`` reports hits, misses and the pages held. Must be
+    initialised after the storage backend.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SNAPSHOT_ENABLED', env_bool('SNAPSHOT_ENABLED'))
+        app.config.setdefault('SNAPSHOT_MAX_PAGES', env_int('SNAPSHOT_MAX_PAGES', 256))
+        app.config.setdefault('SNAPSHOT_COMPRESS', env_bool('SNAPSHOT_COMPRESS', True))
+        app.config.setdefault('SNAPSHOT_REBUILD_DELAY', env_float('SNAPSHOT_REBUILD_DELAY', 0.05))
+
+        if not app.config['SNAPSHOT_ENABLED']:
+            return
+
+        cache = SnapshotCache(app, app.extensions['user_repository'], max_pages=app.config['SNAPSHOT_MAX_PAGES'],
+                              compress=app.config['SNAPSHOT_COMPRESS'],
+                              rebuild_delay=app.config['SNAPSHOT_REBUILD_DELAY'])
+        atexit.register(cache.stop)
+        app.extensions['user_snapshot'] = cache
+        app.add_url_rule('/api/debug/snapshot', 'snapshot_stats', self._stats, methods=['GET'])
+
+    @staticmethod
+    def _stats():
+        return jsonify(current_app.extensions['user_snapshot'].stats())
+
+
+user_list_snapshot = UserListSnapshot()
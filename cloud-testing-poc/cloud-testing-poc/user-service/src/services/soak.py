@@ -0,0 +1,131 @@
+import gc
+import json
+import random
+import time
+import tracemalloc
+from collections import Counter
+
+OPERATIONS = ('create', 'get', 'list', 'search', 'update', 'delete')
+
+
+def count_objects():
+    """Live objects tracked by the garbage collector, by type name."""
+    gc.collect()
+    return Counter(type(obj).__qualname__ for obj in gc.get_objects())
+
+
+class Sample:
+    __slots__ = ('operations', 'elapsed', 'traced', 'objects')
+
+    def __init__(self, operations, elapsed, traced, objects):
+        self.operations = operations
+        self.elapsed = elapsed
+        self.traced = traced
+        self.objects = objects
+
+
+def find_monotonic_growth(samples, min_growth=100, warmup=1):
+    """Types whose object count never fell and grew by ``min_growth`` overall.
+
+    The first ``warmup`` samples are ignored so caches, pools and lazily
+    imported modules can settle. A steady workload should plateau; a type
+    that only ever grows is the signature of a leak. Returns
+    ``{type: [count per sample]}`` for the flagged types.
+    """
+    samples = samples[warmup:]
+    if len(samples) < 3:
+        return {}
+    flagged = {}
+    for name in set().union(*(sample.objects for sample in samples)):
+        counts = [sample.objects.get(name, 0) for sample in samples]
+        if counts[-1] - counts[0] >= min_growth and all(a <= b for a, b in zip(counts, counts[1:])):
+            flagged[name] = counts
+    return flagged
+
+
+class SoakRunner:
+    """Drives a mixed workload through an app's test client and samples memory.
+
+    The live data set is held near ``max_users`` by deleting as often as it
+    creates once full, so a healthy service should reach a steady state.
+    Every ``sample_every`` operations the runner records the traced heap
+    and the object count per type.
+    """
+
+    def __init__(self, app, max_users=1000, seed=0):
+        self.client = app.test_client()
+        self.max_users = max_users
+        self.rng = random.Random(seed)
+        self.live = []
+        self.serial = 0
+
+    def run(self, operations, sample_every, on_sample=None, trace=True):
+        """Run ``operations`` steps and return the samples taken.
+
+        With ``trace`` the traced heap size is sampled too, at the cost of
+        slowing every allocation down.
+        """
+        started = trace and not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start()
+        try:
+            begin = time.perf_counter()
+            samples = [self._sample(0, begin)]
+            for done in range(1, operations + 1):
+                self.step()
+                if done % sample_every == 0 or done == operations:
+                    samples.append(self._sample(done, begin))
+                    if on_sample is not None:
+                        on_sample(samples[-1])
+            return samples
+        finally:
+            if started:
+                tracemalloc.stop()
+
+    def step(self):
+        operation = self.rng.choice(OPERATIONS)
+        if operation == 'create' or not self.live:
+            if len(self.live) >= self.max_users:
+                self._delete()
+            self._create()
+        elif operation == 'delete':
+            self._delete()
+        elif operation == 'get':
+            self._expect(self.client.get(f'/api/users/{self.rng.choice(self.live)}'), 200)
+        elif operation == 'list':
+            self._expect(self.client.get(f'/api/users?limit=50&after={self.rng.choice(self.live)}'), 200)
+        elif operation == 'search':
+            self._expect(self.client.get(f'/api/users/search?q=soak{self.rng.randrange(10)}'), 200)
+        else:
+            self._expect(self.client.patch(f'/api/users/{self.rng.choice(self.live)}',
+                                           data=json.dumps({'email': f'u{self._next()}@example.com'}),
+                                           content_type='application/json'), 200)
+
+    def _next(self):
+        self.serial += 1
+        return self.serial
+
+    def _create(self):
+        serial = self._next()
+        response = self.client.post('/api/users', data=json.dumps({'username': f'soak{serial}',
+                                                                   'email': f'soak{serial}@example.com'}),
+                                    content_type='application/json')
+        self._expect(response, 201)
+        self.live.append(response.get_json()['id'])
+
+    def _delete(self):
+        index = self.rng.randrange(len(self.live))
+        self.live[index], self.live[-1] = self.live[-1], self.live[index]
+        self._expect(self.client.delete(f'/api/users/{self.live.pop()}'), 204)
+
+    @staticmethod
+    def _expect(response, status):
+        if response.status_code != status:
+            raise AssertionError(f'{response.request.method} {response.request.path} returned '
+                                 f'{response.status_code}, expected {status}')
+
+    @staticmethod
+    def _sample(operations, begin):
+        objects = count_objects()
+        traced = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None
+        return Sample(operations, time.perf_counter() - begin, traced, objects)
@@ -0,0 +1,173 @@
+import csv
+import io
+import json
+from itertools import islice
+
+from src.middleware.validation import USER, first_error, is_user
+from src.repositories.base import DuplicateUserError
+
+FIELDS = ('id', 'username', 'email')
+CONFLICT_POLICIES = ('fail', 'skip', 'overwrite')
+# Rows per chunk handed to the WSGI server while exporting.
+EXPORT_CHUNK_ROWS = 1000
+# NDJSON lines decoded per json.loads call while importing.
+PARSE_CHUNK_LINES = 1000
+
+
+class ImportFormatError(ValueError):
+    """Raised for an import record that cannot be parsed."""
+
+    def __init__(self, line, message):
+        super().__init__(f'line {line}: {message}')
+        self.line = line
+
+
+def _chunks(users, render):
+    lines = []
+    for user in users:
+        lines.append(render(user))
+        if len(lines) == EXPORT_CHUNK_ROWS:
+            yield ''.join(lines).encode()
+            lines.clear()
+    if lines:
+        yield ''.join(lines).encode()
+
+
+def export_ndjson(users):
+    """Render users as newline-delimited JSON, a chunk of rows at a time."""
+    return _chunks(users, lambda user: json.dumps(user, separators=(',', ':')) + '\n')
+
+
+def export_csv(users):
+    """Render users as CSV with a header row, a chunk of rows at a time."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+
+    def render(user):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerow([user[field] for field in FIELDS])
+        return buffer.getvalue()
+
+    yield ','.join(FIELDS).encode() + b'\n'
+    yield from _chunks(users, render)
+
+
+def _record(line, values):
+    if not isinstance(values, dict):
+        raise ImportFormatError(line, 'expected a JSON object')
+    try:
+        user_id = values.get('id')
+        user = {
+            'id': int(user_id) if user_id not in (None, '') else None,
+            'username': values['username'],
+            'email': values['email'],
+        }
+    except KeyError as exc:
+        raise ImportFormatError(line, f'missing field {exc.args[0]!r}') from None
+    except (TypeError, ValueError):
+        raise ImportFormatError(line, f'invalid id {values.get("id")!r}') from None
+    # The same checks as POST /api/users, so nothing malformed reaches the database.
+    if not is_user(user):
+        raise ImportFormatError(line, '{} {}'.format(*first_error(USER, user)))
+    return user
+
+
+def _valid_chunk(values):
+    """Whole-chunk check that parsed objects can be imported as they are."""
+    try:
+        return (all(type(v.get('id')) in (int, type(None)) for v in values)
+                and all(is_user(v) for v in values))
+    except AttributeError:
+        return False
+
+
+def read_ndjson(stream):
+    """Parse users from a binary stream of newline-delimited JSON objects.
+
+    Yields lists of users, one per chunk of lines. Each chunk is decoded as
+    one JSON array, which is several times faster than a ``json.loads``
+    call per line; a chunk that fails to parse or validate is decoded again
+    line by line to report the offending line.
+    """
+    lines = io.TextIOWrapper(stream, encoding='utf-8')
+    first_line = 1
+    while True:
+        chunk = list(islice(lines, PARSE_CHUNK_LINES))
+        if not chunk:
+            return
+        texts = [text for text in chunk if not text.isspace()]
+        try:
+            values = json.loads('[' + ','.join(texts) + ']')
+        except ValueError:
+            values = None
+        # A line such as "1, 2" parses inside the array but not on its own.
+        if values is None or len(values) != len(texts) or not _valid_chunk(values):
+            values = [_record(line, _parse_line(line, text))
+                      for line, text in enumerate(chunk, start=first_line) if not text.isspace()]
+        first_line += len(chunk)
+        yield values
+
+
+def _parse_line(line, text):
+    try:
+        return json.loads(text)
+    except ValueError as exc:
+        raise ImportFormatError(line, str(exc)) from None
+
+
+def read_csv(stream):
+    """Parse users from a binary CSV stream with a header row.
+
+    Yields lists of users, one per chunk of rows.
+    """
+    reader = csv.DictReader(io.TextIOWrapper(stream, encoding='utf-8', newline=''))
+    while True:
+        chunk = [_record(reader.line_num, values) for values in islice(reader, PARSE_CHUNK_LINES)]
+        if not chunk:
+            return
+        yield chunk
+
+
+EXPORT_FORMATS = {
+    'ndjson': (export_ndjson, 'application/x-ndjson'),
+    'csv': (export_csv, 'text/csv'),
+}
+
+IMPORT_FORMATS = {
+    'ndjson': read_ndjson,
+    'csv': read_csv,
+}
+
+
+def import_users(repository, chunks, on_conflict='fail', batch_size=20000):
+    """Write the users parsed into ``chunks`` in batches, yielding progress.
+
+    Each batch is committed on its own, so memory stays bounded by
+    ``batch_size`` however large the input is. A progress dict is yielded
+    after every batch and a final one carries ``done``. If a batch fails
+    (a conflict under the ``fail`` policy, or a malformed record) the final
+    dict carries ``error`` instead; batches committed before it are kept.
+    """
+    progress = {'processed': 0, 'imported': 0, 'skipped': 0}
+    batch = []
+    try:
+        for chunk in chunks:
+            batch.extend(chunk)
+            while len(batch) >= batch_size:
+                _write_batch(repository, batch[:batch_size], on_conflict, progress)
+                del batch[:batch_size]
+                yield dict(progress)
+        if batch:
+            _write_batch(repository, batch, on_conflict, progress)
+    except (DuplicateUserError, ImportFormatError) as exc:
+        yield dict(progress, error=str(exc))
+        return
+    yield dict(progress, done=True)
+
+
+def _write_batch(repository, batch, on_conflict, progress):
+    written = repository.import_batch(batch, on_conflict)
+    progress['processed'] += len(batch)
+    progress['imported'] += written
+    progress['skipped'] += len(batch) - written
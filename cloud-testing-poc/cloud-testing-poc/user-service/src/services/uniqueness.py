@@ -0,0 +1,243 @@
+import atexit
+import hashlib
+import math
+import threading
+
+from flask import current_app, jsonify
+
+from src.config import debug_routes_enabled, env_bool, env_float, env_int
+from src.models.user import db
+from src.repositories.backend import get_user_repository
+from src.repositories.base import DuplicateUserError
+
+
+class BloomFilter:
+    """Bit-array set membership with no false negatives.
+
+    Sized for ``capacity`` keys at a false-positive rate of ``error_rate``;
+    the ``k`` bit positions come from one blake2b digest split into two
+    hashes (Kirsch-Mitzenmacher double hashing).
+    """
+
+    def __init__(self, capacity, error_rate=0.01):
+        capacity = max(1, capacity)
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+    def expected_error_rate(self):
+        """The false-positive rate expected at the current fill."""
+        return (1 - math.exp(-self.hashes * self.count / self.size)) ** self.hashes
+
+
+def _keys(username, email):
+    return f'u:{username}', f'e:{email}'
+
+
+class UniquenessFilter:
+    """Bloom filter over every username and email, rebuilt from the repository.
+
+    Until the first build finishes :meth:`maybe_taken` answers True, so
+    callers fall back to asking the database. Keys added while a rebuild
+    runs are replayed into the new filter before it replaces the old one.
+    """
+
+    def __init__(self, app, error_rate=0.01, min_capacity=100000):
+        self.app = app
+        self.error_rate = error_rate
+        self.min_capacity = min_capacity
+        self.prechecks = 0
+        self.skipped = 0
+        self.conflicts = 0
+        self.false_positives = 0
+        self.rebuilds = 0
+        self._filter = None
+        self._pending = None
+        self.ready = threading.Event()
+        self._lock = threading.Lock()
+        self._rebuild_lock = threading.Lock()
+
+    def maybe_taken(self, username, email):
+        bloom = self._filter
+        if bloom is None:
+            return True
+        return any(key in bloom for key in _keys(username, email))
+
+    def add(self, username, email):
+        with self._lock:
+            if self._filter is not None:
+                for key in _keys(username, email):
+                    self._filter.add(key)
+            if self._pending is not None:
+                self._pending.append((username, email))
+
+    def rebuild(self):
+        """Build a fresh filter from every user and swap it in."""
+        with self._rebuild_lock:
+            with self._lock:
+                self._pending = []
+            try:
+                with self.app.app_context():
+                    try:
+                        repository = get_user_repository()
+                        # Two keys per user, with room for the user count to double.
+                        bloom = BloomFilter(max(self.min_capacity, 4 * repository.count()), self.error_rate)
+                        for user in repository.iter_users():
+                            for key in _keys(user['username'], user['email']):
+                                bloom.add(key)
+                    finally:
+                        db.session.remove()
+                with self._lock:
+                    for username, email in self._pending:
+                        for key in _keys(username, email):
+                            bloom.add(key)
+                    self._filter = bloom
+                    self.rebuilds += 1
+                self.ready.set()
+            finally:
+                with self._lock:
+                    self._pending = None
+
+    def rebuild_in_background(self):
+        def run():
+            try:
+                self.rebuild()
+            except Exception:
+                self.app.logger.exception('Uniqueness filter rebuild failed')
+        threading.Thread(target=run, name='uniqueness-filter-rebuild', daemon=True).start()
+
+    def stats(self):
+        bloom = self._filter
+        stats = {
+            'ready': bloom is not None,
+            'prechecks': self.prechecks,
+            'skipped': self.skipped,
+            'conflicts': self.conflicts,
+            'false_positives': self.false_positives,
+            'rebuilds': self.rebuilds,
+        }
+        if bloom is not None:
+            stats.update(keys=bloom.count, capacity=bloom.capacity, bits=bloom.size, hashes=bloom.hashes,
+                         target_error_rate=bloom.error_rate,
+                         expected_error_rate=round(bloom.expected_error_rate(), 6))
+        return stats
+
+
+def precheck_unique(username, email):
+    """Raise :class:`DuplicateUserError` early for a username or email that is taken.
+
+    Only keys the filter says may be present cost a query; the rest go
+    straight to the insert, where the database constraint still decides.
+    """
+    uniqueness = current_app.extensions.get('uniqueness_filter')
+    if uniqueness is None:
+        return
+    if not uniqueness.maybe_taken(username, email):
+        uniqueness.skipped += 1
+        return
+    uniqueness.prechecks += 1
+    if get_user_repository().is_taken(username, email):
+        uniqueness.conflicts += 1
+        raise DuplicateUserError('username or email already exists')
+    uniqueness.false_positives += 1
+
+
+def note_users(users):
+    """Add the usernames and emails of written users to the filter."""
+    uniqueness = current_app.extensions.get('uniqueness_filter')
+    if uniqueness is not None:
+        for user in users:
+            uniqueness.add(user['username'], user['email'])
+
+
+class UniquenessPrecheck:
+    """Bloom-filter precheck that turns away duplicate users before the insert.
+
+    A ``POST /api/users`` whose username and email are both definitely
+    absent from the filter goes straight to the insert. Otherwise one
+    indexed lookup decides, and a duplicate gets its 409 without a failed
+    write. Users written through the API are added as they are written;
+    other writes (imports, other processes) and deletions are picked up by
+    rebuilds, which run in the background: the first at startup (an empty
+    table is built in place instead), then one every
+    ``BLOOM_REBUILD_INTERVAL`` seconds. Until the first finishes every
+    create is checked with a query. The database constraint stays
+    authoritative, so a stale filter only costs speed. ``BLOOM_ERROR_RATE``
+    (default 0.01) sets the false-positive rate the filter is sized for,
+    with room for at least twice the current user count. On unless
+    ``BLOOM_ENABLED`` is false. With ``DEBUG_ROUTES_ENABLED``, ``GET
+    /api/debug/bloom`` reports the filter and how often it saved a query
+    and ``POST /api/debug/bloom/rebuild`` starts a rebuild. Must be
+    initialised after the database tables exist.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('BLOOM_ENABLED', env_bool('BLOOM_ENABLED', True))
+        app.config.setdefault('BLOOM_ERROR_RATE', env_float('BLOOM_ERROR_RATE', 0.01))
+        app.config.setdefault('BLOOM_MIN_CAPACITY', env_int('BLOOM_MIN_CAPACITY', 100000))
+        app.config.setdefault('BLOOM_REBUILD_INTERVAL',
+                              env_float('BLOOM_REBUILD_INTERVAL', 0.0 if app.testing else 3600.0))
+
+        if not app.config['BLOOM_ENABLED']:
+            return
+
+        uniqueness = UniquenessFilter(app, app.config['BLOOM_ERROR_RATE'], app.config['BLOOM_MIN_CAPACITY'])
+        app.extensions['uniqueness_filter'] = uniqueness
+        if debug_routes_enabled(app):
+            app.add_url_rule('/api/debug/bloom', 'bloom_stats', self._stats, methods=['GET'])
+            app.add_url_rule('/api/debug/bloom/rebuild', 'bloom_rebuild', self._rebuild, methods=['POST'])
+
+        with app.app_context():
+            empty = app.extensions['user_repository'].count() == 0
+        if empty:
+            uniqueness.rebuild()
+        else:
+            uniqueness.rebuild_in_background()
+        interval = app.config['BLOOM_REBUILD_INTERVAL']
+        if interval <= 0:
+            return
+
+        stop = threading.Event()
+
+        def run():
+            while not stop.wait(interval):
+                try:
+                    uniqueness.rebuild()
+                except Exception:
+                    app.logger.exception('Uniqueness filter rebuild failed')
+
+        threading.Thread(target=run, name='uniqueness-filter', daemon=True).start()
+        atexit.register(stop.set)
+
+    @staticmethod
+    def _stats():
+        return jsonify(current_app.extensions['uniqueness_filter'].stats())
+
+    @staticmethod
+    def _rebuild():
+        current_app.extensions['uniqueness_filter'].rebuild_in_background()
+        return jsonify({'status': 'rebuilding'}), 202
+
+
+uniqueness_precheck = UniquenessPrecheck()
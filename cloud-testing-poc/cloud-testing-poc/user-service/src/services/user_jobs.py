@@ -0,0 +1,41 @@
+import os
+
+from src.repositories.backend import get_user_repository
+from src.services.transfer import IMPORT_FORMATS, import_users
+
+# Ids deleted per transaction by a background bulk delete.
+BULK_DELETE_CHUNK = 1000
+
+
+def import_job(context, path, import_format, on_conflict, batch_size):
+    """Import a spooled request body, reporting progress after every batch."""
+    try:
+        with open(path, 'rb') as stream:
+            chunks = IMPORT_FORMATS[import_format](stream)
+            for progress in import_users(get_user_repository(), chunks, on_conflict, batch_size):
+                result = {key: progress[key] for key in ('processed', 'imported', 'skipped')}
+                context.report(progress['processed'], result=result)
+                if 'error' in progress:
+                    raise ValueError(progress['error'])
+    finally:
+        os.remove(path)
+    return result
+
+
+def bulk_delete_job(context, user_ids):
+    """Delete users a chunk per transaction so progress and cancellation work."""
+    repository = get_user_repository()
+    user_ids = sorted(set(user_ids))
+    deleted = 0
+    for start in range(0, len(user_ids), BULK_DELETE_CHUNK):
+        deleted += len(repository.bulk_delete(user_ids[start:start + BULK_DELETE_CHUNK]))
+        context.report(min(start + BULK_DELETE_CHUNK, len(user_ids)), total=len(user_ids),
+                       result={'deleted': deleted})
+    return {'deleted': deleted}
+
+
+def reindex_job(context):
+    """Rebuild the user indexes, then repair the maintained user count."""
+    repository = get_user_repository()
+    repository.reindex()
+    return {'count_drift': repository.reconcile_count()}
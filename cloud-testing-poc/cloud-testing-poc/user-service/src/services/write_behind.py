@@ -0,0 +1,268 @@
+import atexit
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+
+from flask import current_app, jsonify
+
+from src.config import env_bool, env_float, env_int
+from src.models.user import db
+from src.repositories.backend import get_user_repository
+from src.repositories.base import DuplicateUserError
+from src.services.batch_writer import BatchWriter
+from src.services.uniqueness import note_users, precheck_unique
+
+
+class WriteBehindFull(Exception):
+    """Raised when the write-behind queue cannot take another user."""
+
+
+class WriteBehindWriter(BatchWriter):
+    """Queue of accepted creates, inserted in large batches by one thread.
+
+    :meth:`submit` reserves the username and email in memory, assigns the
+    id from the repository's sequence and queues the row; nothing is
+    written. The writer inserts each batch with one ``import_batch`` call,
+    so a whole batch costs one commit. Keys stay reserved until their batch
+    has been written, and synchronous writes :meth:`hold` theirs while they
+    run, so neither side can take a key the other is writing. A batch that
+    still hits a uniqueness violation (a write from another process or an
+    import) is retried skipping the conflicting rows, which are recorded in
+    :attr:`failures`. Once :meth:`close` has begun no more users are taken.
+    """
+
+    thread_name = 'write-behind'
+
+    def __init__(self, app, queue_size=100000, batch_size=5000, flush_interval=0.05):
+        self.app = app
+        self.accepted = 0
+        self.failed = 0
+        self.failures = deque(maxlen=100)
+        self._usernames = set()
+        self._emails = set()
+        # Keys of synchronous writes in flight; several may share a key.
+        self._held_usernames = Counter()
+        self._held_emails = Counter()
+        self._oldest = deque()
+        self._reserve_lock = threading.Lock()
+        self._settled = threading.Condition(self._reserve_lock)
+        super().__init__(queue_size, batch_size, flush_interval)
+
+    def submit(self, username, email, check=None):
+        """Reserve the keys, assign an id and queue the insert; return the user.
+
+        ``check`` runs under the reservation lock before anything is
+        reserved, so a database lookup there cannot race a synchronous write
+        of the same key.
+        """
+        with self._reserve_lock:
+            if self._closing.is_set():
+                raise WriteBehindFull('write-behind is shutting down')
+            if (username in self._usernames or email in self._emails
+                    or username in self._held_usernames or email in self._held_emails):
+                raise DuplicateUserError('username or email already exists')
+            # Only this lock's holders add to the queue, so a queue that is
+            # not full now still has room for the put below.
+            if self.queue.full():
+                raise WriteBehindFull('write-behind queue is full')
+            if check is not None:
+                check()
+            user_id, = self.app.extensions['user_repository'].reserve_ids(1)
+            user = {'id': user_id, 'username': username, 'email': email, 'version': 1}
+            self.queue.put_nowait(user)
+            self._usernames.add(username)
+            self._emails.add(email)
+            self._oldest.append(time.monotonic())
+            self.accepted += 1
+        return user
+
+    def hold(self, usernames, emails):
+        """Claim keys for a synchronous write; raise if a queued user has one."""
+        with self._reserve_lock:
+            if not self._usernames.isdisjoint(usernames) or not self._emails.isdisjoint(emails):
+                raise DuplicateUserError('username or email already exists')
+            self._held_usernames.update(usernames)
+            self._held_emails.update(emails)
+
+    def release(self, usernames, emails):
+        with self._reserve_lock:
+            self._held_usernames.subtract(usernames)
+            self._held_emails.subtract(emails)
+            # In-place addition drops the keys whose count fell to zero.
+            self._held_usernames += Counter()
+            self._held_emails += Counter()
+
+    def close(self, timeout=5.0):
+        # Taking the lock orders the flag after any submit in progress, so
+        # nothing is queued behind the stop marker.
+        with self._reserve_lock:
+            self._closing.set()
+        super().close(timeout)
+
+    def pending(self):
+        """Users accepted but not yet written or failed."""
+        with self._reserve_lock:
+            return len(self._oldest)
+
+    def flush(self, timeout=None):
+        """Wait until every user accepted so far is written; return whether that happened."""
+        with self._settled:
+            return self._settled.wait_for(lambda: not self._oldest, timeout)
+
+    def write_batch(self, batch):
+        """Insert ``batch`` and return how many of its users were written."""
+        with self.app.app_context():
+            try:
+                repository = self.app.extensions['user_repository']
+                try:
+                    return repository.import_batch(batch, 'fail')
+                except DuplicateUserError:
+                    repository.import_batch(batch, 'skip')
+                    # A skipped row either lost its key to another write or
+                    # its id was taken by an import with explicit ids.
+                    written = repository.get_many([user['id'] for user in batch])
+                    failed = [user for user in batch if written.get(user['id']) != user]
+                    self._fail(failed, 'username, email or id already exists')
+                    return len(batch) - len(failed)
+            finally:
+                db.session.remove()
+
+    def stats(self):
+        with self._reserve_lock:
+            oldest = self._oldest[0] if self._oldest else None
+            stats = {
+                'accepted': self.accepted,
+                'pending': len(self._oldest),
+                'oldest_pending_seconds': round(time.monotonic() - oldest, 3) if oldest is not None else None,
+                'failed': self.failed,
+                'recent_failures': list(self.failures),
+            }
+        stats.update(queued=self.queue.qsize(), written=self.written, batches=self.batches)
+        return stats
+
+    def _write(self, batch):
+        try:
+            written = self.write_batch(batch)
+        except Exception as exc:
+            self.app.logger.exception('Write-behind batch of %d users failed', len(batch))
+            self._fail(batch, str(exc))
+        else:
+            self.written += written
+            self.batches += 1
+        finally:
+            self._settle(batch)
+
+    def _fail(self, users, reason):
+        with self._reserve_lock:
+            self.failed += len(users)
+            self.failures.extend({'id': user['id'], 'username': user['username'], 'error': reason}
+                                 for user in users)
+
+    def _settle(self, batch):
+        with self._settled:
+            for user in batch:
+                self._usernames.discard(user['username'])
+                self._emails.discard(user['email'])
+                self._oldest.popleft()
+            self._settled.notify_all()
+
+
+def create_behind(username, email):
+    """Accept a user for write-behind and return it with its assigned id.
+
+    Uniqueness is checked against the users still queued or being written
+    synchronously, then as for a synchronous create (the Bloom filter
+    precheck, or one lookup without it).
+    """
+    def check():
+        if 'uniqueness_filter' in current_app.extensions:
+            precheck_unique(username, email)
+        elif get_user_repository().is_taken(username, email):
+            raise DuplicateUserError('username or email already exists')
+
+    user = current_app.extensions['write_behind'].submit(username, email, check)
+    note_users([user])
+    return user
+
+
+@contextmanager
+def held_keys(users):
+    """Keep write-behind creates off the keys of ``users`` while the block writes them.
+
+    Raises :class:`DuplicateUserError` if a queued user already has one of
+    the usernames or emails. A no-op without write-behind. The block should
+    also add the written users to the uniqueness filter, so an async
+    create arriving afterwards finds them.
+    """
+    writer = current_app.extensions.get('write_behind')
+    if writer is None:
+        yield
+        return
+    usernames = [user['username'] for user in users if 'username' in user]
+    emails = [user['email'] for user in users if 'email' in user]
+    writer.hold(usernames, emails)
+    try:
+        yield
+    finally:
+        writer.release(usernames, emails)
+
+
+class WriteBehind:
+    """Opt-in asynchronous creates for ingestion workloads.
+
+    With ``WRITE_BEHIND_ENABLED``, a ``POST /api/users`` that asks for
+    async handling (``?async=true`` or ``Prefer: respond-async``) is
+    checked, given an id and queued, and answered ``202`` before anything
+    is written. A writer thread inserts queued users in batches of up to
+    ``WRITE_BEHIND_BATCH_SIZE`` (default 5000), lingering
+    ``WRITE_BEHIND_FLUSH_INTERVAL`` seconds (default 0.05) for a batch to
+    fill, so ingest costs one commit per batch instead of one per user.
+    At most ``WRITE_BEHIND_QUEUE_SIZE`` users (default 100000) wait; past
+    that requests get ``503``, as do creates arriving once shutdown has
+    begun. Synchronous creates, upserts, bulk creates and updates that use
+    a queued username or email get ``409``; imports are not checked, so an
+    import taking a queued key makes that user fail. The queue is drained
+    at interpreter exit, waiting up to ``WRITE_BEHIND_SHUTDOWN_TIMEOUT``
+    seconds (default 30); users still queued when the process is killed
+    are lost. ``GET
+    /api/debug/write-behind`` reports pending writes and failures. The
+    repository assigns ids in process from then on, so like the sharded
+    backend this needs a single writer process. Only the SQLAlchemy backend
+    is supported. Must be initialised after the database tables exist.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('WRITE_BEHIND_ENABLED', env_bool('WRITE_BEHIND_ENABLED'))
+        app.config.setdefault('WRITE_BEHIND_QUEUE_SIZE', env_int('WRITE_BEHIND_QUEUE_SIZE', 100000))
+        app.config.setdefault('WRITE_BEHIND_BATCH_SIZE', env_int('WRITE_BEHIND_BATCH_SIZE', 5000))
+        app.config.setdefault('WRITE_BEHIND_FLUSH_INTERVAL', env_float('WRITE_BEHIND_FLUSH_INTERVAL', 0.05))
+        app.config.setdefault('WRITE_BEHIND_SHUTDOWN_TIMEOUT', env_float('WRITE_BEHIND_SHUTDOWN_TIMEOUT', 30.0))
+
+        if not app.config['WRITE_BEHIND_ENABLED'] or app.config.get('USER_STORAGE_BACKEND') != 'sqlalchemy':
+            return
+
+        with app.app_context():
+            app.extensions['user_repository'].assign_ids()
+        writer = WriteBehindWriter(app,
+                                   queue_size=app.config['WRITE_BEHIND_QUEUE_SIZE'],
+                                   batch_size=app.config['WRITE_BEHIND_BATCH_SIZE'],
+                                   flush_interval=app.config['WRITE_BEHIND_FLUSH_INTERVAL'])
+        atexit.register(writer.close, app.config['WRITE_BEHIND_SHUTDOWN_TIMEOUT'])
+        app.extensions['write_behind'] = writer
+        app.add_url_rule('/api/debug/write-behind', 'write_behind_stats', self._stats, methods=['GET'])
+
+        admission_state = app.extensions.get('admission')
+        if admission_state is not None:
+            admission_state.add_queue(writer.queue.qsize, app.config['WRITE_BEHIND_QUEUE_SIZE'])
+
+    @staticmethod
+    def _stats():
+        return jsonify(current_app.extensions['write_behind'].stats())
+
+
+write_behind = WriteBehind()
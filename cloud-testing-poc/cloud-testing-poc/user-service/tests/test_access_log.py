@@ -0,0 +1,148 @@
+"""
+Access Log Tests for User API
+Demonstrates non-blocking structured logging in cloud applications
+"""
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+import unittest
+
+# Add the src directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from src.main import create_app
+from src.middleware.access_log import AccessLogWriter, parse_sample_rates
+
+
+class BlockingStream(io.StringIO):
+    """Stream whose first write blocks until released"""
+
+    def __init__(self):
+        super().__init__()
+        self.entered = threading.Event()
+        self.release = threading.Event()
+
+    def write(self, text):
+        self.entered.set()
+        self.release.wait(5)
+        return super().write(text)
+
+
+class TestAccessLog(unittest.TestCase):
+    """Integration tests for the queued JSON access log"""
+
+    def setUp(self):
+        """Set up a test application logging to a temporary file"""
+        fd, self.path = tempfile.mkstemp(suffix='.log')
+        os.close(fd)
+        self.app = self._app()
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        """Stop the writer and remove the log file"""
+        self.app.extensions['access_log'].writer.close()
+        os.unlink(self.path)
+
+    def _app(self, **config):
+        return create_app(dict({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+                                'ACCESS_LOG_ENABLED': True, 'ACCESS_LOG_PATH': self.path,
+                                'ACCESS_LOG_FLUSH_INTERVAL': 0.01}, **config))
+
+    def _request(self, method, path, **kwargs):
+        # Records are completed when the server closes the response
+        response = self.client.open(path, method=method, **kwargs)
+        response.close()
+        return response
+
+    def _create_user(self):
+        self._request('POST', '/api/users', data=json.dumps({'username': 'a', 'email': 'a@example.com'}),
+                      content_type='application/json')
+
+    def _records(self):
+        self.app.extensions['access_log'].writer.close()
+        with open(self.path, encoding='utf-8') as log:
+            return [json.loads(line) for line in log]
+
+    def test_records_request_fields(self):
+        """Test that a record carries method, route, status, timings, bytes and request id"""
+        self._create_user()
+        response = self._request('GET', '/api/users/1')
+
+        record = self._records()[-1]
+        self.assertEqual(record['method'], 'GET')
+        self.assertEqual(record['route'], '/api/users/<int:user_id>')
+        self.assertEqual(record['path'], '/api/users/1')
+        self.assertEqual(record['status'], 200)
+        self.assertEqual(record['bytes'], len(response.data))
+        self.assertEqual(record['request_id'], response.headers['X-Request-ID'])
+        self.assertGreaterEqual(record['db_statements'], 1)
+        self.assertGreaterEqual(record['db_ms'], 0)
+        self.assertGreaterEqual(record['latency_ms'], record['db_ms'])
+
+    def test_client_request_id_is_kept(self):
+        """Test that a well-formed X-Request-ID is propagated and a bad one replaced"""
+        kept = self._request('GET', '/api/users', headers={'X-Request-ID': 'abc-123'})
+        replaced = self._request('GET', '/api/users', headers={'X-Request-ID': 'bad id "forged"'})
+
+        self.assertEqual(kept.headers['X-Request-ID'], 'abc-123')
+        self.assertRegex(replaced.headers['X-Request-ID'], r'^[0-9a-f]{32}$')
+        self.assertEqual([r['request_id'] for r in self._records()],
+                         ['abc-123', replaced.headers['X-Request-ID']])
+
+    def test_sampling_keeps_errors(self):
+        """Test that a sampled-out route still logs its error responses"""
+        self.app.extensions['access_log'].writer.close()
+        self.app = self._app(ACCESS_LOG_SAMPLE_RATES='GET /api/users/<int:user_id>=0')
+        self.client = self.app.test_client()
+        self._create_user()
+
+        self._request('GET', '/api/users/1')
+        self._request('GET', '/api/users/999')
+
+        stats = self.client.get('/api/debug/access-log').get_json()
+        self.assertEqual(stats['sampled_out'], 1)
+        gets = [r for r in self._records() if r['route'] == '/api/users/<int:user_id>']
+        self.assertEqual([r['status'] for r in gets], [404])
+        self.assertEqual(gets[0]['sample_rate'], 0)
+
+    def test_disabled_by_default(self):
+        """Test that applications do not start a writer unless asked"""
+        app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:'})
+        self.assertNotIn('access_log', app.extensions)
+        self.assertNotIn('X-Request-ID', app.test_client().get('/api/users').headers)
+
+
+class TestAccessLogWriter(unittest.TestCase):
+    """Unit tests for the batching writer"""
+
+    def test_batches_and_drops_on_overflow(self):
+        """Test that a full queue drops records instead of blocking the caller"""
+        stream = BlockingStream()
+        writer = AccessLogWriter(stream, queue_size=2, batch_size=10, flush_interval=0)
+
+        writer.submit({'n': 0})
+        self.assertTrue(stream.entered.wait(5))
+        for n in range(1, 6):
+            writer.submit({'n': n})
+        stream.release.set()
+        writer.close()
+
+        self.assertEqual(writer.dropped, 3)
+        self.assertEqual(writer.written, 3)
+        self.assertEqual([json.loads(line)['n'] for line in stream.getvalue().splitlines()], [0, 1, 2])
+        self.assertEqual(writer.batches, 2)
+
+    def test_parse_sample_rates(self):
+        """Test parsing of per-route sample rates"""
+        self.assertEqual(parse_sample_rates('GET /api/users=0.1, GET /api/users/search=2'),
+                         {'GET /api/users': 0.1, 'GET /api/users/search': 1.0})
+        self.assertEqual(parse_sample_rates(''), {})
+        with self.assertRaises(ValueError):
+            parse_sample_rates('GET /api/users')
+
+
+if __name__ == '__main__':
+    unittest.main()
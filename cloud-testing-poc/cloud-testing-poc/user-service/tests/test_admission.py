@@ -0,0 +1,129 @@
+"""
+Admission Control Tests for User API
+Demonstrates rate limiting and load shedding in cloud applications
+"""
+import unittest
+import json
+import sys
+import os
+
+# Add the src directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from src.main import create_app
+from src.middleware.admission import ClientBuckets, TokenBucket
+
+
+class TestTokenBucket(unittest.TestCase):
+    """Unit tests for the token bucket and per-client bucket table"""
+
+    def test_burst_then_refill(self):
+        """Test that a bucket allows its burst and then refills over time"""
+        bucket = TokenBucket(rate=2.0, capacity=3.0, now=0.0)
+        for _ in range(3):
+            self.assertEqual(bucket.take(0.0), 0.0)
+
+        # Empty bucket reports how long until the next token
+        self.assertAlmostEqual(bucket.take(0.0), 0.5)
+
+        # Half a second later one token is available again
+        self.assertEqual(bucket.take(0.5), 0.0)
+
+    def test_refill_is_capped_at_capacity(self):
+        """Test that an idle bucket never holds more than its capacity"""
+        bucket = TokenBucket(rate=10.0, capacity=2.0, now=0.0)
+        bucket.take(1000.0)
+        self.assertLessEqual(bucket.tokens, 2.0)
+
+    def test_client_table_is_bounded(self):
+        """Test that the least recently seen client is evicted first"""
+        buckets = ClientBuckets(rate=1.0, capacity=1.0, max_clients=2)
+        buckets.get('a', 0.0)
+        buckets.get('b', 0.0)
+        buckets.get('a', 0.0)
+        buckets.get('c', 0.0)
+
+        self.assertEqual(len(buckets), 2)
+        self.assertIn('a', buckets._buckets)
+        self.assertNotIn('b', buckets._buckets)
+
+
+class TestAdmissionMiddleware(unittest.TestCase):
+    """Integration tests for rate limiting and load shedding"""
+
+    def setUp(self):
+        """Set up an application with tight admission budgets"""
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+            'ADMISSION_CONTROL_ENABLED': True,
+            'ADMISSION_CLIENT_WRITE_RATE': 0.001,
+            'ADMISSION_CLIENT_WRITE_BURST': 2,
+            'ADMISSION_CLIENT_READ_RATE': 0.001,
+            'ADMISSION_CLIENT_READ_BURST': 5,
+        })
+        self.client = self.app.test_client()
+        self.state = self.app.extensions['admission']
+
+    def create_user(self, i):
+        return self.client.post('/api/users',
+                                data=json.dumps({'username': f'user{i}', 'email': f'user{i}@example.com'}),
+                                content_type='application/json')
+
+    def test_write_budget_exhaustion_returns_429(self):
+        """Test that writes over budget are rejected with Retry-After"""
+        self.assertEqual(self.create_user(1).status_code, 201)
+        self.assertEqual(self.create_user(2).status_code, 201)
+
+        response = self.create_user(3)
+        self.assertEqual(response.status_code, 429)
+        self.assertGreaterEqual(int(response.headers['Retry-After']), 1)
+        self.assertEqual(json.loads(response.data)['error'], 'rate limited')
+
+    def test_reads_have_separate_budget(self):
+        """Test that exhausting the write budget does not block reads"""
+        self.create_user(1)
+        self.create_user(2)
+        self.assertEqual(self.create_user(3).status_code, 429)
+
+        response = self.client.get('/api/users')
+        self.assertEqual(response.status_code, 200)
+
+    def test_clients_are_limited_independently(self):
+        """Test that one noisy client does not consume another's budget"""
+        self.app.config['ADMISSION_CLIENT_HEADER'] = 'X-Client-Id'
+        for _ in range(5):
+            self.client.get('/api/users', headers={'X-Client-Id': 'noisy'})
+
+        self.assertEqual(self.client.get('/api/users', headers={'X-Client-Id': 'noisy'}).status_code, 429)
+        self.assertEqual(self.client.get('/api/users', headers={'X-Client-Id': 'quiet'}).status_code, 200)
+
+    def test_sheds_load_when_too_much_work_in_flight(self):
+        """Test that requests get a fast 503 once the in-flight limit is reached"""
+        self.state.in_flight = self.state.max_in_flight
+
+        response = self.client.get('/api/users')
+        self.assertEqual(response.status_code, 503)
+        self.assertIn('Retry-After', response.headers)
+
+    def test_sheds_load_when_queue_is_full(self):
+        """Test that registered queue depths take part in load shedding"""
+        self.state.add_queue(lambda: 10, 10)
+
+        response = self.client.get('/api/users')
+        self.assertEqual(response.status_code, 503)
+
+    def test_in_flight_is_released_after_request(self):
+        """Test that admitted requests release their in-flight slot"""
+        self.client.get('/api/users')
+        self.assertEqual(self.state.in_flight, 0)
+
+    def test_non_api_paths_are_not_limited(self):
+        """Test that static content bypasses admission control"""
+        self.state.in_flight = self.state.max_in_flight
+        response = self.client.get('/')
+        self.assertNotEqual(response.status_code, 503)
+
+
+if __name__ == '__main__':
+    unittest.main()
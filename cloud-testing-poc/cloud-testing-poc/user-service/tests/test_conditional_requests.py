@@ -0,0 +1,56 @@
+"""
+Conditional Request Tests for User API
+Demonstrates ETag revalidation of user reads
+"""
+import json
+import os
+import sys
+import unittest
+
+# Add the src directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from src.main import create_app
+
+
+class TestConditionalRequests(unittest.TestCase):
+    """Integration tests for ETag / If-None-Match on user reads"""
+
+    def setUp(self):
+        """Set up a test application with two users"""
+        self.app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:'})
+        self.client = self.app.test_client()
+        self.client.post('/api/users/bulk', data=json.dumps(
+            [{'username': f'u{i}', 'email': f'u{i}@example.com'} for i in range(2)]
+        ), content_type='application/json')
+
+    def test_unchanged_page_is_not_modified(self):
+        """Test that revalidating an unchanged page returns 304 without a body"""
+        first = self.client.get('/api/users?limit=10')
+        etag = first.headers['ETag']
+
+        response = self.client.get('/api/users?limit=10', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.data, b'')
+        self.assertEqual(response.headers['X-Total-Count'], '2')
+
+    def test_changed_page_is_sent_again(self):
+        """Test that a write invalidates the page's ETag"""
+        etag = self.client.get('/api/users?limit=10').headers['ETag']
+        self.client.put('/api/users/1', data=json.dumps({'email': 'changed@example.com'}),
+                        content_type='application/json')
+
+        response = self.client.get('/api/users?limit=10', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['ETag'], etag)
+        self.assertEqual(response.get_json()[0]['email'], 'changed@example.com')
+
+    def test_single_user_revalidation(self):
+        """Test that GET /api/users/<id> honours If-None-Match"""
+        etag = self.client.get('/api/users/1').headers['ETag']
+        response = self.client.get('/api/users/1', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+
+
+if __name__ == '__main__':
+    unittest.main()
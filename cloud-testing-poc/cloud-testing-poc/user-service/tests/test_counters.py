@@ -0,0 +1,100 @@
+"""
+Counter Tests for User API
+Demonstrates answering collection counts from a maintained counter
+"""
+import unittest
+import json
+import sys
+import os
+import shutil
+import sqlite3
+import tempfile
+
+from sqlalchemy import text
+
+# Add the src directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from src.main import create_app
+from src.models.user import db
+from src.services.reconcile import reconcile_user_count
+
+
+class TestUserCount(unittest.TestCase):
+    """Integration tests for HEAD /api/users, X-Total-Count and reconciliation"""
+
+    def setUp(self):
+        """Set up a test application with an in-memory database"""
+        self.app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:'})
+        self.client = self.app.test_client()
+        self.client.post('/api/users/bulk', data=json.dumps(
+            [{'username': f'u{i}', 'email': f'u{i}@example.com'} for i in range(3)]
+        ), content_type='application/json')
+
+    def test_head_returns_total_count(self):
+        """Test that HEAD answers the count without a body"""
+        response = self.client.head('/api/users')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['X-Total-Count'], '3')
+        self.assertEqual(response.data, b'')
+
+    def test_paginated_list_carries_total_count(self):
+        """Test that paginated responses include X-Total-Count"""
+        response = self.client.get('/api/users?limit=2')
+        self.assertEqual(response.headers['X-Total-Count'], '3')
+        self.assertNotIn('X-Total-Count', self.client.get('/api/users').headers)
+
+        self.client.delete(f"/api/users/{json.loads(response.data)[0]['id']}")
+        self.assertEqual(self.client.head('/api/users').headers['X-Total-Count'], '2')
+
+    def test_reconciliation_repairs_drift(self):
+        """Test that a drifted counter is detected and rewritten"""
+        with self.app.app_context():
+            db.session.execute(text("UPDATE user_counter SET value = 10 WHERE name = 'users'"))
+            db.session.commit()
+        self.assertEqual(self.client.head('/api/users').headers['X-Total-Count'], '10')
+
+        self.assertEqual(reconcile_user_count(self.app), -7)
+        self.assertEqual(self.client.head('/api/users').headers['X-Total-Count'], '3')
+        self.assertEqual(reconcile_user_count(self.app), 0)
+
+    def test_reconcile_cli_command(self):
+        """Test the reconcile-user-count CLI command"""
+        result = self.app.test_cli_runner().invoke(args=['reconcile-user-count'])
+        self.assertIn('Repaired drift: +0', result.output)
+
+    def test_batch_import_keeps_schema(self):
+        """Test that a batch import is counted once without altering the schema"""
+        with self.app.app_context():
+            schema_version = db.session.execute(text('PRAGMA schema_version')).scalar()
+        body = ''.join(json.dumps({'username': f'v{i}', 'email': f'v{i}@example.com'}) + '\n' for i in range(5))
+        self.client.post('/api/users/import?on_conflict=skip', data=body, content_type='application/x-ndjson')
+        self.client.post('/api/users/import', data=body.replace('"v', '"w'), content_type='application/x-ndjson')
+
+        self.assertEqual(self.client.head('/api/users').headers['X-Total-Count'], '13')
+        with self.app.app_context():
+            self.assertEqual(db.session.execute(text('PRAGMA schema_version')).scalar(), schema_version)
+            self.assertEqual(db.session.execute(text('SELECT COUNT(*) FROM deferred_trigger')).scalar(), 0)
+        self.assertEqual(reconcile_user_count(self.app), 0)
+
+    def test_unguarded_trigger_is_replaced(self):
+        """Test that a counter trigger from before batch deferral is upgraded at startup"""
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        path = os.path.join(tmpdir, 'users.db')
+        with sqlite3.connect(path) as conn:
+            conn.execute('CREATE TABLE user (id INTEGER PRIMARY KEY, username VARCHAR(80) NOT NULL UNIQUE, '
+                         'email VARCHAR(120) NOT NULL UNIQUE)')
+            conn.execute('CREATE TABLE user_counter (name VARCHAR(40) PRIMARY KEY, value INTEGER NOT NULL)')
+            conn.execute("CREATE TRIGGER user_count_insert AFTER INSERT ON user BEGIN "
+                         "UPDATE user_counter SET value = value + 1 WHERE name = 'users'; END")
+        conn.close()
+
+        client = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}'}).test_client()
+        client.post('/api/users/import', data='{"username": "a", "email": "a@example.com"}\n',
+                    content_type='application/x-ndjson')
+        self.assertEqual(client.head('/api/users').headers['X-Total-Count'], '1')
+
+
+if __name__ == '__main__':
+    unittest.main()
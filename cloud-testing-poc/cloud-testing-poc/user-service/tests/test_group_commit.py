@@ -0,0 +1,117 @@
+"""
+Group Commit Tests for User API
+Demonstrates write coalescing in cloud applications
+"""
+import unittest
+import json
+import sys
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from sqlalchemy.exc import IntegrityError
+
+# Add the src directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from src.main import create_app
+from src.models.user import User, db
+from src.services.group_commit import GroupCommitUnavailable
+
+
+class TestGroupCommit(unittest.TestCase):
+    """Integration tests for the group-commit writer"""
+
+    def setUp(self):
+        """Set up an application backed by a temporary database file"""
+        self.tmpdir = tempfile.mkdtemp()
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(self.tmpdir, 'test.db')}",
+            'GROUP_COMMIT_ENABLED': True,
+            'GROUP_COMMIT_WINDOW_US': 50000,
+        })
+        self.client = self.app.test_client()
+        self.writer = self.app.extensions['group_commit']
+
+    def tearDown(self):
+        """Stop the writer and remove the database file"""
+        self.writer.stop()
+        shutil.rmtree(self.tmpdir)
+
+    def create_user(self, i):
+        return self.app.test_client().post('/api/users',
+                                           data=json.dumps({'username': f'user{i}', 'email': f'user{i}@example.com'}),
+                                           content_type='application/json')
+
+    def test_concurrent_creates_share_transactions(self):
+        """Test that concurrent creates succeed with fewer commits than writes"""
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            responses = list(executor.map(self.create_user, range(32)))
+
+        self.assertTrue(all(r.status_code == 201 for r in responses))
+        ids = {json.loads(r.data)['id'] for r in responses}
+        self.assertEqual(len(ids), 32)
+        self.assertEqual(self.writer.committed, 32)
+        self.assertLess(self.writer.batches, 32)
+
+    def test_unique_violation_fails_only_its_own_write(self):
+        """Test that a duplicate in a batch does not roll back its neighbours"""
+        def insert(username, email):
+            def operation(session):
+                user = User(username=username, email=email)
+                session.add(user)
+                session.flush()
+                return user.to_dict()
+            return operation
+
+        futures = [
+            self.writer.submit(insert('alice', 'alice@example.com')),
+            self.writer.submit(insert('alice', 'other@example.com')),
+            self.writer.submit(insert('bob', 'bob@example.com')),
+        ]
+
+        self.assertEqual(futures[0].result()['username'], 'alice')
+        self.assertIsInstance(futures[1].exception(), IntegrityError)
+        self.assertEqual(futures[2].result()['username'], 'bob')
+
+        usernames = sorted(u['username'] for u in json.loads(self.client.get('/api/users').data))
+        self.assertEqual(usernames, ['alice', 'bob'])
+
+    def test_update_and_delete_through_writer(self):
+        """Test that updates and deletes keep their 200/204/404 behaviour"""
+        user_id = json.loads(self.create_user(1).data)['id']
+
+        response = self.client.put(f'/api/users/{user_id}',
+                                   data=json.dumps({'username': 'renamed'}),
+                                   content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data)['username'], 'renamed')
+
+        self.assertEqual(self.client.delete(f'/api/users/{user_id}').status_code, 204)
+        self.assertEqual(self.client.delete(f'/api/users/{user_id}').status_code, 404)
+        response = self.client.put(f'/api/users/{user_id}',
+                                   data=json.dumps({'username': 'ghost'}),
+                                   content_type='application/json')
+        self.assertEqual(response.status_code, 404)
+
+    def test_failed_batch_resolves_every_future(self):
+        """Test that a batch failing outside any one write fails every write in it"""
+        with mock.patch.object(type(db.session), 'begin_nested', side_effect=RuntimeError('disk I/O error')):
+            futures = [self.writer.submit(lambda session: None) for _ in range(3)]
+            for future in futures:
+                self.assertIsInstance(future.exception(timeout=5), RuntimeError)
+
+    def test_writes_after_stop_are_refused(self):
+        """Test that a stopped writer answers 503 instead of leaving requests waiting"""
+        self.writer.stop()
+
+        with self.assertRaises(GroupCommitUnavailable):
+            self.writer.submit(lambda session: None)
+        self.assertEqual(self.create_user(1).status_code, 503)
+
+
+if __name__ == '__main__':
+    unittest.main()
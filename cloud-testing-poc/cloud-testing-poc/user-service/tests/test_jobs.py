@@ -0,0 +1,143 @@
+"""
+Background Job Tests for User API
+Demonstrates running long bulk operations as pollable jobs
+"""
+import unittest
+import json
+import sys
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+# Add the src directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from src.main import create_app
+from src.models.job import Job
+from src.models.user import db
+from src.services.jobs import JobQueueFull
+
+
+class TestBackgroundJobs(unittest.TestCase):
+    """Integration tests for the job runner and /api/jobs"""
+
+    def setUp(self):
+        """Set up an application on a temporary database file"""
+        self.tmpdir = tempfile.mkdtemp()
+        self.uri = f"sqlite:///{os.path.join(self.tmpdir, 'test.db')}"
+        self.app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': self.uri,
+                               'USER_IMPORT_BATCH_SIZE': 2, 'JOBS_MAX_WORKERS': 1, 'JOBS_MAX_QUEUED': 1})
+        self.client = self.app.test_client()
+        self.runner = self.app.extensions['jobs']
+        self.release = threading.Event()
+
+    def tearDown(self):
+        """Let blocked jobs finish and remove the database"""
+        self.release.set()
+        self.runner.executor.shutdown(wait=True)
+        with self.app.app_context():
+            db.engine.dispose()
+        shutil.rmtree(self.tmpdir)
+
+    def wait_for(self, job_id, timeout=10):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            job = json.loads(self.client.get(f'/api/jobs/{job_id}').data)
+            if job['status'] not in ('queued', 'running'):
+                return job
+            time.sleep(0.01)
+        self.fail(f'job {job_id} did not finish')
+
+    def submit_blocking(self, started=None):
+        """Submit a job that runs until the test releases it"""
+        def blocking(context):
+            if started is not None:
+                started.set()
+            while not self.release.wait(0.01):
+                context.report(0)
+            return {'released': True}
+
+        with self.app.test_request_context():
+            return self.runner.submit('test', blocking)['id']
+
+    def test_async_import_returns_job(self):
+        """Test that an async import answers 202 and reports its progress"""
+        body = ''.join(json.dumps({'username': f'u{i}', 'email': f'u{i}@example.com'}) + '\n' for i in range(5))
+        response = self.client.post('/api/users/import?async=true', data=body)
+        self.assertEqual(response.status_code, 202)
+        job_id = json.loads(response.data)['id']
+        self.assertTrue(response.headers['Location'].endswith(f'/api/jobs/{job_id}'))
+
+        job = self.wait_for(job_id)
+        self.assertEqual(job['status'], 'succeeded')
+        self.assertEqual(job['processed'], 5)
+        self.assertEqual(job['result'], {'processed': 5, 'imported': 5, 'skipped': 0})
+        self.assertIsNotNone(job['throughput'])
+        self.assertEqual(self.client.head('/api/users').headers['X-Total-Count'], '5')
+
+    def test_failed_job_reports_error(self):
+        """Test that a job stopped by bad input is marked failed with the error"""
+        response = self.client.post('/api/users/import?async=1', data='{"username": "x"}\n')
+        job = self.wait_for(json.loads(response.data)['id'])
+        self.assertEqual(job['status'], 'failed')
+        self.assertIn("missing field 'email'", job['error'])
+
+    def test_async_bulk_delete_and_reindex(self):
+        """Test background bulk deletes and reindexing"""
+        created = json.loads(self.client.post('/api/users/bulk', data=json.dumps(
+            [{'username': f'u{i}', 'email': f'u{i}@example.com'} for i in range(3)]
+        ), content_type='application/json').data)
+
+        response = self.client.post('/api/users/bulk-delete', data=json.dumps({'ids': [u['id'] for u in created]}),
+                                    content_type='application/json', headers={'Prefer': 'respond-async'})
+        self.assertEqual(response.status_code, 202)
+        job = self.wait_for(json.loads(response.data)['id'])
+        self.assertEqual((job['status'], job['total'], job['result']), ('succeeded', 3, {'deleted': 3}))
+
+        job = self.wait_for(json.loads(self.client.post('/api/users/reindex').data)['id'])
+        self.assertEqual(job['result'], {'count_drift': 0})
+
+    def test_cancel_queued_and_running_jobs(self):
+        """Test that queued jobs cancel at once and running jobs at their next report"""
+        started = threading.Event()
+        running = self.submit_blocking(started)
+        queued = self.submit_blocking()
+        self.assertTrue(started.wait(5))
+
+        response = self.client.post(f'/api/jobs/{queued}/cancel')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(json.loads(response.data)['status'], 'cancelled')
+
+        self.client.post(f'/api/jobs/{running}/cancel')
+        self.assertEqual(self.wait_for(running)['status'], 'cancelled')
+        self.assertEqual(self.client.post(f'/api/jobs/{running}/cancel').status_code, 409)
+        self.assertEqual(self.client.post('/api/jobs/999/cancel').status_code, 404)
+
+    def test_concurrency_is_bounded(self):
+        """Test that submissions beyond the worker and queue limits are refused"""
+        started = threading.Event()
+        self.submit_blocking(started)
+        self.submit_blocking()
+        self.assertTrue(started.wait(5))
+
+        with self.assertRaises(JobQueueFull):
+            self.submit_blocking()
+        response = self.client.post('/api/users/reindex')
+        self.assertEqual(response.status_code, 503)
+        self.assertIn('Retry-After', response.headers)
+
+    def test_restart_fails_interrupted_jobs(self):
+        """Test that jobs left active by a previous process are marked failed"""
+        with self.app.app_context():
+            db.session.add(Job(kind='import', status='running'))
+            db.session.commit()
+
+        restarted = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': self.uri})
+        jobs = json.loads(restarted.test_client().get('/api/jobs').data)
+        self.assertEqual([(j['status'], j['error']) for j in jobs], [('failed', 'interrupted by a restart')])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+"""
+Memory Profiling Tests for User API
+Demonstrates allocation tracking and leak detection in cloud applications
+"""
+import unittest
+import json
+import sys
+import os
+import tracemalloc
+
+# Add the src directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from src.main import create_app
+from src.services.soak import Sample, SoakRunner, find_monotonic_growth
+
+
+class Leaked:
+    """Stand-in for an object a buggy request handler keeps alive"""
+
+
+class TestMemoryProfiler(unittest.TestCase):
+    """Integration tests for per-endpoint allocation tracking"""
+
+    def setUp(self):
+        """Set up a profiled application"""
+        self.app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+                               'MEMORY_PROFILING_ENABLED': True})
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        """Stop tracing so later tests run at full speed"""
+        tracemalloc.stop()
+
+    def test_reports_allocation_per_endpoint(self):
+        """Test that each endpoint gets net and peak allocation statistics"""
+        for i in range(3):
+            self.client.post('/api/users', data=json.dumps({'username': f'u{i}', 'email': f'u{i}@example.com'}),
+                             content_type='application/json')
+        self.client.get('/api/users')
+
+        report = json.loads(self.client.get('/api/debug/memory?limit=5').data)
+        self.assertEqual(report['endpoints']['POST /api/users']['requests'], 3)
+        self.assertEqual(report['endpoints']['GET /api/users']['requests'], 1)
+        self.assertGreater(report['endpoints']['GET /api/users']['peak_max'], 0)
+        self.assertNotIn('GET /api/debug/memory', report['endpoints'])
+        self.assertEqual(len(report['top_allocations']), 5)
+        self.assertEqual(set(report['top_allocations'][0]), {'file', 'line', 'size', 'count'})
+
+    def test_baseline_reports_growth(self):
+        """Test that allocation sites retained since the baseline are listed"""
+        self.assertEqual(self.client.post('/api/debug/memory/baseline').status_code, 204)
+        retained = [bytearray(4096) for _ in range(64)]
+
+        report = json.loads(self.client.get('/api/debug/memory').data)
+        self.assertIn(__file__, [site['file'] for site in report['growth_since_baseline']])
+        del retained
+
+    def test_disabled_by_default(self):
+        """Test that the debug endpoint only exists when profiling is enabled"""
+        app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:'})
+        self.assertNotIn('memory_profile', app.extensions)
+        self.assertEqual(app.test_client().post('/api/debug/memory/baseline').status_code, 405)
+
+
+class TestSoak(unittest.TestCase):
+    """Tests for the soak runner and the growth detector"""
+
+    def samples(self, *counts):
+        return [Sample(i, 0.0, None, {'Leaky': count, 'Stable': 10}) for i, count in enumerate(counts)]
+
+    def test_monotonic_growth_is_flagged(self):
+        """Test that only types that never shrink and grow enough are flagged"""
+        self.assertEqual(find_monotonic_growth(self.samples(0, 100, 200, 200, 300), min_growth=100),
+                         {'Leaky': [100, 200, 200, 300]})
+        self.assertEqual(find_monotonic_growth(self.samples(0, 100, 300, 250, 400), min_growth=100), {})
+        self.assertEqual(find_monotonic_growth(self.samples(0, 100, 120, 150), min_growth=100), {})
+
+    def test_soak_finds_injected_leak(self):
+        """Test that a short soak flags objects a handler leaks"""
+        app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+                          'USER_STORAGE_BACKEND': 'memory'})
+        leaks = []
+        app.after_request(lambda response: leaks.append(Leaked()) or response)
+
+        samples = SoakRunner(app, max_users=20).run(600, 100, trace=False)
+        self.assertEqual([s.operations for s in samples], [0, 100, 200, 300, 400, 500, 600])
+        self.assertIn('Leaked', find_monotonic_growth(samples, min_growth=100))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+"""
+Multi-Get Tests for User API
+Demonstrates batching many lookups into one round trip in cloud applications
+"""
+import json
+import os
+import sys
+import unittest
+
+# Add the src directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from src.main import create_app
+
+
+class TestMultiGet(unittest.TestCase):
+    """Integration tests for fetching many users by id"""
+
+    def setUp(self):
+        """Set up a test application with five users"""
+        self.app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+                               'MULTI_GET_MAX_IDS': 600})
+        self.client = self.app.test_client()
+        self.client.post('/api/users/bulk', data=json.dumps([{'username': f'u{i}', 'email': f'u{i}@example.com'}
+                                                            for i in range(5)]),
+                         content_type='application/json')
+
+    def test_query_string_keeps_order_and_reports_missing(self):
+        """Test that users come back in request order with missing ids listed"""
+        response = self.client.get('/api/users?ids=4,99,1,4')
+
+        data = response.get_json()
+        self.assertEqual([user['id'] for user in data['users']], [4, 1])
+        self.assertEqual(data['missing'], [99])
+        self.assertIn('ETag', response.headers)
+
+    def test_post_variant_uses_one_query_per_chunk(self):
+        """Test that a large id set costs one IN query per chunk, not one per id"""
+        ids = list(range(1, 601))
+        response = self.client.post('/api/users/lookup', data=json.dumps({'ids': ids}),
+                                    content_type='application/json')
+
+        data = response.get_json()
+        self.assertEqual([user['id'] for user in data['users']], [1, 2, 3, 4, 5])
+        self.assertEqual(data['missing'], ids[5:])
+        self.assertIn('desc="2 statements"', response.headers['Server-Timing'])
+
+    def test_known_missing_ids_are_not_queried(self):
+        """Test that ids in the negative cache skip the query"""
+        self.client.get('/api/users/99')
+        response = self.client.get('/api/users?ids=99')
+
+        self.assertEqual(response.get_json(), {'users': [], 'missing': [99]})
+        self.assertIn('desc="0 statements"', response.headers['Server-Timing'])
+
+    def test_invalid_ids(self):
+        """Test that malformed or oversized id lists are rejected"""
+        for path in ('/api/users?ids=', '/api/users?ids=1,x'):
+            self.assertEqual(self.client.get(path).status_code, 400)
+        for body in ({'ids': []}, {'ids': [True]}, {'ids': [1.5]}, [1], {'ids': list(range(601))}):
+            response = self.client.post('/api/users/lookup', data=json.dumps(body), content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+
+    def test_ids_outside_sqlite_range(self):
+        """Test that ids too large or too negative for SQLite get a JSON 400 instead of a server error"""
+        for ids in ([1, 10 ** 20], [-2 ** 63 - 1], [2 ** 63]):
+            response = self.client.get('/api/users?ids=' + ','.join(map(str, ids)))
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('error', response.get_json())
+            response = self.client.post('/api/users/lookup', data=json.dumps({'ids': ids}),
+                                        content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('error', response.get_json())
+
+        response = self.client.get(f'/api/users?ids=-1,{-2 ** 63},{2 ** 63 - 1},1')
+        self.assertEqual([user['id'] for user in response.get_json()['users']], [1])
+        self.assertEqual(response.get_json()['missing'], [-1, -2 ** 63, 2 ** 63 - 1])
+
+
+if __name__ == '__main__':
+    unittest.main()
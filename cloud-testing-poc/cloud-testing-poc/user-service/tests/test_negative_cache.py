@@ -0,0 +1,67 @@
+"""
+Negative Cache Tests for User API
+Demonstrates caching missing lookups in cloud applications
+"""
+import json
+import os
+import sys
+import unittest
+
+# Add the src directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from src.main import create_app
+from src.services.negative_cache import NegativeCache
+
+
+class TestNegativeCache(unittest.TestCase):
+    """Integration tests for the missing-id cache"""
+
+    def setUp(self):
+        """Set up a test application"""
+        self.app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+                               'DEBUG_ROUTES_ENABLED': True})
+        self.client = self.app.test_client()
+
+    def _stats(self):
+        return self.client.get('/api/debug/negative-cache').get_json()
+
+    def test_repeated_missing_id_needs_no_query(self):
+        """Test that a second 404 for the same id is answered from the cache"""
+        first = self.client.get('/api/users/42')
+        second = self.client.get('/api/users/42')
+
+        self.assertEqual((first.status_code, second.status_code), (404, 404))
+        self.assertIn('desc="1 statements"', first.headers['Server-Timing'])
+        self.assertIn('desc="0 statements"', second.headers['Server-Timing'])
+        self.assertIn('cache;desc="negative hit"', second.headers['Server-Timing'])
+        self.assertEqual(self._stats()['hits'], 1)
+
+    def test_create_invalidates(self):
+        """Test that an id looked up before it existed is found once created"""
+        self.assertEqual(self.client.get('/api/users/1').status_code, 404)
+        self.client.post('/api/users', data=json.dumps({'username': 'a', 'email': 'a@example.com'}),
+                         content_type='application/json')
+
+        self.assertEqual(self.client.get('/api/users/1').status_code, 200)
+        self.assertEqual(self._stats()['size'], 0)
+
+    def test_bounded_with_expiry_and_stale_adds_ignored(self):
+        """Test the size bound, the TTL and that adds racing a clear are dropped"""
+        cache = NegativeCache(max_size=2, ttl=60)
+        for key in (1, 2, 3):
+            cache.add(key, cache.generation)
+        self.assertEqual([key in cache for key in (1, 2, 3)], [False, True, True])
+
+        generation = cache.generation
+        cache.clear()
+        cache.add(4, generation)
+        self.assertNotIn(4, cache)
+
+        expired = NegativeCache(ttl=0)
+        expired.add(5, expired.generation)
+        self.assertNotIn(5, expired)
+
+
+if __name__ == '__main__':
+    unittest.main()
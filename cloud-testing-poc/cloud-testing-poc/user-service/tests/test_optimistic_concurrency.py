@@ -0,0 +1,95 @@
+"""
+Optimistic Concurrency Tests for User API
+Demonstrates compare-and-swap updates with row versions in cloud applications
+"""
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+# Add the src directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from src.main import create_app
+
+
+class TestOptimisticConcurrency(unittest.TestCase):
+    """Integration tests for If-Match and versioned updates"""
+
+    def setUp(self):
+        """Set up a test application with one user"""
+        self.app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:'})
+        self.client = self.app.test_client()
+        self.client.post('/api/users', data=json.dumps({'username': 'alice', 'email': 'alice@example.com'}),
+                         content_type='application/json')
+
+    def patch(self, data, headers=None, user_id=1):
+        return self.client.patch(f'/api/users/{user_id}', data=json.dumps(data), headers=headers or {},
+                                 content_type='application/json')
+
+    def test_if_match_round_trip(self):
+        """Test that the ETag from a GET makes a conditional update that then moves the ETag on"""
+        etag = self.client.get('/api/users/1').headers['ETag']
+        self.assertEqual(etag, '"1"')
+
+        response = self.patch({'email': 'new@example.com'}, {'If-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['ETag'], '"2"')
+        self.assertEqual(response.get_json()['version'], 2)
+        self.assertEqual(self.client.get('/api/users/1', headers={'If-None-Match': '"2"'}).status_code, 304)
+
+    def test_stale_version_is_rejected(self):
+        """Test that a lost update is refused with 412 and the current user"""
+        self.patch({'email': 'first@example.com'}, {'If-Match': '"1"'})
+
+        response = self.patch({'email': 'second@example.com'}, {'If-Match': '"1"'})
+        self.assertEqual(response.status_code, 412)
+        self.assertEqual(response.headers['ETag'], '"2"')
+        self.assertEqual(response.get_json()['current']['email'], 'first@example.com')
+
+        response = self.patch({'email': 'second@example.com', 'version': 1})
+        self.assertEqual(response.status_code, 412)
+        self.assertEqual(self.client.get('/api/users/1').get_json()['email'], 'first@example.com')
+
+    def test_version_in_body(self):
+        """Test that a version in the body works like If-Match"""
+        response = self.client.put('/api/users/1', data=json.dumps({'username': 'alice', 'email': 'a@example.com',
+                                                                     'version': 1}),
+                                   content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['version'], 2)
+
+    def test_invalid_preconditions(self):
+        """Test that malformed or contradictory versions are 400s and missing users still 404"""
+        self.assertEqual(self.patch({'email': 'x@example.com'}, {'If-Match': '"abc"'}).status_code, 400)
+        self.assertEqual(self.patch({'email': 'x@example.com', 'version': '1'}).status_code, 400)
+        self.assertEqual(self.patch({'email': 'x@example.com', 'version': 2}, {'If-Match': '"1"'}).status_code, 400)
+        self.assertEqual(self.patch({'email': 'x@example.com', 'version': 1}, user_id=999).status_code, 404)
+        self.assertEqual(self.patch({'email': 'x@example.com'}, {'If-Match': '*'}).status_code, 200)
+
+    def test_unconditional_updates_can_be_refused(self):
+        """Test that UPDATE_REQUIRE_VERSION answers unconditional updates with 428"""
+        self.app.config['UPDATE_REQUIRE_VERSION'] = True
+        self.assertEqual(self.patch({'email': 'x@example.com'}).status_code, 428)
+        self.assertEqual(self.patch({'email': 'x@example.com', 'version': 1}).status_code, 200)
+
+    def test_existing_database_gains_versions(self):
+        """Test that a user table created before versions gets the column with every row at 1"""
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        path = os.path.join(tmpdir, 'users.db')
+        with sqlite3.connect(path) as conn:
+            conn.execute('CREATE TABLE user (id INTEGER PRIMARY KEY, username VARCHAR(80) NOT NULL UNIQUE, '
+                         'email VARCHAR(120) NOT NULL UNIQUE)')
+            conn.execute("INSERT INTO user VALUES (1, 'old', 'old@example.com')")
+        conn.close()
+
+        client = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}'}).test_client()
+        self.assertEqual(client.get('/api/users/1').get_json()['version'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,359 @@
+"""
+Repository Tests for User Storage Backends
+Demonstrates testing one storage contract against several backends
+"""
+import unittest
+import json
+import sys
+import os
+import shutil
+import sqlite3
+import tempfile
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from unittest import mock
+
+from sqlalchemy.exc import OperationalError
+
+# Add the src directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from src.main import create_app
+from src.models.user import db
+from src.repositories.base import DuplicateUserError, VersionConflictError
+from src.repositories.memory import InMemoryUserRepository
+from src.repositories.sharded import ShardedUserRepository, shard_for
+
+
+class RepositoryContract:
+    """Behaviour every UserRepository implementation must provide"""
+
+    def test_create_and_get(self):
+        """Test that created users can be read back by id"""
+        user = self.repo.create('alice', 'alice@example.com')
+        self.assertEqual(self.repo.get(user['id']), user)
+        self.assertIsNone(self.repo.get(user['id'] + 1000))
+
+    def test_uniqueness_is_enforced(self):
+        """Test that duplicate usernames and emails are rejected"""
+        self.repo.create('alice', 'alice@example.com')
+        with self.assertRaises(DuplicateUserError):
+            self.repo.create('alice', 'other@example.com')
+        with self.assertRaises(DuplicateUserError):
+            self.repo.create('other', 'alice@example.com')
+
+    def test_get_many(self):
+        """Test fetching several users at once, skipping missing ids"""
+        users = [self.repo.create(f'many{i}', f'many{i}@example.com') for i in range(3)]
+        ids = [user['id'] for user in users]
+
+        found = self.repo.get_many([ids[2], 9999, ids[0], ids[0]])
+        self.assertEqual(found, {ids[2]: users[2], ids[0]: users[0]})
+        self.assertEqual(self.repo.get_many([]), {})
+
+    def test_is_taken(self):
+        """Test that either a taken username or a taken email counts as taken"""
+        self.repo.create('alice', 'alice@example.com')
+        self.assertTrue(self.repo.is_taken('alice', 'new@example.com'))
+        self.assertTrue(self.repo.is_taken('new', 'alice@example.com'))
+        self.assertFalse(self.repo.is_taken('new', 'new@example.com'))
+
+    def test_update_and_delete(self):
+        """Test partial updates and deletes, including missing users"""
+        bob = self.repo.create('bob', 'bob@example.com')
+        self.repo.create('carol', 'carol@example.com')
+
+        updated = self.repo.update(bob['id'], {'email': 'bobby@example.com'})
+        self.assertEqual(updated, {'id': bob['id'], 'username': 'bob', 'email': 'bobby@example.com', 'version': 2})
+        with self.assertRaises(DuplicateUserError):
+            self.repo.update(bob['id'], {'username': 'carol'})
+        self.assertIsNone(self.repo.update(9999, {'username': 'ghost'}))
+
+        self.assertTrue(self.repo.delete(bob['id']))
+        self.assertFalse(self.repo.delete(bob['id']))
+
+    def test_list_pagination(self):
+        """Test keyset pagination in id order"""
+        created = [self.repo.create(f'user{i}', f'user{i}@example.com') for i in range(5)]
+
+        first = self.repo.list_users(limit=2)
+        rest = self.repo.list_users(after_id=first[-1]['id'])
+        self.assertEqual(first + rest, created)
+
+    def test_upsert(self):
+        """Test that upsert inserts new usernames and updates existing ones"""
+        created = self.repo.upsert('dave', 'dave@example.com')
+        updated = self.repo.upsert('dave', 'david@example.com')
+        self.assertEqual(updated['id'], created['id'])
+        self.assertEqual(updated['version'], created['version'] + 1)
+        self.assertEqual(self.repo.get(created['id'])['email'], 'david@example.com')
+
+    def test_conditional_update(self):
+        """Test that an update with an expected version applies only at that version"""
+        user = self.repo.create('erin', 'erin@example.com')
+        self.assertEqual(user['version'], 1)
+
+        updated = self.repo.update(user['id'], {'email': 'erin2@example.com'}, expected_version=1)
+        self.assertEqual(updated['version'], 2)
+        with self.assertRaises(VersionConflictError) as conflict:
+            self.repo.update(user['id'], {'email': 'stale@example.com'}, expected_version=1)
+        self.assertEqual(conflict.exception.current, updated)
+        self.assertEqual(self.repo.get(user['id']), updated)
+        self.assertIsNone(self.repo.update(9999, {'email': 'ghost@example.com'}, expected_version=1))
+
+    def test_search_by_prefix(self):
+        """Test prefix search over usernames and emails"""
+        self.repo.create('alice', 'a@example.com')
+        self.repo.create('alfred', 'fred@example.com')
+        self.repo.create('bob', 'alpha@example.com')
+
+        self.assertEqual([u['username'] for u in self.repo.search('al')], ['alice', 'alfred', 'bob'])
+        self.assertEqual([u['username'] for u in self.repo.search('fred')], ['alfred'])
+        self.assertEqual(self.repo.search('%'), [])
+
+    def test_bulk_operations_are_atomic(self):
+        """Test that a bulk create with one duplicate inserts nothing"""
+        created = self.repo.bulk_create([{'username': 'u1', 'email': 'u1@example.com'},
+                                         {'username': 'u2', 'email': 'u2@example.com'}])
+        self.assertEqual([u['username'] for u in created], ['u1', 'u2'])
+
+        with self.assertRaises(DuplicateUserError):
+            self.repo.bulk_create([{'username': 'u3', 'email': 'u3@example.com'},
+                                   {'username': 'u1', 'email': 'again@example.com'}])
+        self.assertEqual(len(self.repo.list_users()), 2)
+
+        ids = [u['id'] for u in created]
+        self.assertEqual(self.repo.bulk_delete(ids + [9999]), ids)
+        self.assertEqual(self.repo.list_users(), [])
+
+    def test_stats_track_writes(self):
+        """Test that domain and signup counts follow creates, updates and deletes"""
+        a = self.repo.create('a', 'a@one.example')
+        self.repo.bulk_create([{'username': 'b', 'email': 'b@one.example'},
+                               {'username': 'c', 'email': 'c@Two.example'}])
+        self.repo.update(a['id'], {'email': 'a@two.example'})
+        self.repo.delete(a['id'])
+
+        domains, signups = self.repo.stats(0, 10)
+        self.assertEqual(domains, [('one.example', 1), ('two.example', 1)])
+        self.assertEqual(sum(signups.values()), 3)
+        self.assertEqual(self.repo.stats(0, 1)[0], [('one.example', 1)])
+        self.assertEqual(self.repo.recompute_stats(), 0)
+
+    def test_count_tracks_writes(self):
+        """Test that the maintained count follows creates, deletes and bulk ops"""
+        self.assertEqual(self.repo.count(), 0)
+        first = self.repo.create('c1', 'c1@example.com')
+        bulk = self.repo.bulk_create([{'username': f'c{i}', 'email': f'c{i}@example.com'} for i in range(2, 6)])
+        with self.assertRaises(DuplicateUserError):
+            self.repo.create('c1', 'again@example.com')
+        self.repo.upsert('c1', 'new@example.com')
+        self.assertEqual(self.repo.count(), 5)
+
+        self.repo.delete(first['id'])
+        self.repo.bulk_delete([u['id'] for u in bulk[:2]])
+        self.assertEqual(self.repo.count(), 2)
+        self.assertEqual(self.repo.reconcile_count(), 0)
+
+
+class TestInMemoryRepository(RepositoryContract, unittest.TestCase):
+    """Contract tests for the in-memory backend"""
+
+    def setUp(self):
+        self.repo = InMemoryUserRepository()
+
+    def test_concurrent_creates_keep_uniqueness(self):
+        """Test that racing creates of one username admit exactly one"""
+        def create(i):
+            try:
+                return self.repo.create('racer', f'racer{i}@example.com')
+            except DuplicateUserError:
+                return None
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(create, range(64)))
+        self.assertEqual(sum(r is not None for r in results), 1)
+
+
+class TestSQLAlchemyRepository(RepositoryContract, unittest.TestCase):
+    """Contract tests for the SQLAlchemy backend"""
+
+    def setUp(self):
+        self.app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:'})
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        self.repo = self.app.extensions['user_repository']
+
+    def tearDown(self):
+        self.ctx.pop()
+
+    def test_core_reads_bypass_identity_map(self):
+        """Test that Core reads return dicts without loading ORM instances"""
+        created = self.repo.create('core', 'core@example.com')
+        db.session.expunge_all()
+
+        self.assertEqual(self.repo.list_users(), [created])
+        self.assertEqual(self.repo.get(created['id']), created)
+        self.assertEqual(len(db.session.identity_map), 0)
+
+
+class TestSQLAlchemyORMReadRepository(RepositoryContract, unittest.TestCase):
+    """Contract tests for the SQLAlchemy backend reading through the ORM"""
+
+    def setUp(self):
+        self.app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+                               'SQL_CORE_READS': False})
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        self.repo = self.app.extensions['user_repository']
+
+    def tearDown(self):
+        self.ctx.pop()
+
+
+class TestShardedRepository(RepositoryContract, unittest.TestCase):
+    """Contract tests for the hash-sharded SQLite backend"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.repo = ShardedUserRepository(self.tmpdir, 4)
+
+    def tearDown(self):
+        for shard in self.repo.shards:
+            shard.engine.dispose()
+        self.repo.ids.engine.dispose()
+        shutil.rmtree(self.tmpdir)
+
+    def test_users_are_spread_across_shards(self):
+        """Test that rows land in the shard chosen by the id hash"""
+        users = self.repo.bulk_create([{'username': f's{i}', 'email': f's{i}@example.com'} for i in range(40)])
+
+        used = {shard_for(u['id'], 4) for u in users}
+        self.assertGreater(len(used), 1)
+        for user in users:
+            self.assertEqual(self.repo.shard(user['id']).engine.url.database,
+                             os.path.join(self.tmpdir, f"users-{shard_for(user['id'], 4)}.db"))
+            self.assertEqual(self.repo.get(user['id']), user)
+
+    def test_uniqueness_holds_across_shards(self):
+        """Test that a username taken on one shard is rejected on another"""
+        first = self.repo.create('taken', 'taken@example.com')
+
+        # Every attempt allocates a fresh id, so these land on several shards
+        attempted_shards = set()
+        for attempt in range(8):
+            attempted_shards.add(shard_for(first['id'] + attempt + 1, 4))
+            with self.assertRaises(DuplicateUserError):
+                self.repo.create('taken', 'else@example.com')
+        self.assertGreater(len(attempted_shards - {shard_for(first['id'], 4)}), 0)
+
+        # The failed creates must not leak their reserved email
+        self.assertEqual(self.repo.create('other', 'else@example.com')['email'], 'else@example.com')
+
+    def test_bulk_create_undone_after_any_shard_failure(self):
+        """Test that a bulk create failing on its second shard removes the rows the first shard committed"""
+        started = []
+
+        def failing_begin(engine):
+            begin = engine.begin
+
+            def wrapper():
+                if engine not in started:
+                    started.append(engine)
+                if started.index(engine) == 1:
+                    raise OperationalError('INSERT INTO user', {}, sqlite3.OperationalError('database is locked'))
+                return begin()
+            return wrapper
+
+        users = [{'username': f'g{i}', 'email': f'g{i}@example.com'} for i in range(20)]
+        with ExitStack() as stack:
+            for shard in self.repo.shards:
+                stack.enter_context(mock.patch.object(shard.engine, 'begin', failing_begin(shard.engine)))
+            with self.assertRaises(OperationalError):
+                self.repo.bulk_create(users)
+
+        self.assertEqual(len(started), 2)
+        self.assertEqual(self.repo.list_users(), [])
+        self.assertEqual(self.repo.count(), 0)
+        self.assertEqual(len(self.repo.bulk_create(users)), 20)
+
+    def test_top_domains_merge_shard_tops(self):
+        """Test that a domain spread thinly over every shard still ranks by its overall count"""
+        spread = self.repo.bulk_create([{'username': f's{i}', 'email': f's{i}@spread.example'} for i in range(8)])
+        per_shard = Counter(shard_for(u['id'], 4) for u in spread)
+        # Give each shard a local domain that leads it but trails spread.example overall
+        for shard in range(4):
+            kept, attempt = 0, 0
+            while kept <= per_shard[shard]:
+                user = self.repo.create(f'l{shard}-{attempt}', f'l{attempt}@local{shard}.example')
+                attempt += 1
+                if shard_for(user['id'], 4) == shard:
+                    kept += 1
+                else:
+                    self.repo.delete(user['id'])
+
+        expected = sorted(Counter(u['email'].split('@')[1] for u in self.repo.list_users()).items(),
+                          key=lambda item: (-item[1], item[0]))
+        self.assertEqual(expected[0], ('spread.example', 8))
+        for limit in (1, 2, 5, 10):
+            self.assertEqual(self.repo.stats(0, limit)[0], expected[:limit])
+
+    def test_state_survives_reopen(self):
+        """Test that ids and the routing index are rebuilt from the shard files"""
+        created = self.repo.create('persist', 'persist@example.com')
+        reopened = ShardedUserRepository(self.tmpdir, 4)
+
+        self.assertEqual(reopened.get(created['id']), created)
+        with self.assertRaises(DuplicateUserError):
+            reopened.create('persist', 'new@example.com')
+        self.assertGreater(reopened.create('next', 'next@example.com')['id'], created['id'])
+
+
+class TestInMemoryBackendAPI(unittest.TestCase):
+    """Integration tests for the API running on the in-memory backend"""
+
+    def setUp(self):
+        self.app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+                               'USER_STORAGE_BACKEND': 'memory'})
+        self.client = self.app.test_client()
+
+    def post(self, url, data):
+        return self.client.post(url, data=json.dumps(data), content_type='application/json')
+
+    def test_crud_round_trip(self):
+        """Test the user API end to end without a database"""
+        response = self.post('/api/users', {'username': 'mem', 'email': 'mem@example.com'})
+        self.assertEqual(response.status_code, 201)
+        user_id = json.loads(response.data)['id']
+
+        self.assertEqual(self.post('/api/users', {'username': 'mem', 'email': 'x@example.com'}).status_code, 409)
+        self.assertEqual(json.loads(self.client.get(f'/api/users/{user_id}').data)['username'], 'mem')
+        self.assertEqual(self.client.delete(f'/api/users/{user_id}').status_code, 204)
+        self.assertEqual(self.client.get(f'/api/users/{user_id}').status_code, 404)
+
+    def test_paginated_list_sets_next_cursor(self):
+        """Test that a full page advertises the cursor for the next one"""
+        self.post('/api/users/bulk', [{'username': f'u{i}', 'email': f'u{i}@example.com'} for i in range(3)])
+
+        response = self.client.get('/api/users?limit=2')
+        self.assertEqual(len(json.loads(response.data)), 2)
+        cursor = response.headers['X-Next-Cursor']
+
+        response = self.client.get(f'/api/users?limit=2&after={cursor}')
+        self.assertEqual([u['username'] for u in json.loads(response.data)], ['u2'])
+        self.assertNotIn('X-Next-Cursor', response.headers)
+
+    def test_search_and_bulk_delete_endpoints(self):
+        """Test the search and bulk delete endpoints"""
+        created = json.loads(self.post('/api/users/bulk', [{'username': 'ann', 'email': 'ann@example.com'},
+                                                           {'username': 'bea', 'email': 'bea@example.com'}]).data)
+
+        self.assertEqual([u['username'] for u in json.loads(self.client.get('/api/users/search?q=an').data)], ['ann'])
+
+        response = self.post('/api/users/bulk-delete', {'ids': [u['id'] for u in created]})
+        self.assertEqual(json.loads(response.data)['deleted'], [u['id'] for u in created])
+
+
+if __name__ == '__main__':
+    unittest.main()
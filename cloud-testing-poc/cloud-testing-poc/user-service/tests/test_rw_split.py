@@ -0,0 +1,92 @@
+"""
+Read/Write Split Tests for User API
+Demonstrates routing reads and writes to separate connection pools
+"""
+import unittest
+import json
+import sys
+import os
+import shutil
+import tempfile
+
+from sqlalchemy import event, text
+from sqlalchemy.exc import OperationalError
+
+# Add the src directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from src.main import create_app
+from src.models.user import db
+
+
+class TestReadWriteSplit(unittest.TestCase):
+    """Integration tests for reader/writer engine routing"""
+
+    def setUp(self):
+        """Set up an application with the split enabled on a temporary file"""
+        self.tmpdir = tempfile.mkdtemp()
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(self.tmpdir, 'test.db')}",
+            'RW_SPLIT_ENABLED': True,
+            'RW_SPLIT_READ_POOL_SIZE': 2,
+        })
+        self.client = self.app.test_client()
+        self.reader = self.app.extensions['rw_split'].reader
+        with self.app.app_context():
+            self.writer = db.engine
+        self.used = []
+        event.listen(self.reader, 'before_cursor_execute', self.record_reader)
+        event.listen(self.writer, 'before_cursor_execute', self.record_writer)
+
+    def tearDown(self):
+        """Release both pools and remove the database file"""
+        self.reader.dispose()
+        self.writer.dispose()
+        shutil.rmtree(self.tmpdir)
+
+    def record_reader(self, *args):
+        self.used.append('reader')
+
+    def record_writer(self, *args):
+        self.used.append('writer')
+
+    def test_reads_and_writes_use_separate_engines(self):
+        """Test that GETs hit the reader pool and writes hit the writer"""
+        response = self.client.post('/api/users', data=json.dumps({'username': 'rw', 'email': 'rw@example.com'}),
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(set(self.used), {'writer'})
+
+        self.used.clear()
+        response = self.client.get('/api/users')
+        self.assertEqual([u['username'] for u in json.loads(response.data)], ['rw'])
+        self.assertEqual(set(self.used), {'reader'})
+
+    def test_read_endpoints_can_be_routed_explicitly(self):
+        """Test that endpoints listed in RW_SPLIT_READ_ENDPOINTS use the reader"""
+        self.app.config['RW_SPLIT_READ_ENDPOINTS'] = {'user.search_users'}
+        self.client.get('/api/users/search?q=a')
+        self.assertEqual(set(self.used), {'reader'})
+
+    def test_reader_connections_are_read_only(self):
+        """Test that the reader pool refuses writes"""
+        with self.reader.connect() as conn:
+            with self.assertRaises(OperationalError):
+                conn.execute(text("INSERT INTO user (username, email) VALUES ('x', 'x@example.com')"))
+
+    def test_database_uses_wal_and_single_writer(self):
+        """Test WAL mode and the single-connection writer pool"""
+        with self.writer.connect() as conn:
+            self.assertEqual(conn.execute(text('PRAGMA journal_mode')).scalar(), 'wal')
+        self.assertEqual(self.writer.pool.size(), 1)
+        self.assertEqual(self.reader.pool.size(), 2)
+
+    def test_in_memory_database_is_rejected(self):
+        """Test that the split refuses databases it cannot share"""
+        with self.assertRaises(ValueError):
+            create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:', 'RW_SPLIT_ENABLED': True})
+
+
+if __name__ == '__main__':
+    unittest.main()
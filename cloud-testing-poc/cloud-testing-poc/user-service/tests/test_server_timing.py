@@ -0,0 +1,78 @@
+"""
+Server-Timing Tests for User API
+Demonstrates exposing backend phase timings to browsers in cloud applications
+"""
+import json
+import os
+import re
+import sys
+import unittest
+
+# Add the src directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from flask import jsonify
+
+from src.main import create_app
+from src.middleware.server_timing import record_cache
+
+METRIC_PATTERN = re.compile(r'(\w+)((?:;\w+=(?:"[^"]*"|[\d.]+))*)')
+
+
+def parse_server_timing(value):
+    """Parse a Server-Timing header into (name, {param: value}) pairs"""
+    metrics = []
+    for item in value.split(', '):
+        name, params = METRIC_PATTERN.fullmatch(item).groups()
+        metrics.append((name, dict(param.split('=', 1) for param in params.split(';')[1:])))
+    return metrics
+
+
+class TestServerTiming(unittest.TestCase):
+    """Integration tests for Server-Timing response headers"""
+
+    def setUp(self):
+        """Set up a test application"""
+        self.app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:'})
+        self.client = self.app.test_client()
+
+    def test_api_response_phases(self):
+        """Test that an API response reports routing, db, serialize, cache and total"""
+        self.client.post('/api/users', data=json.dumps({'username': 'a', 'email': 'a@example.com'}),
+                         content_type='application/json')
+        response = self.client.get('/api/users/1')
+
+        metrics = dict(parse_server_timing(response.headers['Server-Timing']))
+        self.assertEqual(list(metrics), ['routing', 'db', 'serialize', 'cache', 'total'])
+        self.assertEqual(metrics['cache']['desc'], '"negative miss"')
+        self.assertRegex(metrics['db']['desc'], r'^"[1-9]\d* statements"$')
+        durations = {name: float(params['dur']) for name, params in metrics.items() if 'dur' in params}
+        self.assertGreaterEqual(durations['total'],
+                                durations['routing'] + durations['db'] + durations['serialize'])
+
+    def test_cache_lookups(self):
+        """Test that reported cache lookups appear as cache metrics"""
+        def cached():
+            record_cache('users', True, 0.0001)
+            record_cache('pages', False)
+            return jsonify([])
+        self.app.add_url_rule('/api/cached', 'cached', cached)
+
+        metrics = parse_server_timing(self.client.get('/api/cached').headers['Server-Timing'])
+
+        caches = [params for name, params in metrics if name == 'cache']
+        self.assertEqual(caches, [{'desc': '"users hit"', 'dur': '0.100'}, {'desc': '"pages miss"'}])
+
+    def test_only_api_responses(self):
+        """Test that non-API responses carry no timings"""
+        self.assertNotIn('Server-Timing', self.client.get('/').headers)
+
+    def test_disabled(self):
+        """Test that SERVER_TIMING_ENABLED=false removes the header"""
+        app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+                          'SERVER_TIMING_ENABLED': False})
+        self.assertNotIn('Server-Timing', app.test_client().get('/api/users').headers)
+
+
+if __name__ == '__main__':
+    unittest.main()
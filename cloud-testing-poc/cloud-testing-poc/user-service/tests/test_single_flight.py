@@ -0,0 +1,113 @@
+"""
+Single-Flight Tests for User API
+Demonstrates coalescing identical concurrent reads in cloud applications
+"""
+import json
+import os
+import sys
+import threading
+import time
+import unittest
+
+# Add the src directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from src.main import create_app
+
+
+class TestSingleFlight(unittest.TestCase):
+    """Integration tests for request coalescing"""
+
+    def setUp(self):
+        """Set up an in-memory application whose list query blocks until released"""
+        self.app = create_app({'TESTING': True, 'USER_STORAGE_BACKEND': 'memory', 'DEBUG_ROUTES_ENABLED': True})
+        self.repository = self.app.extensions['user_repository']
+        self.repository.create('a', 'a@example.com')
+
+        inner = self.repository.repository
+        list_users = inner.list_users
+        self.queries = 0
+        self.entered = threading.Event()
+        self.release = threading.Event()
+
+        def blocking_list_users(*args, **kwargs):
+            self.queries += 1
+            self.entered.set()
+            self.release.wait(5)
+            return list_users(*args, **kwargs)
+        inner.list_users = blocking_list_users
+
+    def _stats(self):
+        return self.app.test_client().get('/api/debug/single-flight').get_json()
+
+    def _get_in_thread(self, responses, path='/api/users'):
+        def get():
+            response = self.app.test_client().get(path)
+            responses.append((response.status_code, response.get_data(), response.headers.get('ETag')))
+        thread = threading.Thread(target=get)
+        thread.start()
+        return thread
+
+    def _wait_for(self, condition):
+        deadline = time.monotonic() + 5
+        while not condition():
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.005)
+
+    def test_identical_reads_share_one_query(self):
+        """Test that concurrent identical GETs run one query and get the same bytes"""
+        responses = []
+        threads = [self._get_in_thread(responses)]
+        self.assertTrue(self.entered.wait(5))
+        threads += [self._get_in_thread(responses) for _ in range(4)]
+        self._wait_for(lambda: self._stats()['waiting'] == 4)
+        self.release.set()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(self.queries, 1)
+        self.assertEqual(len(responses), 5)
+        self.assertEqual(len(set(responses)), 1)
+        self.assertEqual(json.loads(responses[0][1])[0]['username'], 'a')
+        stats = self._stats()
+        self.assertEqual((stats['leaders'], stats['coalesced'], stats['fallbacks']), (1, 4, 0))
+        self.assertEqual(stats['coalescing_ratio'], 0.8)
+
+    def test_different_queries_are_not_shared(self):
+        """Test that different query arguments run separately"""
+        responses = []
+        threads = [self._get_in_thread(responses)]
+        self.assertTrue(self.entered.wait(5))
+        threads.append(self._get_in_thread(responses, '/api/users?limit=1'))
+        self._wait_for(lambda: self._stats()['in_flight'] == 2)
+        self.release.set()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(self.queries, 2)
+        self.assertEqual(self._stats()['coalesced'], 0)
+
+    def test_reads_after_a_write_do_not_join_earlier_flights(self):
+        """Test that a read arriving after a write does not get a result computed before it"""
+        responses = []
+        threads = [self._get_in_thread(responses)]
+        self.assertTrue(self.entered.wait(5))
+        self.repository.create('b', 'b@example.com')
+        threads.append(self._get_in_thread(responses))
+        self._wait_for(lambda: self.queries == 2)
+        self.release.set()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(self._stats()['coalesced'], 0)
+        self.assertIn(2, [len(json.loads(body)) for _, body, _ in responses])
+
+    def test_disabled(self):
+        """Test that SINGLE_FLIGHT_ENABLED=false runs every read on its own"""
+        app = create_app({'TESTING': True, 'USER_STORAGE_BACKEND': 'memory', 'SINGLE_FLIGHT_ENABLED': False})
+        self.assertNotIn('single_flight', app.extensions)
+        self.assertEqual(app.test_client().get('/api/users').status_code, 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
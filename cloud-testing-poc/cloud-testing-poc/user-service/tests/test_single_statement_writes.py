@@ -0,0 +1,122 @@
+"""
+Single-Statement Write Tests for User API
+Demonstrates round-trip minimisation in cloud applications
+"""
+import unittest
+import json
+import sys
+import os
+
+from sqlalchemy import event
+
+# Add the src directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from src.main import create_app
+from src.models.user import db
+
+TRANSACTION_CONTROL = ('BEGIN', 'COMMIT', 'ROLLBACK', 'SAVEPOINT', 'RELEASE')
+
+
+class TestSingleStatementWrites(unittest.TestCase):
+    """Integration tests for single-statement mutating endpoints"""
+
+    def setUp(self):
+        """Set up an application and count the SQL statements it issues"""
+        self.app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:'})
+        self.client = self.app.test_client()
+        self.statements = []
+        with self.app.app_context():
+            self.engine = db.engine
+        event.listen(self.engine, 'before_cursor_execute', self.record)
+
+    def tearDown(self):
+        """Stop counting statements"""
+        event.remove(self.engine, 'before_cursor_execute', self.record)
+
+    def record(self, conn, cursor, statement, parameters, context, executemany):
+        if not statement.lstrip().upper().startswith(TRANSACTION_CONTROL):
+            self.statements.append(statement)
+
+    def send(self, method, url, data=None):
+        self.statements.clear()
+        return self.client.open(url, method=method,
+                                data=json.dumps(data) if data is not None else None,
+                                content_type='application/json')
+
+    def create_user(self, username='alice', email='alice@example.com'):
+        return self.send('POST', '/api/users', {'username': username, 'email': email})
+
+    def test_create_is_one_statement(self):
+        """Test that POST issues a single INSERT ... RETURNING"""
+        response = self.create_user()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(self.statements), 1)
+        self.assertIn('RETURNING', self.statements[0])
+
+    def test_create_conflict_returns_409(self):
+        """Test that a duplicate username is reported as a conflict"""
+        self.create_user()
+        response = self.create_user(email='other@example.com')
+        self.assertEqual(response.status_code, 409)
+        self.assertIn('error', json.loads(response.data))
+
+    def test_put_and_patch_are_one_statement(self):
+        """Test that PUT and PATCH issue a single UPDATE ... RETURNING"""
+        user_id = json.loads(self.create_user().data)['id']
+
+        response = self.send('PUT', f'/api/users/{user_id}', {'username': 'bob', 'email': 'bob@example.com'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.statements), 1)
+
+        response = self.send('PATCH', f'/api/users/{user_id}', {'email': 'patched@example.com'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.statements), 1)
+        self.assertEqual(json.loads(response.data),
+                         {'id': user_id, 'username': 'bob', 'email': 'patched@example.com', 'version': 3})
+
+    def test_conditional_update_is_one_statement(self):
+        """Test that a versioned PATCH is a single UPDATE ... WHERE version = ?"""
+        user_id = json.loads(self.create_user().data)['id']
+
+        response = self.send('PATCH', f'/api/users/{user_id}', {'email': 'new@example.com', 'version': 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.statements), 1)
+        self.assertIn('version = ?', self.statements[0])
+
+    def test_update_missing_user_returns_404(self):
+        """Test that 404 is detected from the affected row count"""
+        response = self.send('PATCH', '/api/users/999', {'username': 'ghost'})
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(len(self.statements), 1)
+
+    def test_delete_is_one_statement(self):
+        """Test that DELETE issues a single DELETE ... RETURNING"""
+        user_id = json.loads(self.create_user().data)['id']
+
+        response = self.send('DELETE', f'/api/users/{user_id}')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(len(self.statements), 1)
+
+        response = self.send('DELETE', f'/api/users/{user_id}')
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(len(self.statements), 1)
+
+    def test_upsert_inserts_then_updates(self):
+        """Test that upsert resolves insert-or-update in one statement"""
+        response = self.send('POST', '/api/users/upsert', {'username': 'carol', 'email': 'carol@example.com'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.statements), 1)
+        created = json.loads(response.data)
+
+        response = self.send('POST', '/api/users/upsert', {'username': 'carol', 'email': 'new@example.com'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.statements), 1)
+        updated = json.loads(response.data)
+
+        self.assertEqual(updated['id'], created['id'])
+        self.assertEqual(updated['email'], 'new@example.com')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+"""
+Snapshot Tests for User API
+Demonstrates serving pre-encoded collection snapshots in cloud applications
+"""
+import gzip
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+# Add the src directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from src.main import create_app
+
+
+class TestUserListSnapshot(unittest.TestCase):
+    """Integration tests for the pre-encoded user list snapshot"""
+
+    def setUp(self):
+        """Set up a file-backed application with snapshots enabled"""
+        self.tmpdir = tempfile.mkdtemp()
+        self.app = create_app({'TESTING': True, 'SNAPSHOT_ENABLED': True, 'SNAPSHOT_REBUILD_DELAY': 0,
+                               'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(self.tmpdir, 'users.db')}"})
+        self.client = self.app.test_client()
+        for name in ('a', 'b', 'c'):
+            self._create(name)
+
+    def tearDown(self):
+        """Stop the builder and remove the database"""
+        self.app.extensions['user_snapshot'].stop()
+        shutil.rmtree(self.tmpdir)
+
+    def _create(self, name):
+        self.client.post('/api/users', data=json.dumps({'username': name, 'email': f'{name}@example.com'}),
+                         content_type='application/json')
+
+    def _stats(self):
+        return self.client.get('/api/debug/snapshot').get_json()
+
+    def _wait_until_current(self):
+        deadline = time.monotonic() + 5
+        while True:
+            stats = self._stats()
+            if stats['pages'] and stats['current'] == stats['pages']:
+                return
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.005)
+
+    def test_hit_needs_no_query(self):
+        """Test that a built page is served without touching the database"""
+        miss = self.client.get('/api/users?limit=2')
+        self._wait_until_current()
+        hit = self.client.get('/api/users?limit=2')
+
+        self.assertEqual(hit.get_data(), miss.get_data())
+        for header in ('X-Total-Count', 'X-Next-Cursor', 'ETag'):
+            self.assertEqual(hit.headers[header], miss.headers[header])
+        self.assertIn('cache;desc="snapshot miss"', miss.headers['Server-Timing'])
+        self.assertIn('cache;desc="snapshot hit"', hit.headers['Server-Timing'])
+        self.assertIn('desc="0 statements"', hit.headers['Server-Timing'])
+        self.assertEqual(self._stats()['hits'], 1)
+
+    def test_gzip_and_conditional_requests(self):
+        """Test that clients accepting gzip get the compressed copy and 304s still work"""
+        self.client.get('/api/users')
+        self._wait_until_current()
+
+        plain = self.client.get('/api/users')
+        compressed = self.client.get('/api/users', headers={'Accept-Encoding': 'gzip'})
+        revalidated = self.client.get('/api/users', headers={'Accept-Encoding': 'gzip',
+                                                              'If-None-Match': compressed.headers['ETag']})
+
+        self.assertEqual(compressed.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(compressed.get_data()), plain.get_data())
+        self.assertNotEqual(compressed.headers['ETag'], plain.headers['ETag'])
+        self.assertEqual(revalidated.status_code, 304)
+
+    def test_write_invalidates_and_rebuilds(self):
+        """Test that reads after a write see it at once and are served from a rebuilt snapshot"""
+        self.client.get('/api/users')
+        self._wait_until_current()
+
+        self._create('d')
+        after_write = self.client.get('/api/users')
+        self._wait_until_current()
+        rebuilt = self.client.get('/api/users')
+
+        self.assertEqual([u['username'] for u in after_write.get_json()], ['a', 'b', 'c', 'd'])
+        self.assertIn('snapshot miss', after_write.headers['Server-Timing'])
+        self.assertEqual(rebuilt.get_data(), after_write.get_data())
+        self.assertIn('snapshot hit', rebuilt.headers['Server-Timing'])
+
+    def test_disabled_by_default(self):
+        """Test that snapshots are opt-in"""
+        app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:'})
+        self.assertNotIn('user_snapshot', app.extensions)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,131 @@
+"""
+Tracing Tests for User API
+Demonstrates distributed tracing with W3C trace context in cloud applications
+"""
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+# Add the src directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from src.main import create_app
+from src.middleware.tracing import SPAN_KIND_CLIENT, SPAN_KIND_SERVER, parse_traceparent
+
+PARENT_TRACE_ID = '4bf92f3577b34da6a3ce929d0e0e4736'
+PARENT_SPAN_ID = '00f067aa0ba902b7'
+
+
+class TestTracing(unittest.TestCase):
+    """Integration tests for request tracing and the OTLP file exporter"""
+
+    def setUp(self):
+        """Set up a test application exporting traces to a temporary file"""
+        fd, self.path = tempfile.mkstemp(suffix='.jsonl')
+        os.close(fd)
+        self.app = self._app()
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        """Stop the exporter and remove the trace file"""
+        self.app.extensions['tracing'].exporter.close()
+        os.unlink(self.path)
+
+    def _app(self, **config):
+        return create_app(dict({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+                                'TRACING_ENABLED': True, 'TRACING_EXPORT': self.path,
+                                'TRACING_FLUSH_INTERVAL': 0.01}, **config))
+
+    def _request(self, method, path, **kwargs):
+        # Traces are exported when the server closes the response
+        response = self.client.open(path, method=method, **kwargs)
+        response.close()
+        return response
+
+    def _spans(self):
+        self.app.extensions['tracing'].exporter.close()
+        with open(self.path, encoding='utf-8') as export:
+            return [span for line in export
+                    for resource in json.loads(line)['resourceSpans']
+                    for scope in resource['scopeSpans']
+                    for span in scope['spans']]
+
+    def test_request_spans(self):
+        """Test that a request records server, routing, statement and serialize spans"""
+        self._request('POST', '/api/users', data=json.dumps({'username': 'a', 'email': 'a@example.com'}),
+                      content_type='application/json')
+        self._request('GET', '/api/users/1')
+
+        spans = self._spans()
+        server = [s for s in spans if s['name'] == 'GET /api/users/<int:user_id>'][0]
+        children = [s for s in spans if s['traceId'] == server['traceId'] and s is not server]
+        self.assertEqual(server['kind'], SPAN_KIND_SERVER)
+        self.assertNotIn('parentSpanId', server)
+        self.assertTrue(all(s['parentSpanId'] == server['spanId'] for s in children))
+        self.assertIn('routing', [s['name'] for s in children])
+        self.assertIn('serialize', [s['name'] for s in children])
+        statements = [s for s in children if s['kind'] == SPAN_KIND_CLIENT]
+        self.assertTrue(statements)
+        self.assertEqual(statements[0]['name'], 'SELECT')
+        for s in children:
+            self.assertGreaterEqual(int(s['startTimeUnixNano']), int(server['startTimeUnixNano']))
+            self.assertLessEqual(int(s['endTimeUnixNano']), int(server['endTimeUnixNano']))
+        attributes = {a['key']: a['value'] for a in server['attributes']}
+        self.assertEqual(attributes['http.response.status_code'], {'intValue': '200'})
+
+    def test_continues_incoming_trace(self):
+        """Test that a sampled traceparent is continued even when local sampling is off"""
+        self.app.extensions['tracing'].exporter.close()
+        self.app = self._app(TRACING_SAMPLE_RATE=0.0)
+        self.client = self.app.test_client()
+
+        self._request('GET', '/api/users')
+        self._request('GET', '/api/users', headers={'traceparent': f'00-{PARENT_TRACE_ID}-{PARENT_SPAN_ID}-01'})
+        self._request('GET', '/api/users', headers={'traceparent': f'00-{PARENT_TRACE_ID}-{PARENT_SPAN_ID}-00'})
+
+        stats = self.client.get('/api/debug/tracing').get_json()
+        self.assertEqual(stats['sampled'], 1)
+        spans = self._spans()
+        self.assertTrue(spans)
+        self.assertTrue(all(s['traceId'] == PARENT_TRACE_ID for s in spans))
+        server = [s for s in spans if s['kind'] == SPAN_KIND_SERVER][0]
+        self.assertEqual(server['parentSpanId'], PARENT_SPAN_ID)
+
+    def test_cache_lookup_spans(self):
+        """Test that cache lookups are recorded as spans carrying their outcome"""
+        self.app.extensions['tracing'].exporter.close()
+        self.app = self._app(SNAPSHOT_ENABLED=True)
+        self.client = self.app.test_client()
+        self.addCleanup(self.app.extensions['user_snapshot'].stop)
+
+        self._request('GET', '/api/users?limit=2')
+        self._request('GET', '/api/users/42')
+        self._request('GET', '/api/users/42')
+
+        lookups = [(s['name'], {a['key']: a['value'] for a in s['attributes']})
+                   for s in self._spans() if s['name'].startswith('cache.')]
+        self.assertEqual(lookups, [('cache.snapshot', {'cache.hit': {'boolValue': False}}),
+                                   ('cache.negative', {'cache.hit': {'boolValue': False}}),
+                                   ('cache.negative', {'cache.hit': {'boolValue': True}})])
+
+    def test_parse_traceparent(self):
+        """Test parsing of W3C traceparent headers"""
+        self.assertEqual(parse_traceparent(f'00-{PARENT_TRACE_ID}-{PARENT_SPAN_ID}-01'),
+                         (PARENT_TRACE_ID, PARENT_SPAN_ID, True))
+        self.assertEqual(parse_traceparent(f'01-{PARENT_TRACE_ID}-{PARENT_SPAN_ID}-00-extra'),
+                         (PARENT_TRACE_ID, PARENT_SPAN_ID, False))
+        for value in (None, '', 'garbage', f'00-{"0" * 32}-{PARENT_SPAN_ID}-01',
+                      f'ff-{PARENT_TRACE_ID}-{PARENT_SPAN_ID}-01', f'00-{PARENT_TRACE_ID}-{PARENT_SPAN_ID}-01-x'):
+            self.assertIsNone(parse_traceparent(value))
+
+    def test_disabled_by_default(self):
+        """Test that applications do not trace unless asked"""
+        app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:'})
+        self.assertNotIn('tracing', app.extensions)
+        self.assertNotIn('tracing_stats', app.view_functions)
+
+
+if __name__ == '__main__':
+    unittest.main()
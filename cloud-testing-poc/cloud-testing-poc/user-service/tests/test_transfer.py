@@ -0,0 +1,131 @@
+"""
+Export/Import Tests for User API
+Demonstrates streaming bulk data in and out of the service
+"""
+import unittest
+import json
+import sys
+import os
+
+# Add the src directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from src.main import create_app
+
+
+def ndjson(users):
+    return ''.join(json.dumps(user) + '\n' for user in users)
+
+
+class TestExportImport(unittest.TestCase):
+    """Integration tests for /api/users/export and /api/users/import"""
+
+    def setUp(self):
+        """Set up a test application with small import batches"""
+        self.app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+                               'USER_IMPORT_BATCH_SIZE': 2})
+        self.client = self.app.test_client()
+
+    def import_users(self, body, **params):
+        query = '&'.join(f'{key}={value}' for key, value in params.items())
+        content_type = 'text/csv' if params.get('format') == 'csv' else 'application/x-ndjson'
+        response = self.client.post(f'/api/users/import?{query}', data=body, content_type=content_type)
+        self.assertEqual(response.status_code, 200)
+        return [json.loads(line) for line in response.data.decode().splitlines()]
+
+    def test_export_formats(self):
+        """Test that both export formats stream every user in id order"""
+        self.import_users(ndjson([{'username': f'u{i}', 'email': f'u{i}@example.com'} for i in range(3)]))
+
+        response = self.client.get('/api/users/export')
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        self.assertEqual([json.loads(line)['username'] for line in response.data.decode().splitlines()],
+                         ['u0', 'u1', 'u2'])
+
+        response = self.client.get('/api/users/export?format=csv')
+        self.assertEqual(response.mimetype, 'text/csv')
+        self.assertEqual(response.data.decode().splitlines(),
+                         ['id,username,email', '1,u0,u0@example.com', '2,u1,u1@example.com', '3,u2,u2@example.com'])
+        self.assertEqual(self.client.get('/api/users/export?format=xml').status_code, 400)
+
+    def test_import_reports_progress_per_batch(self):
+        """Test that a progress line is streamed for each committed batch"""
+        progress = self.import_users(ndjson([{'username': f'u{i}', 'email': f'u{i}@example.com'} for i in range(5)]))
+        self.assertEqual([p['processed'] for p in progress], [2, 4, 5])
+        self.assertEqual(progress[-1], {'processed': 5, 'imported': 5, 'skipped': 0, 'done': True})
+        self.assertEqual(self.client.head('/api/users').headers['X-Total-Count'], '5')
+
+    def test_round_trip_keeps_ids(self):
+        """Test that an exported snapshot restores with the same ids"""
+        self.client.post('/api/users/bulk', data=json.dumps([{'username': 'a', 'email': 'a@example.com'},
+                                                             {'username': 'b', 'email': 'b@example.com'}]),
+                         content_type='application/json')
+        self.client.delete('/api/users/1')
+        snapshot = self.client.get('/api/users/export?format=csv').data
+
+        restored = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:'}).test_client()
+        response = restored.post('/api/users/import?format=csv', data=snapshot, content_type='text/csv')
+        self.assertTrue(json.loads(response.data.decode().splitlines()[-1])['done'])
+        self.assertEqual(json.loads(restored.get('/api/users').data), [{'id': 2, 'username': 'b', 'email': 'b@example.com', 'version': 1}])
+
+    def test_conflict_policies(self):
+        """Test the skip, overwrite and fail conflict policies"""
+        self.import_users(ndjson([{'username': 'a', 'email': 'a@example.com'}]))
+        incoming = ndjson([{'username': 'a', 'email': 'new@example.com'}, {'username': 'b', 'email': 'b@example.com'}])
+
+        self.assertEqual(self.import_users(incoming, on_conflict='skip')[-1],
+                         {'processed': 2, 'imported': 1, 'skipped': 1, 'done': True})
+        self.assertEqual(self.import_users(incoming, on_conflict='overwrite')[-1]['imported'], 2)
+        self.assertEqual(json.loads(self.client.get('/api/users/1').data)['email'], 'new@example.com')
+
+        failed = self.import_users(incoming, on_conflict='fail')[-1]
+        self.assertEqual(failed['imported'], 0)
+        self.assertIn('error', failed)
+        self.assertEqual(self.client.head('/api/users').headers['X-Total-Count'], '2')
+
+    def test_malformed_input_reports_line(self):
+        """Test that parse errors stop the import and name the line"""
+        body = ndjson([{'username': 'a', 'email': 'a@example.com'}, {'username': 'b', 'email': 'b@example.com'}])
+        progress = self.import_users(body + '\n{"username": "c"}\n')
+        self.assertEqual(progress[-1]['error'], "line 4: missing field 'email'")
+        self.assertEqual(progress[-1]['imported'], 0)
+
+        progress = self.import_users('{"username": "x", "email": "x@example.com"}\nnot json\n')
+        self.assertTrue(progress[-1]['error'].startswith('line 2:'))
+        self.assertEqual(self.client.post('/api/users/import?on_conflict=merge', data='').status_code, 400)
+
+    def test_invalid_rows_report_line(self):
+        """Test that rows failing the create schema stop the import before reaching the database"""
+        rows = [
+            ({'username': {'first': 'a'}, 'email': 'a@example.com'}, 'username must be a non-empty string'),
+            ({'username': None, 'email': 'a@example.com'}, 'username must be a non-empty string'),
+            ({'username': 'a', 'email': 7}, 'email must be a non-empty string'),
+            ({'username': 'a' * 5000, 'email': 'a@example.com'}, 'username must be at most 80 characters'),
+            ({'username': 'a', 'email': 'not-an-email'}, 'email must be an email address'),
+        ]
+        for row, message in rows:
+            progress = self.import_users(ndjson([{'username': 'ok', 'email': 'ok@example.com'}, row]))
+            self.assertEqual(progress[-1]['error'], f'line 2: {message}')
+
+        snapshot = 'id,username,email\n1,a,a@example.com\n2,,b@example.com\n'
+        self.assertEqual(self.import_users(snapshot, format='csv')[-1]['error'],
+                         'line 3: username must be a non-empty string')
+        self.assertEqual(self.client.head('/api/users').headers['X-Total-Count'], '0')
+
+
+class TestInMemoryImport(unittest.TestCase):
+    """Import through the generic path used by the other backends"""
+
+    def test_import_into_memory_backend(self):
+        """Test that the default import batch honours the conflict policy"""
+        app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+                          'USER_STORAGE_BACKEND': 'memory'})
+        client = app.test_client()
+        body = ndjson([{'username': 'a', 'email': 'a@example.com'}, {'username': 'a', 'email': 'b@example.com'}])
+        response = client.post('/api/users/import?on_conflict=skip', data=body)
+        self.assertEqual(json.loads(response.data.decode().splitlines()[-1]),
+                         {'processed': 2, 'imported': 1, 'skipped': 1, 'done': True})
+
+
+if __name__ == '__main__':
+    unittest.main()
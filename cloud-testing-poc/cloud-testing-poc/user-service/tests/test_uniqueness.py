@@ -0,0 +1,110 @@
+"""
+Uniqueness Precheck Tests for User API
+Demonstrates Bloom-filter prechecks in cloud applications
+"""
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+# Add the src directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from src.main import create_app
+from src.services.uniqueness import BloomFilter
+
+
+class TestBloomFilter(unittest.TestCase):
+    """Unit tests for the Bloom filter"""
+
+    def test_no_false_negatives_and_bounded_false_positives(self):
+        """Test that added keys are always found and others rarely are"""
+        bloom = BloomFilter(10000, 0.01)
+        for i in range(10000):
+            bloom.add(f'member-{i}')
+
+        self.assertTrue(all(f'member-{i}' in bloom for i in range(10000)))
+        false_positives = sum(f'other-{i}' in bloom for i in range(10000))
+        self.assertLess(false_positives / 10000, 0.02)
+        self.assertAlmostEqual(bloom.expected_error_rate(), 0.01, delta=0.002)
+
+    def test_error_rate_sets_size(self):
+        """Test that a lower false-positive rate uses more bits and hashes"""
+        loose, tight = BloomFilter(1000, 0.1), BloomFilter(1000, 0.001)
+        self.assertGreater(tight.size, loose.size)
+        self.assertGreater(tight.hashes, loose.hashes)
+
+
+class TestUniquenessPrecheck(unittest.TestCase):
+    """Integration tests for the duplicate-user precheck"""
+
+    def setUp(self):
+        """Set up a test application"""
+        self.app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+                               'DEBUG_ROUTES_ENABLED': True})
+        self.client = self.app.test_client()
+        self.uniqueness = self.app.extensions['uniqueness_filter']
+
+    def _create(self, username, email):
+        return self.client.post('/api/users', data=json.dumps({'username': username, 'email': email}),
+                                content_type='application/json')
+
+    def test_new_users_skip_the_lookup_and_duplicates_stop_before_the_insert(self):
+        """Test that new keys go straight to the insert and duplicates are turned away early"""
+        self.assertEqual(self._create('a', 'a@example.com').status_code, 201)
+        duplicate = self._create('a', 'other@example.com')
+
+        self.assertEqual(duplicate.status_code, 409)
+        self.assertIn('desc="1 statements"', duplicate.headers['Server-Timing'])
+        stats = self.client.get('/api/debug/bloom').get_json()
+        self.assertEqual((stats['skipped'], stats['prechecks'], stats['conflicts']), (1, 1, 1))
+        self.assertTrue(stats['ready'])
+
+    def test_rebuild_picks_up_writes_made_elsewhere(self):
+        """Test that users written outside the API are in the filter after a rebuild"""
+        with self.app.app_context():
+            self.app.extensions['user_repository'].bulk_create([{'username': 'b', 'email': 'b@example.com'}])
+        self.assertFalse(self.uniqueness.maybe_taken('b', 'x@example.com'))
+
+        self.uniqueness.rebuild()
+
+        self.assertTrue(self.uniqueness.maybe_taken('b', 'x@example.com'))
+        self.assertEqual(self._create('b', 'x@example.com').status_code, 409)
+
+    def test_upserted_users_enter_the_filter(self):
+        """Test that a create after an upsert of the same username is turned away by the precheck"""
+        self.client.post('/api/users/upsert', data=json.dumps({'username': 'c', 'email': 'c@example.com'}),
+                         content_type='application/json')
+
+        self.assertEqual(self._create('c', 'other@example.com').status_code, 409)
+        self.assertEqual(self.client.get('/api/debug/bloom').get_json()['conflicts'], 1)
+
+    def test_startup_build_runs_in_background(self):
+        """Test that a populated table is loaded off the startup path and debug routes are opt-in"""
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        path = os.path.join(tmpdir, 'users.db')
+        with sqlite3.connect(path) as conn:
+            conn.execute('CREATE TABLE user (id INTEGER PRIMARY KEY, username VARCHAR(80) NOT NULL UNIQUE, '
+                         'email VARCHAR(120) NOT NULL UNIQUE)')
+            conn.execute("INSERT INTO user VALUES (1, 'old', 'old@example.com')")
+        conn.close()
+
+        app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}'})
+        uniqueness = app.extensions['uniqueness_filter']
+        self.assertTrue(uniqueness.ready.wait(5))
+        self.assertTrue(uniqueness.maybe_taken('old', 'new@example.com'))
+        self.assertNotIn('bloom_stats', app.view_functions)
+        self.assertNotIn('bloom_rebuild', app.view_functions)
+
+    def test_disabled(self):
+        """Test that BLOOM_ENABLED=false leaves duplicates to the database"""
+        app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:', 'BLOOM_ENABLED': False})
+        self.assertNotIn('uniqueness_filter', app.extensions)
+
+
+if __name__ == '__main__':
+    unittest.main()
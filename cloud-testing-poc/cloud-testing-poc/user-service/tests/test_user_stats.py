@@ -0,0 +1,134 @@
+"""
+Statistics Tests for User API
+Demonstrates serving dashboard aggregates from incrementally maintained tables
+"""
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+from sqlalchemy import event, text
+
+# Add the src directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from src.main import create_app
+from src.models.user import db
+from src.repositories.sql import TOP_DOMAINS_QUERY
+from src.services.reconcile import recompute_user_stats
+
+
+class TestUserStats(unittest.TestCase):
+    """Integration tests for GET /api/users/stats and its recompute command"""
+
+    def setUp(self):
+        """Set up a test application with users on two domains"""
+        self.app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:'})
+        self.client = self.app.test_client()
+        self.client.post('/api/users/bulk', data=json.dumps(
+            [{'username': f'u{i}', 'email': f'u{i}@{"big" if i % 3 else "small"}.example'} for i in range(6)]
+        ), content_type='application/json')
+
+    def stats(self, query=''):
+        return self.client.get(f'/api/users/stats{query}').get_json()
+
+    def test_stats(self):
+        """Test totals, domain counts and signup rate"""
+        stats = self.stats()
+
+        self.assertEqual(stats['total'], 6)
+        self.assertEqual(stats['domains'], [{'domain': 'big.example', 'users': 4},
+                                            {'domain': 'small.example', 'users': 2}])
+        self.assertEqual(stats['signups']['last_hour'], 6)
+        self.assertEqual(stats['signups']['last_24_hours'], 6)
+        self.assertEqual(len(stats['signups']['hourly']), 24)
+        self.assertEqual(self.stats('?domains=1')['domains'], [{'domain': 'big.example', 'users': 4}])
+        self.assertEqual(self.client.get('/api/users/stats?domains=0').status_code, 400)
+
+    def test_writes_update_stats(self):
+        """Test that email changes and deletes move the domain counts"""
+        self.client.patch('/api/users/1', data=json.dumps({'email': 'u1@small.example'}),
+                          content_type='application/json')
+        self.client.delete('/api/users/3')
+
+        self.assertEqual(self.stats()['domains'], [{'domain': 'big.example', 'users': 3},
+                                                   {'domain': 'small.example', 'users': 2}])
+
+    def test_imports_update_stats(self):
+        """Test that batch imports are counted once per inserted row under every conflict policy"""
+        def import_users(users, on_conflict):
+            body = '\n'.join(json.dumps(user) for user in users)
+            self.client.post(f'/api/users/import?on_conflict={on_conflict}', data=body,
+                             content_type='application/x-ndjson')
+
+        import_users([{'username': f'n{i}', 'email': f'n{i}@New.example'} for i in range(3)], 'fail')
+        import_users([{'username': 'n0', 'email': 'n0@new.example'}, {'username': 'n9', 'email': 'n9@new.example'}],
+                     'skip')
+        import_users([{'id': 1, 'username': 'u1', 'email': 'u1@new.example'}], 'overwrite')
+
+        stats = self.stats()
+        self.assertEqual(stats['total'], 10)
+        self.assertEqual(stats['domains'][0], {'domain': 'new.example', 'users': 5})
+        self.assertEqual(stats['signups']['last_hour'], 10)
+        with self.app.app_context():
+            self.assertEqual(recompute_user_stats(self.app), 0)
+
+    def test_served_without_scanning_users(self):
+        """Test that the endpoint reads only the aggregate tables"""
+        statements = []
+        with self.app.app_context():
+            engine = db.engine
+        listener = lambda conn, cursor, statement, *args: statements.append(statement)
+        event.listen(engine, 'before_cursor_execute', listener)
+        try:
+            self.stats()
+        finally:
+            event.remove(engine, 'before_cursor_execute', listener)
+
+        self.assertTrue(statements)
+        self.assertFalse([statement for statement in statements if 'FROM user ' in statement + ' '])
+
+    def test_top_domains_read_from_index(self):
+        """Test that the top-domains query walks the index instead of sorting every domain"""
+        with self.app.app_context():
+            query = TOP_DOMAINS_QUERY.compile(db.engine)
+            params = query.construct_params({'limit': 1})
+            plan = db.session.connection().exec_driver_sql(
+                f'EXPLAIN QUERY PLAN {query}', tuple(params[name] for name in query.positiontup)).all()
+
+        details = ' '.join(row[-1] for row in plan)
+        self.assertIn('ix_user_domain_count_top', details)
+        self.assertNotIn('TEMP B-TREE', details)
+
+    def test_recompute_repairs_drift(self):
+        """Test that the recompute command rebuilds drifted domain counts"""
+        with self.app.app_context():
+            db.session.execute(text("UPDATE user_domain_count SET value = 10 WHERE domain = 'big.example'"))
+            db.session.commit()
+
+        self.assertEqual(recompute_user_stats(self.app), 6)
+        self.assertEqual(self.stats()['domains'][0], {'domain': 'big.example', 'users': 4})
+        result = self.app.test_cli_runner().invoke(args=['recompute-user-stats'])
+        self.assertIn('Users miscounted: 0', result.output)
+
+    def test_existing_users_are_counted(self):
+        """Test that users created before the stats tables existed are counted at startup"""
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        path = os.path.join(tmpdir, 'users.db')
+        with sqlite3.connect(path) as conn:
+            conn.execute('CREATE TABLE user (id INTEGER PRIMARY KEY, username VARCHAR(80) NOT NULL UNIQUE, '
+                         'email VARCHAR(120) NOT NULL UNIQUE)')
+            conn.execute("INSERT INTO user VALUES (1, 'old', 'old@legacy.example')")
+        conn.close()
+
+        client = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}'}).test_client()
+        stats = client.get('/api/users/stats').get_json()
+        self.assertEqual(stats['domains'], [{'domain': 'legacy.example', 'users': 1}])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -30,11 +30,13 @@ class TestUserModel(unittest.TestCase):
         """Test user serialization to dictionary"""
         user = User(username='testuser', email='test@example.com')
         user.id = 1  # Simulate database ID
+        user.version = 1
         
         expected_dict = {
             'id': 1,
             'username': 'testuser',
-            'email': 'test@example.com'
+            'email': 'test@example.com',
+            'version': 1
         }
         
         self.assertEqual(user.to_dict(), expected_dict)
@@ -0,0 +1,141 @@
+"""
+Request Validation Tests for User API
+Demonstrates rejecting bad payloads before they reach the database in cloud applications
+"""
+import io
+import json
+import os
+import sys
+import unittest
+
+from sqlalchemy import event
+
+# Add the src directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from src.main import create_app
+from src.models.user import db
+
+
+class TestRequestValidation(unittest.TestCase):
+    """Integration tests for schema validation of user endpoints"""
+
+    def setUp(self):
+        """Set up a test application and count the SQL statements it issues"""
+        self.app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+                               'VALIDATION_MAX_BODY': 1024, 'VALIDATION_MAX_BATCH_ITEMS': 3})
+        self.client = self.app.test_client()
+        self.statements = []
+        with self.app.app_context():
+            self.engine = db.engine
+        event.listen(self.engine, 'before_cursor_execute', self.record)
+
+    def tearDown(self):
+        """Stop counting statements"""
+        event.remove(self.engine, 'before_cursor_execute', self.record)
+
+    def record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def post(self, path, body, **kwargs):
+        kwargs.setdefault('content_type', 'application/json')
+        return self.client.post(path, data=body if isinstance(body, (str, bytes)) else json.dumps(body), **kwargs)
+
+    def test_structured_errors(self):
+        """Test that every bad field is reported and nothing is queried"""
+        response = self.post('/api/users', {'username': '', 'email': 'not-an-email'})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.get_json()['details'], [
+            {'field': 'username', 'message': 'must be a non-empty string'},
+            {'field': 'email', 'message': 'must be an email address'},
+        ])
+        self.assertEqual(self.statements, [])
+
+    def test_missing_fields_and_bad_json(self):
+        """Test that missing fields, non-JSON and malformed bodies are 4xx rather than 500"""
+        response = self.post('/api/users', {'username': 'alice'})
+        self.assertEqual(response.get_json()['details'], [{'field': 'email', 'message': 'is required'}])
+        self.assertEqual(self.post('/api/users', '{"username": ').status_code, 400)
+        self.assertEqual(self.post('/api/users', 'username=alice', content_type='text/plain').status_code, 415)
+        self.assertEqual(self.post('/api/users', [1]).get_json()['details'],
+                         [{'field': '(body)', 'message': 'must be an object'}])
+
+    def test_bulk_items_are_located(self):
+        """Test that bulk errors name the offending item and arrays are capped"""
+        users = [{'username': 'a', 'email': 'a@example.com'}, {'username': 'b', 'email': 'b@example'}]
+        response = self.post('/api/users/bulk', users)
+        self.assertEqual(response.get_json()['details'], [{'field': '[1].email', 'message': 'must be an email address'}])
+
+        response = self.post('/api/users/bulk-delete', {'ids': [1, 2, 3, 4]})
+        self.assertEqual(response.get_json()['details'], [{'field': 'ids', 'message': 'must have at most 3 items'}])
+
+    def test_oversized_bodies(self):
+        """Test that a body over the limit is refused with 413"""
+        response = self.post('/api/users', {'username': 'a', 'email': 'a@example.com', 'padding': 'x' * 2000})
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(self.statements, [])
+
+    def test_streamed_body_without_length(self):
+        """Test that a body without a Content-Length is cut off at the limit"""
+        body = json.dumps({'username': 'a', 'email': 'a@example.com', 'padding': 'x' * 2000}).encode()
+        with self.app.test_request_context('/api/users', method='POST', input_stream=io.BytesIO(body),
+                                           content_type='application/json',
+                                           environ_base={'wsgi.input_terminated': True}) as ctx:
+            ctx.request.environ.pop('CONTENT_LENGTH', None)
+            self.assertEqual(self.app.full_dispatch_request().status_code, 413)
+
+    def test_import_rows_use_the_user_schema(self):
+        """Test that a streamed import stops at a row that would fail POST /api/users"""
+        body = '{"username": "a", "email": "a@example.com"}\n{"username": "b", "email": "b@example"}\n'
+        response = self.post('/api/users/import', body, content_type='application/x-ndjson')
+
+        progress = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        self.assertEqual(progress[-1]['error'], 'line 2: email must be an email address')
+        self.assertFalse([statement for statement in self.statements if statement.startswith('INSERT INTO user ')])
+
+    def test_valid_requests_pass(self):
+        """Test that well-formed requests reach their views unchanged"""
+        response = self.post('/api/users', {'username': 'alice', 'email': 'alice@example.com'})
+        self.assertEqual(response.status_code, 201)
+        response = self.client.patch('/api/users/1', data=json.dumps({'email': 'alice@example.org', 'version': 1}),
+                                     content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        response = self.client.patch('/api/users/1', data=json.dumps({'version': 0}), content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+
+    def test_integers_outside_sqlite_range(self):
+        """Test that integers SQLite cannot store get a structured 400 instead of a server error"""
+        self.post('/api/users', {'username': 'alice', 'email': 'alice@example.com'})
+        big = 10 ** 20
+
+        response = self.post('/api/users/bulk-delete', {'ids': [1, big]})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.get_json()['details'],
+                         [{'field': 'ids[1]', 'message': f'must be at most {2 ** 63 - 1}'}])
+        response = self.post('/api/users/bulk-delete', {'ids': [-2 ** 63 - 1]})
+        self.assertEqual(response.get_json()['details'][0]['message'], f'must be at least {-2 ** 63}')
+        response = self.post('/api/users/lookup', {'ids': [str(big)]})
+        self.assertEqual(response.get_json()['details'][0]['field'], 'ids[0]')
+
+        response = self.client.put('/api/users/1', data=json.dumps({'version': big}), content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.get_json()['details'][0]['field'], 'version')
+        response = self.client.patch('/api/users/1', data=json.dumps({'email': 'a@example.org'}),
+                                     content_type='application/json', headers={'If-Match': f'"{big}"'})
+        self.assertEqual(response.status_code, 400)
+
+        for query, field in ((f'after={big}', 'after'), (f'limit={big}', 'limit'), ('limit=0', 'limit'),
+                             ('after=x', 'after'), (f'after={-big}', 'after')):
+            response = self.client.get(f'/api/users?{query}')
+            self.assertEqual(response.status_code, 400, query)
+            self.assertEqual(response.get_json()['details'][0]['field'], field)
+        self.assertEqual(len(self.client.get(f'/api/users?after={-2 ** 63}&limit={2 ** 63 - 1}').get_json()), 1)
+
+        for method in ('get', 'put', 'delete'):
+            self.assertEqual(getattr(self.client, method)(f'/api/users/{big}').status_code, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,131 @@
+"""
+Write-Behind Tests for User API
+Demonstrates acknowledging creates before they are written in cloud applications
+"""
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+# Add the src directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from src.main import create_app
+
+
+class TestWriteBehind(unittest.TestCase):
+    """Integration tests for asynchronous write-behind creates"""
+
+    def setUp(self):
+        """Set up a file-backed application with write-behind enabled"""
+        self.tmpdir = tempfile.mkdtemp()
+        self.app = self.make_app()
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        """Drain the writer and remove the database"""
+        self.app.extensions['write_behind'].close()
+        shutil.rmtree(self.tmpdir)
+
+    def make_app(self, **config):
+        return create_app({'TESTING': True, 'WRITE_BEHIND_ENABLED': True,
+                           'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(self.tmpdir, 'users.db')}",
+                           **config})
+
+    def create(self, name, client=None, **headers):
+        return (client or self.client).post('/api/users', headers=headers, content_type='application/json',
+                                            data=json.dumps({'username': name, 'email': f'{name}@example.com'}))
+
+    def test_accepted_then_written(self):
+        """Test that an async create answers 202 with its id and is readable once flushed"""
+        response = self.create('alice', Prefer='respond-async')
+        self.assertEqual(response.status_code, 202)
+        user = response.get_json()
+        self.assertEqual(response.headers['Location'], f"/api/users/{user['id']}")
+
+        self.assertTrue(self.app.extensions['write_behind'].flush(5))
+        self.assertEqual(self.client.get(response.headers['Location']).get_json(), user)
+        stats = self.client.get('/api/debug/write-behind').get_json()
+        self.assertEqual((stats['accepted'], stats['pending'], stats['written']), (1, 0, 1))
+
+    def test_pending_keys_are_reserved(self):
+        """Test that a username still queued is a conflict before anything is written"""
+        self.assertEqual(self.create('alice', Prefer='respond-async').status_code, 202)
+        self.assertEqual(self.create('alice', Prefer='respond-async').status_code, 409)
+
+    def test_ids_do_not_collide_with_synchronous_writes(self):
+        """Test that synchronous inserts never take an id handed out to a queued user"""
+        queued = [self.create(f'q{i}', Prefer='respond-async').get_json()['id'] for i in range(5)]
+        synchronous = [self.create(f's{i}').get_json()['id'] for i in range(5)]
+        self.assertTrue(self.app.extensions['write_behind'].flush(5))
+
+        self.assertEqual(len(set(queued + synchronous)), 10)
+        self.assertEqual(self.client.head('/api/users').headers['X-Total-Count'], '10')
+
+    def lingering_app(self):
+        """Replace the app with one whose writer holds queued users for a while"""
+        self.app.extensions['write_behind'].close()
+        self.app = self.make_app(WRITE_BEHIND_FLUSH_INTERVAL=10)
+        self.client = self.app.test_client()
+        return self.app.extensions['write_behind']
+
+    def test_pending_keys_block_synchronous_writes(self):
+        """Test that a synchronous write cannot take a key a 202 has promised"""
+        self.lingering_app()
+        accepted = self.create('wb', Prefer='respond-async')
+        self.assertEqual(accepted.status_code, 202)
+
+        self.assertEqual(self.create('wb').status_code, 409)
+        for path, body in (('/api/users/upsert', {'username': 'wb', 'email': 'other@example.com'}),
+                           ('/api/users/bulk', [{'username': 'x', 'email': 'wb@example.com'}])):
+            self.assertEqual(self.client.post(path, data=json.dumps(body), content_type='application/json').status_code,
+                             409)
+
+        self.app.extensions['write_behind'].close()
+        self.assertEqual(self.client.get(accepted.headers['Location']).get_json(), accepted.get_json())
+
+    def test_written_counts_only_inserted_users(self):
+        """Test that a user lost to an outside write is counted as failed, not written"""
+        writer = self.lingering_app()
+        self.create('a', Prefer='respond-async')
+        self.create('b', Prefer='respond-async')
+        with self.app.app_context():
+            self.app.extensions['user_repository'].import_batch([{'username': 'x', 'email': 'a@example.com'}], 'fail')
+
+        writer.close()
+        stats = writer.stats()
+        self.assertEqual((stats['written'], stats['failed']), (1, 1))
+
+    def test_closing_writer_refuses_creates(self):
+        """Test that creates arriving after shutdown began get 503 instead of a 202 that is never written"""
+        self.app.extensions['write_behind'].close()
+        self.assertEqual(self.create('late', Prefer='respond-async').status_code, 503)
+
+    def test_full_queue_is_refused(self):
+        """Test that a full queue answers 503 instead of growing"""
+        self.app.extensions['write_behind'].close()
+        app = self.make_app(WRITE_BEHIND_QUEUE_SIZE=1, WRITE_BEHIND_FLUSH_INTERVAL=10)
+        self.app = app
+        statuses = [self.create(f'u{i}', app.test_client(), Prefer='respond-async').status_code for i in range(3)]
+        self.assertIn(503, statuses)
+        self.assertEqual(statuses[0], 202)
+
+    def test_close_drains_the_queue(self):
+        """Test that shutting the writer down writes everything accepted"""
+        app = self.make_app(WRITE_BEHIND_FLUSH_INTERVAL=10)
+        for i in range(20):
+            self.create(f'u{i}', app.test_client(), Prefer='respond-async')
+        app.extensions['write_behind'].close()
+        self.assertEqual(app.test_client().head('/api/users').headers['X-Total-Count'], '20')
+
+    def test_synchronous_by_default(self):
+        """Test that creates stay synchronous unless the client asks for async"""
+        self.assertEqual(self.create('alice').status_code, 201)
+        app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:'})
+        self.assertNotIn('write_behind', app.extensions)
+
+
+if __name__ == '__main__':
+    unittest.main()